@@ -4,17 +4,38 @@ import json
 import os
 import time
 import pyautogui
-import pyperclip
 import threading
+import functools
 import re
 import socket
 import sys
 from pywinauto import Desktop
-from PIL import Image, ImageTk, ImageGrab
+from PIL import Image, ImageTk
 import logging
 import ctypes
 from ctypes import wintypes
 import pywintypes
+import matcher
+import capture
+from anchors import AnchorLocator
+from window_finder import WindowCache, compile_targets
+from window_registry import WindowRegistry, WinEventSource
+from automation_worker import AutomationWorker
+from waits import Waiter, wait_until
+import clipboard
+import macros
+import broadcast
+from config_writer import ConfigWriter, atomic_write
+import config_journal
+import command_store
+import command_search
+from command_list import CommandListView
+from ui_state import Reconciler, WidgetCounter
+from theming import Theme
+from tooltips import TooltipManager
+from icon_atlas import IconAtlas
+import text_input
+from text_input import INPUT, INPUT_UNION, KEYBDINPUT
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -76,11 +97,22 @@ else:
 
 CONFIG_FILE = os.path.join(BASE_DIR, "config.json")
 TARGET_CONFIG_FILE = os.path.join(BASE_DIR, "target_settings.json")
+COMMANDS_DB = os.path.join(BASE_DIR, "commands.db")
 # ASSETS_DIR 用于内置静态资源（如程序图标），由 PyInstaller 打包
 ASSETS_DIR = resource_path("assets")
 # ANCHORS_DIR 应该始终相对于程序运行目录（不随 exe 打包，由用户运行时生成）
 ANCHORS_DIR = os.path.join(BASE_DIR, "assets", "anchors")
-
+# 锚点匹配的 NCC 得分阈值（沿用原 locateOnScreen 的 confidence）
+ANCHOR_CONFIDENCE = 0.7
+# 搜索时最多显示的指令按钮数
+SEARCH_RESULT_LIMIT = 30
+# 主题跟随系统时检测系统主题的间隔（毫秒）
+SYSTEM_THEME_POLL_MS = 3000
+# 界面用到的图标尺寸（图标键 -> 像素），启动时由图标图集按每个主题预渲染；托盘图标 64x64 不随 DPI 缩放，按需渲染
+ICON_SIZES = {"app": (12, 14), "vscode": (16,), "antigravity": (16,), "terminal": (16,),
+              "claude": (16,), "codex": (16,)}
+# 指令列表最大高度 = 屏幕高度减去该值（预留标题栏、目标选择区与底栏），超出部分滚动显示
+CMD_LIST_RESERVED_HEIGHT = 300
 
 
 try:
@@ -93,71 +125,25 @@ try:
 except ImportError:
     win32gui = None
 
-class ToolTip:
-    """通用的鼠标悬停提示框 (带延迟显示)"""
-    def __init__(self, widget, text, delay=500):
-        self.widget = widget
-        self.text = text
-        self.delay = delay
-        self.tip_win = None
-        self.after_id = None
-        # 使用 add="+" 追加事件，避免覆盖已绑定的其他处理器（如颜色切换）
-        self.widget.bind("<Enter>", lambda e: self.schedule_tip(), add="+")
-        self.widget.bind("<Leave>", lambda e: self.hide_tip(), add="+")
-
-
-    def schedule_tip(self):
-        """计划显示提示"""
-        self.hide_tip() # 先确保清除之前的状态
-        if self.text:
-            self.after_id = self.widget.after(self.delay, self.show_tip)
-
-    def show_tip(self):
-        """实际执行显示并在按钮下方弹出，支持自动换行"""
-        if self.tip_win or not self.text: return
-        
-        # 获取宿主 widget 的位置和尺寸
-        w_width = self.widget.winfo_width()
-        w_height = self.widget.winfo_height()
-        x_root = self.widget.winfo_rootx()
-        y_root = self.widget.winfo_rooty()
-        
-        # 获取主窗口的宽度，用于限制 ToolTip 宽度
-        app_width = self.widget.winfo_toplevel().winfo_width()
-        max_width = max(app_width - 20, 100) # 预留一点边距
-        
-        self.tip_win = tw = tk.Toplevel(self.widget)
-        tw.wm_overrideredirect(True)
-        tw.attributes("-topmost", True)
-        
-        # 创建 Label 并强制自动换行
-        # wraplength 以像素为单位，设置为 max_width 确保不超宽
-        lbl = tk.Label(tw, text=self.text, justify='left', background="#ffffca", 
-                       relief='solid', borderwidth=1, font=("Microsoft YaHei", 8),
-                       wraplength=max_width)
-        lbl.pack()
-        
-        # 更新 IDLE 以获取真实的 Label 尺寸
-        tw.update_idletasks()
-        tip_w = tw.winfo_width()
-        
-        # 计算弹出位置：在 widget 下方，尽量水平居中对齐
-        # 如果超出屏幕右侧，Tk 会处理，但我们可以手动校准使其贴合主窗口
-        target_x = x_root + (w_width - tip_w) // 2
-        target_y = y_root + w_height + 15 # 偏移 15 像素，避免被手型光标遮挡
-        
-        tw.wm_geometry(f"+{target_x}+{target_y}")
-
-
-    def hide_tip(self, event=None):
-        """隐藏提示并取消定时器"""
-        if self.after_id:
-            self.widget.after_cancel(self.after_id)
-            self.after_id = None
-        if self.tip_win:
-            self.tip_win.destroy()
-            self.tip_win = None
-
+def monitor_dpi(hwnd=None, point=None):
+    """获取窗口（或屏幕坐标 point）所在显示器的有效 DPI，均未指定时为主显示器；无法获取时返回 None"""
+    try:
+        user32, shcore = ctypes.windll.user32, ctypes.windll.shcore
+        user32.MonitorFromWindow.restype = ctypes.c_void_p
+        user32.MonitorFromPoint.restype = ctypes.c_void_p
+        if hwnd:
+            monitor = user32.MonitorFromWindow(hwnd, 2)  # MONITOR_DEFAULTTONEAREST
+        elif point:
+            monitor = user32.MonitorFromPoint(wintypes.POINT(int(point[0]), int(point[1])), 2)
+        else:
+            monitor = user32.MonitorFromPoint(wintypes.POINT(0, 0), 1)  # MONITOR_DEFAULTTOPRIMARY
+        dpi_x, dpi_y = ctypes.c_uint(), ctypes.c_uint()
+        # MDT_EFFECTIVE_DPI = 0
+        if shcore.GetDpiForMonitor(ctypes.c_void_p(monitor), 0, ctypes.byref(dpi_x), ctypes.byref(dpi_y)) != 0:
+            return None
+        return dpi_x.value or None
+    except:
+        return None
 
 class QuickBarApp:
     """
@@ -186,6 +172,7 @@ class QuickBarApp:
         # 1. 加载持久化配置
         self.config_data = self.load_config()
         saved_state = self.config_data.get("state", {})
+        self._init_config_storage(saved_state)
         
         self._init_variables(saved_state)
         self._init_ui()
@@ -210,6 +197,12 @@ class QuickBarApp:
         self.current_ide = tk.StringVar(value=saved_state.get("current_ide", "VS Code"))
         self.current_ai = tk.StringVar(value=saved_state.get("current_ai", "Claude"))
         self.auto_send = tk.BooleanVar(value=saved_state.get("auto_send", True))
+        # 自动化步骤间的等待方式：adaptive 轮询真实条件，fixed 使用原有固定延时
+        self.wait_mode = saved_state.get("wait_mode", "adaptive")
+        # 粘贴指令后是否恢复用户原来的剪贴板内容
+        self.restore_clipboard = saved_state.get("restore_clipboard", True)
+        # 广播发送上次选择的目标列表 [(IDE, AI), ...]
+        self.broadcast_targets = [tuple(t) for t in saved_state.get("broadcast_targets", [])]
         self.is_topmost = tk.BooleanVar(value=saved_state.get("is_topmost", True))
         self.current_theme = tk.StringVar(value=saved_state.get("theme", "Dark")) 
         self.minimize_to = saved_state.get("minimize_to", None) # 默认 None，首次使用时弹窗询问
@@ -229,13 +222,65 @@ class QuickBarApp:
         self.drag_start_idx = None
         self.mode = None 
         self.is_button_dragging = False  # 新增：标记是否正在拖拽按钮
+        # 指令搜索：查询变化时重新过滤按钮列表；索引在指令变更后丢弃，下次查询时重建
+        self.search_var = tk.StringVar()
+        self.search_index = None
+        self.search_var.trace_add("write", lambda *_: self._on_search_changed())
         self.tray_icon = None
-        self.placeholder = None
         self.icon_cache = {} 
-        self.ui_icons = {}
         self.target_settings = self.load_target_settings()
+        self._target_settings_lock = threading.Lock()
         self.EDGE_SIZE = 5
 
+        # 已解码锚点缓存：后台预热所有目标的锚点图，使首次点击与后续点击同样快
+        self.anchor_cache = matcher.AnchorCache()
+        anchor_paths = [cfg["image"] for ais in self.target_settings.values() for cfg in ais.values() if cfg.get("image")]
+        threading.Thread(target=self.anchor_cache.warm, args=(anchor_paths,), daemon=True).start()
+        # 锚点定位：截图后端 + 匹配引擎，记录每个 (IDE, AI) 上次命中位置及快速路径统计
+        self.capture = capture.get_default()
+        self.anchor_locator = AnchorLocator(self.capture, self.anchor_cache, ANCHOR_CONFIDENCE,
+                                            on_update=self.save_target_settings)
+        self.anchor_fast_path_stats = self.anchor_locator.stats
+        # 剪贴板：粘贴前快照全部格式，粘贴后后台恢复
+        self.clipboard = clipboard.ClipboardKeeper(clipboard.create_backend(), enabled=self.restore_clipboard)
+        self.waiter = Waiter(self.wait_mode, win32gui, self.clipboard, self.capture)
+        # 直接文本输入（KEYEVENTF_UNICODE 批量 SendInput），非 Windows 平台为 None
+        self.text_injector = text_input.default_injector()
+        # 目标窗口句柄缓存：命中时仅复核句柄，避免每次点击都枚举全部顶层窗口
+        self.window_cache = WindowCache(win32gui)
+        # 加载时一次性编译各目标的 win_title 规则（类名 + 字面量预筛 + 正则）
+        self.target_matchers = compile_targets(self.target_settings)
+        # 事件驱动的窗口注册表：后台订阅窗口事件维护候选表，点击时 O(1) 查表；不可用时回退到句柄缓存
+        self.window_registry = None
+        if win32gui:
+            try:
+                self.window_registry = WindowRegistry(win32gui, self.target_matchers,
+                                                      WinEventSource()).start()
+            except Exception as e:
+                logger.warning(f"窗口注册表启动失败，回退到按需枚举: {e}")
+        # 常驻自动化线程：所有指令排队串行执行，窗口缓存、锚点与 pywinauto 连接跨任务复用
+        self._pywinauto_apps = {}
+        self.automation_worker = AutomationWorker(lambda job: job()).start()
+        # 宏：按步骤内容缓存编译结果；Esc 中止正在执行的宏
+        self.macro_cache = macros.MacroCache(self.target_settings)
+        self.macro_abort = threading.Event()
+        # 宏执行期间为 True，键盘钩子据此把 Esc 转为中止宏
+        self.macro_running = False
+        # 界面差量刷新：比较 _ui_state 快照，只原地更新变化的区域；语言变化仍整体重建
+        self.commands_version = 0
+        # 悬停提示：全应用共用一个提示窗口与定时器，组件只登记文本
+        self.tooltips = TooltipManager(self.root)
+        self.ui_counter = WidgetCounter(self.root, items=lambda: CommandListView.total_created)
+        self.ui_reconciler = Reconciler(self.setup_ui)
+        self.ui_reconciler.register("theme", lambda old, new: self._switch_theme(new))
+        self.ui_reconciler.register("language")
+        self.ui_reconciler.register("ide", lambda old, new: [self._sync_ai_buttons(), self._update_selection_visuals()])
+        self.ui_reconciler.register("ai", lambda old, new: self._update_selection_visuals())
+        self.ui_reconciler.register("topmost", lambda old, new: self._update_topmost_button())
+        self.ui_reconciler.register("auto_send", lambda old, new: self._update_auto_send_check())
+        self.ui_reconciler.register("ifly", lambda old, new: self.update_ifly_status_display())
+        self.ui_reconciler.register("commands", lambda old, new: self.refresh_cmd_list())
+
         # 4. 国际化支持
         def get_system_lang():
             try:
@@ -269,6 +314,10 @@ class QuickBarApp:
                 "anchor_not_found": "匹配失败：未能在目标窗口内找到校准位置。\n\n解决建议：\n1. 确保目标窗口未被遮挡且处于前台。\n2. 确保已点开 AI 对话框（如 Claude 侧边栏）。\n3. 如果布局有变，请重新点击🎯进行校准。",
                 "btn_name": "按钮名称:", "cmd_type": "指令类型:", "text_mode": "纯文本", "key_mode": "快捷键",
                 "cmd_content": "指令内容:", "key_content": "快捷键内容:", "key_tip": "按 Backspace 清空",
+                "send_mode": "发送方式:", "send_paste": "剪贴板粘贴", "send_type": "直接输入",
+                "macro_mode": "宏", "macro_content": "宏步骤:", "broadcast": "广播发送...", "broadcast_send": "发送",
+                "search_tip": "搜索指令（回车发送第一个，Esc 清空）", "search_no_match": "没有匹配的指令",
+                "macro_tip": "每行一步: text / type / key / wait_window / wait_anchor / delay / target",
                 "ifly_not_found": "未找到讯飞执行程序，请检查安装路径。"
             },
             "en": {
@@ -290,6 +339,10 @@ class QuickBarApp:
                 "anchor_not_found": "Match failed: Could not find the calibration anchor.\n\nTips:\n1. Ensure the window is not obscured.\n2. Ensure the AI sidebar is open.\n3. Recalibrate if the layout has changed.",
                 "btn_name": "Button Name:", "cmd_type": "Command Type:", "text_mode": "Text", "key_mode": "Hotkey",
                 "cmd_content": "Command:", "key_content": "Hotkey Content:", "key_tip": "Press Backspace to clear",
+                "send_mode": "Send Mode:", "send_paste": "Paste", "send_type": "Type",
+                "macro_mode": "Macro", "macro_content": "Macro Steps:", "broadcast": "Broadcast...", "broadcast_send": "Send",
+                "search_tip": "Search commands (Enter sends the top hit, Esc clears)", "search_no_match": "No matching commands",
+                "macro_tip": "One step per line: text / type / key / wait_window / wait_anchor / delay / target",
                 "ifly_not_found": "iFlyVoice executable not found."
             },
             "ja": {
@@ -309,6 +362,10 @@ class QuickBarApp:
                 "calibration_tip": "現在のターゲットはまだキャリブレーションされていません。\n\nまず対象のIDEとAIチャット画面を開いて表示された状态にしてから、「はい」をクリックして开始してください。开始しますか？",
                 "btn_name": "ボタン名:", "cmd_type": "コマンド型:", "text_mode": "テキスト", "key_mode": "ホットキー",
                 "cmd_content": "コマンド内容:", "key_content": "ホットキー内容:", "key_tip": "BackSpaceで消去",
+                "send_mode": "送信方式:", "send_paste": "貼り付け", "send_type": "直接入力",
+                "macro_mode": "マクロ", "macro_content": "マクロ手順:", "broadcast": "一斉送信...", "broadcast_send": "送信",
+                "search_tip": "コマンド検索（Enter で先頭を送信、Esc でクリア）", "search_no_match": "一致するコマンドがありません",
+                "macro_tip": "1行1手順: text / type / key / wait_window / wait_anchor / delay / target",
                 "ifly_not_found": "讯飞音声アプリが見つかりません"
             }
         }
@@ -340,6 +397,8 @@ class QuickBarApp:
                 "active": "#005a9e", "accent": "#005a9e", "shadow": "#dddddd"
             }
         }
+        # 当前主题：组件按配色键登记，切换时原地重设颜色
+        self.theme = Theme(self.themes, self.current_theme.get())
         self.prepare_icons()
         # 确保锚点目录存在
         if not os.path.exists(ANCHORS_DIR):
@@ -353,12 +412,14 @@ class QuickBarApp:
         """初始 UI 构建"""
         self.setup_ui()
         self.root.after(100, self.auto_adjust_height) 
+        self.root.after(SYSTEM_THEME_POLL_MS, self._watch_system_theme)
 
     def _bind_events(self):
         """绑定全局事件"""
         self.root.bind("<Button-1>", self.on_press)
         self.root.bind("<B1-Motion>", self.on_motion)
         self.root.bind("<Control-q>", lambda e: self.quit_app())
+        self.root.bind("<Escape>", lambda e: self.abort_macro())
         self.root.bind("<Motion>", self.update_cursor)
 
     def _show_first_time_tip(self):
@@ -411,24 +472,117 @@ class QuickBarApp:
             "state": {}
         }
 
+        data = default_data
         if os.path.exists(CONFIG_FILE):
             try:
                 with open(CONFIG_FILE, "r", encoding="utf-8") as f:
                     data = json.load(f)
-                    if isinstance(data, list): return {"commands": data, "state": {}}
-                    return data
-            except: pass
-        return default_data
+                if isinstance(data, list): data = {"commands": data, "state": {}}
+            except: data = default_data
+
+        # 增量存储：在快照上重放 config.json.journal 中尚未合并的变更
+        try:
+            self._journal_seq = config_journal.replay(CONFIG_FILE, data)
+        except Exception as e:
+            logger.error(f"配置日志读取失败: {e}")
+            self._journal_seq = 0
+        return data
+
+    def _init_config_storage(self, saved_state):
+        """
+        按 state.storage 选择配置存储方式：
+        - json（默认）：防抖后整体原子重写 config.json
+        - journal：指令变更追加到 config.json.journal，后台定期压缩为快照；界面状态仍防抖合并后记一条 state
+        - sqlite：指令保存在 commands.db（首次启用时从 config.json 迁移），config.json 只保存界面状态
+        """
+        self.storage_mode = saved_state.get("storage", "json")
+        self.config_journal = self.command_store = None
+        retired = None
+        if self.storage_mode != "sqlite":
+            try:
+                retired = command_store.retire(COMMANDS_DB)
+            except Exception as e:
+                logger.error(f"SQLite 指令库读取失败: {e}")
+            if retired is not None:
+                self.config_data["commands"] = retired
+
+        if self.storage_mode == "journal":
+            self.config_journal = config_journal.ChangeJournal(CONFIG_FILE, self.config_data, self._journal_seq).start()
+            self.config_writer = ConfigWriter(self.config_journal.journal_path, self._serialize_state,
+                                              call_later=self.root.after,
+                                              write=lambda text: self.config_journal.append("state", state=json.loads(text)))
+        elif self.storage_mode == "sqlite":
+            self.command_store = command_store.CommandStore(COMMANDS_DB)
+            self.command_store.migrate(self.commands)
+            self.config_data["commands"] = self.command_store.load()
+            self.config_writer = ConfigWriter(CONFIG_FILE, self._serialize_config, call_later=self.root.after)
+        else:
+            try:
+                config_journal.retire(CONFIG_FILE, self.config_data)
+            except Exception as e:
+                logger.error(f"配置日志合并失败: {e}")
+            # 保存请求在防抖窗口内合并，于 Tk 主线程序列化、后台线程原子替换落盘
+            self.config_writer = ConfigWriter(CONFIG_FILE, self._serialize_config, call_later=self.root.after)
+        if retired is not None:
+            self._replace_config(self.config_data)
+
+    def _record_change(self, op, cmd, **fields):
+        """
+        记录一次指令变更（add / edit / move / delete），cmd 为被变更的指令，fields 为其在列表中的位置：
+        SQLite 存储按主键更新单行，日志存储只追加该条记录，否则整体保存
+        """
+        self.search_index = None
+        self.commands_version += 1
+        if self.command_store:
+            self.command_store.record(op, cmd, self.commands, **fields)
+        elif self.config_journal:
+            if op in ("add", "edit"):
+                fields["cmd"] = cmd
+            self.config_journal.append(op, **fields)
+        else:
+            self.save_config()
+
+    def _replace_config(self, data):
+        """整体替换配置（导入）"""
+        self.config_data = data
+        self.search_index = None
+        self.commands_version += 1
+        if self.command_store:
+            self.command_store.replace_all(self.commands)
+            self.save_config()
+        elif self.config_journal:
+            self.config_journal.reset(data)
+        else:
+            self.save_config()
 
     @property
     def commands(self): return self.config_data.setdefault("commands", [])
 
     def save_config(self):
-        """保存当前所有 UI 状态和窗口几何至磁盘"""
+        """标记配置已修改；由 config_writer 防抖合并后写入磁盘（拖动窗口等高频调用不再每次重写文件）"""
+        self.config_writer.request()
+
+    def _serialize_config(self):
+        self._collect_state()
+        data = self.config_data
+        if self.command_store:  # 指令在 commands.db 中，config.json 只保存其余配置
+            data = {k: v for k, v in data.items() if k != "commands"}
+        return json.dumps(data, ensure_ascii=False, indent=4)
+
+    def _serialize_state(self):
+        self._collect_state()
+        return json.dumps(self.config_data["state"], ensure_ascii=False)
+
+    def _collect_state(self):
+        """把当前所有 UI 状态和窗口几何写入 config_data["state"]"""
         self.config_data["state"] = {
             "current_ide": self.current_ide.get(),
             "current_ai": self.current_ai.get(),
             "auto_send": self.auto_send.get(),
+            "wait_mode": self.wait_mode,
+            "restore_clipboard": self.restore_clipboard,
+            "storage": self.storage_mode,
+            "broadcast_targets": [list(t) for t in self.broadcast_targets],
             "is_topmost": self.is_topmost.get(),
             "theme": self.current_theme.get(),
             "minimize_to": self.minimize_to,
@@ -442,8 +596,6 @@ class QuickBarApp:
             "geometry": self.root.geometry(),
             "calibrated": self.config_data.get("state", {}).get("calibrated", False)
         }
-        with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-            json.dump(self.config_data, f, ensure_ascii=False, indent=4)
 
     def check_update(self, silent=False):
         """检查 GitHub 最新版本并提示更新 (异步)"""
@@ -507,22 +659,53 @@ class QuickBarApp:
             except: pass
         return default
 
+    def save_target_settings(self):
+        """将校准偏移及锚点命中位置写回 target_settings.json（广播时可能由多个线程同时触发）"""
+        with self._target_settings_lock:
+            atomic_write(TARGET_CONFIG_FILE, json.dumps(self.target_settings, indent=4))
+        self._refresh_target_matchers()
+
+    def _refresh_target_matchers(self):
+        """win_title 规则变化时才重新编译匹配器并重建窗口注册表索引"""
+        matchers = compile_targets(self.target_settings)
+        if matchers == self.target_matchers: return
+        self.target_matchers = matchers
+        if self.window_registry:
+            self.window_registry.set_targets(matchers)
+
     def t(self, key):
         """获取当前语言的翻译文本"""
         lang = self.language.get()
         return self.translations.get(lang, self.translations["zh"]).get(key, key)
 
     def _apply_system_theme(self):
-        """检测并应用系统主题"""
+        """
+        检测系统主题，与上次检测到的不同时应用（手动切换的主题保留到系统主题再次变化为止）。
+        返回是否改变了当前主题
+        """
         try:
             import winreg
             key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, 
                                 r"Software\Microsoft\Windows\CurrentVersion\Themes\Personalize")
             value, _ = winreg.QueryValueEx(key, "AppsUseLightTheme")
             winreg.CloseKey(key)
-            self.current_theme.set("Light" if value == 1 else "Dark")
+            system_theme = "Light" if value == 1 else "Dark"
         except:
-            pass  # 无法检测时保持当前主题
+            return False  # 无法检测时保持当前主题
+        if system_theme == getattr(self, "_system_theme", None):
+            return False
+        self._system_theme = system_theme
+        if system_theme == self.current_theme.get():
+            return False
+        self.current_theme.set(system_theme)
+        return True
+
+    def _watch_system_theme(self):
+        """主题跟随系统时定期检测，系统主题变化后原地切换"""
+        if self.theme_follow_system.get() and self._apply_system_theme():
+            self.save_config()
+            self.update_ui("system_theme")
+        self.root.after(SYSTEM_THEME_POLL_MS, self._watch_system_theme)
 
     def _set_auto_start(self, enable):
         """设置开机自启动"""
@@ -550,16 +733,14 @@ class QuickBarApp:
         if available_ais:
             self.current_ai.set(available_ais[0])
             
-        # 切换 IDE 结构（特别是 CLI 显隐）时全量刷新最为安全，同时也刷新影子容器引用
-        self.setup_ui()
+        # 差量刷新：按 AI 名称增删 AI 按钮（Native CLI 隐藏整行），再更新选中高亮
+        self.update_ui("set_ide")
         self.save_config()
 
     def set_ai(self, ai_name):
         self.current_ai.set(ai_name)
         # AI 切换使用局部刷新，保证零闪烁
-        self._update_selection_visuals()
-        self.refresh_cmd_list()
-        self.auto_adjust_height()
+        self.update_ui("set_ai")
         self.save_config()
 
     def _update_selection_visuals(self):
@@ -597,7 +778,44 @@ class QuickBarApp:
         """在 Dark/Light 两种主题间一键切换"""
         new_theme = "Light" if self.current_theme.get() == "Dark" else "Dark"
         self.current_theme.set(new_theme)
-        self.save_config(); self.setup_ui()
+        self.save_config(); self.update_ui("toggle_theme")
+
+    def _switch_theme(self, name):
+        """原地切换主题：一次遍历把新颜色推送给已登记的组件和图元；设置窗口开着时重新渲染其内容"""
+        self.theme.switch(name)
+        swin = getattr(self, '_settings_window', None)
+        if swin and swin.winfo_exists():
+            self._refresh_settings_ui()
+
+    def _ui_state(self):
+        """主界面显示所依赖的状态，update_ui 按键比较前后两次的差异"""
+        return {
+            "theme": self.current_theme.get(),
+            "language": self.language.get(),
+            "ide": self.current_ide.get(),
+            "ai": self.current_ai.get(),
+            "topmost": self.is_topmost.get(),
+            "auto_send": self.auto_send.get(),
+            "ifly": self.win_h_action.get() == "ifly",
+            "commands": self.commands_version,
+        }
+
+    def update_ui(self, op):
+        """差量刷新主界面：只更新与上次相比变化的区域（op 为操作名，用于统计新建的组件数）"""
+        with self.ui_counter.measure(op):
+            if self.ui_reconciler.update(self._ui_state()):
+                self.auto_adjust_height()
+
+    def _update_topmost_button(self):
+        colors = self.themes[self.current_theme.get()]
+        is_pinned = self.is_topmost.get()
+        self.top_canvas.itemconfigure(self.top_icon_item, text="\uE840" if is_pinned else "\uE718",
+                                      fill=colors["active"] if is_pinned else colors["subtext"])
+
+    def _update_auto_send_check(self):
+        colors = self.themes[self.current_theme.get()]
+        is_auto = self.auto_send.get()
+        self.auto_check.config(text="☑" if is_auto else "☐", fg=colors["active"] if is_auto else colors["subtext"])
 
     def quit_app(self):
         """关闭程序：根据设置决定退出或最小化到托盘"""
@@ -609,6 +827,7 @@ class QuickBarApp:
                 threading.Thread(target=self.setup_tray, daemon=True).start()
         else:
             # 彻底退出
+            self._stop_background_workers()
             if self.tray_icon:
                 self.tray_icon.stop()
             # 确保在退出前销毁所有窗口
@@ -617,11 +836,34 @@ class QuickBarApp:
             sys.exit(0)
 
     def force_quit(self):
-        """强制退出程序（托盘菜单使用）"""
+        """
+        强制退出程序（托盘菜单使用）。托盘回调在 pystray 线程中执行，而退出流程要关闭 Tk 主线程创建的
+        SQLite 连接、读取 Tk 变量写入配置，因此交回 Tk 主线程执行
+        """
+        self.root.after(0, self._force_quit)
+
+    def _force_quit(self):
+        self._stop_background_workers()
         if self.tray_icon:
             self.tray_icon.stop()
         self.root.destroy()
 
+    def _stop_background_workers(self):
+        """
+        退出前停止自动化线程与窗口事件钩子，立即恢复尚未恢复的剪贴板，并写入尚未落盘的配置。
+        只能在 Tk 主线程调用：config_writer.flush() 会序列化配置（读取 Tk 变量与窗口几何），托盘退出经 force_quit 交回主线程
+        """
+        self.config_writer.flush()
+        if self.config_journal:
+            self.config_journal.flush()
+        if self.command_store:
+            self.command_store.close()
+        self.macro_abort.set()
+        self.automation_worker.stop()
+        self.clipboard.flush()
+        if self.window_registry:
+            self.window_registry.stop()
+
     def _set_window_icon(self):
         """设置窗口图标（任务栏和标题栏）"""
         # 尝试多个路径查找图标
@@ -828,17 +1070,23 @@ class QuickBarApp:
             else:
                 print(f"警告: 关键图标文件丢失 -> {name} (路径: {path})")
 
+        # 预渲染界面用到的全部尺寸（两种主题），之后构建界面只取缓存的图像。
+        # 界面各处使用固定像素尺寸（标题栏高 26、按钮画布 24x26 等），图标也按 1.0 渲染，
+        # 待界面整体按 DPI 缩放后再通过 icon_atlas.set_scale 同步
+        self.icon_atlas = IconAtlas(self.icon_cache, self.current_theme.get())
+        self.icon_atlas.prerender(ICON_SIZES, list(self.themes))
+
     def setup_tray(self):
         """设置并运行系统托盘"""
         if not pystray: return
         
         image = None
         
-        # 1. 首先尝试从 icon_cache 获取（已预加载的图像）
+        # 1. 首先尝试从图标图集获取（已预渲染的图像）
         if "app" in self.icon_cache:
             try:
-                # 系统托盘图标最佳尺寸是 64x64
-                image = self.icon_cache["app"].copy().resize((64, 64), Image.LANCZOS)
+                # 系统托盘图标最佳尺寸是 64x64（托盘按实际像素显示，不随界面缩放）
+                image = self.icon_atlas.image("app", 64, scaled=False)
                 print("托盘图标从缓存加载成功")
             except Exception as e:
                 print(f"从缓存加载托盘图标失败: {e}")
@@ -894,86 +1142,91 @@ class QuickBarApp:
 
 
 
-    def _draw_rounded_rect(self, canvas, x1, y1, x2, y2, radius, **kwargs):
-        points = [x1+radius, y1, x1+radius, y1, x2-radius, y1, x2-radius, y1, x2, y1, x2, y1+radius, x2, y1+radius, x2, y2-radius, x2, y2-radius, x2, y2, x2-radius, y2, x2-radius, y2, x1+radius, y2, x1+radius, y2, x1, y2, x1, y2-radius, x1, y2-radius, x1, y1+radius, x1, y1+radius, x1, y1]
-        return canvas.create_polygon(points, **kwargs, smooth=True)
-
     def setup_ui(self):
         """回归稳定刷新架构：清场并重建，但保留设置窗口，并通过 update_idletasks 压制闪烁"""
-        colors = self.themes[self.current_theme.get()]
-        
         # 1. 记录设置窗口，防止误删
         swin = getattr(self, '_settings_window', None)
         
-        # 2. 彻底清场 (除了设置窗口)
+        # 2. 彻底清场 (除了设置窗口)，旧组件的主题登记一并清除
         for widget in self.root.winfo_children():
             if widget != swin:
                 widget.destroy()
+        self.theme.clear()
+        if self.theme.name != self.current_theme.get():
+            self.theme.switch(self.current_theme.get())
         
         # 3. 设置主背景
-        self.root.configure(bg=colors["bg"])
+        self.theme.style(self.root, bg="bg")
         
         # 4. 构建主界面容器，并记录引用以便局部刷新
-        self.main_container = tk.Frame(self.root, bg=colors["bg"])
+        self.main_container = self.theme.style(tk.Frame(self.root), bg="bg")
         self.main_container.pack(fill="both", expand=True)
         self._build_main_content(self.main_container)
         
         # 5. 如果设置窗口开着，原地同步其内部状态
         if swin and swin.winfo_exists():
             self._refresh_settings_ui()
+
+        # 6. 记录当前界面状态，之后的更新按差量进行
+        self.ui_reconciler.reset(self._ui_state())
             
     def _build_main_content(self, container):
-        """构建主界面内容，支持挂载到不同容器"""
-        colors = self.themes[self.current_theme.get()]
-        header = tk.Frame(container, bg=colors["header"], height=26)
+        """构建主界面内容，支持挂载到不同容器；颜色按配色键登记到 self.theme，切换主题时原地重设"""
+        # colors 为当前主题的实时配色（切换主题时原地更新），事件闭包中引用它即可取到新颜色
+        colors = self.theme.colors
+        style = self.theme.style
+        header = style(tk.Frame(container, height=26), bg="header")
         header.pack(fill="x")
         header.pack_propagate(False)
 
         # 左侧：软件图标 + 标题
-        left_frame = tk.Frame(header, bg=colors["header"])
+        left_frame = style(tk.Frame(header), bg="header")
         left_frame.pack(side="left", fill="y")
         
         # 加载并显示软件图标
         try:
-            if "app" in self.icon_cache:
-                img = self.icon_cache["app"].resize((12, 12), Image.LANCZOS)
-                photo = ImageTk.PhotoImage(img)
-                icon_lbl = tk.Label(left_frame, image=photo, bg=colors["header"])
-                icon_lbl.image = photo 
+            photo = self.icon_atlas.photo("app", 12)
+            if photo:
+                icon_lbl = style(tk.Label(left_frame, image=photo), bg="header")
                 icon_lbl.pack(side="left", padx=(6, 2)) 
         except Exception as e:
             print(f"Title icon error: {e}")
         
-        tk.Label(left_frame, text="QuickBar", bg=colors["header"], fg=colors["subtext"], 
-                font=("Segoe UI", 8, "bold")).pack(side="left", padx=(1, 0))
+        style(tk.Label(left_frame, text="QuickBar", font=("Segoe UI", 8, "bold")),
+              bg="header", fg="subtext").pack(side="left", padx=(1, 0))
 
         
         # 右侧操作按钮容器
-        btn_frame = tk.Frame(header, bg=colors["header"])
+        btn_frame = style(tk.Frame(header), bg="header")
         btn_frame.pack(side="right", fill="y")
 
         # 1. 关闭按钮
-        btn_close = tk.Label(btn_frame, text="×", bg=colors["header"], fg=colors["subtext"], 
-                            font=("Segoe UI", 11), cursor="hand2", width=3)
+        btn_close = style(tk.Label(btn_frame, text="×", font=("Segoe UI", 11), cursor="hand2", width=3),
+                          bg="header", fg="subtext")
         btn_close.pack(side="right", fill="y")
         btn_close.bind("<Button-1>", lambda e: [self.quit_app(), "break"][-1])
         btn_close.bind("<Enter>", lambda e: btn_close.config(bg="#e81123", fg="white"))
         btn_close.bind("<Leave>", lambda e: btn_close.config(bg=colors["header"], fg=colors["subtext"]))
 
         # 2. 最小化按钮
-        btn_min = tk.Label(btn_frame, text="—", bg=colors["header"], fg=colors["subtext"], 
-                          font=("Segoe UI", 7), cursor="hand2", width=3)
+        btn_min = style(tk.Label(btn_frame, text="—", font=("Segoe UI", 7), cursor="hand2", width=3),
+                        bg="header", fg="subtext")
         btn_min.pack(side="right", fill="y")
         # 使用 lambda 和 after 确保事件处理更可靠
         btn_min.bind("<Button-1>", lambda e: [self.root.after(10, self.minimize_app), "break"][-1])
         btn_min.bind("<Enter>", lambda e: btn_min.config(bg=colors["btn_hover"]))
         btn_min.bind("<Leave>", lambda e: btn_min.config(bg=colors["header"]))
 
-        # 3. 主题切换按钮
-        theme_canvas = tk.Canvas(btn_frame, bg=colors["header"], width=24, height=26, highlightthickness=0, cursor="hand2")
+        # 3. 主题切换按钮（图标随主题变化）
+        theme_canvas = style(tk.Canvas(btn_frame, width=24, height=26, highlightthickness=0, cursor="hand2"),
+                             bg="header")
         theme_canvas.pack(side="right", fill="y")
-        theme_icon = "\uE708" if self.current_theme.get() == "Dark" else "\uE706"
-        theme_canvas.create_text(12, 13, text=theme_icon, fill=colors["subtext"], font=("Segoe MDL2 Assets", 9), anchor="center")
+        theme_item = theme_canvas.create_text(12, 13, font=("Segoe MDL2 Assets", 9), anchor="center")
+        self.theme.style_item(theme_canvas, theme_item, fill="subtext")
+        def update_theme_icon():
+            theme_canvas.itemconfigure(theme_item, text="\uE708" if self.current_theme.get() == "Dark" else "\uE706")
+        update_theme_icon()
+        self.theme.on_change(update_theme_icon)
         
         def on_theme_enter(e): theme_canvas.configure(bg=colors["btn_hover"])
         def on_theme_leave(e): theme_canvas.configure(bg=colors["header"])
@@ -981,16 +1234,16 @@ class QuickBarApp:
         theme_canvas.bind("<Leave>", on_theme_leave)
         theme_canvas.bind("<Button-1>", lambda e: [self.toggle_theme(), "break"][-1])
 
-        # 4. 置顶按钮
-        top_canvas = tk.Canvas(btn_frame, bg=colors["header"], width=24, height=26, highlightthickness=0, cursor="hand2")
+        # 4. 置顶按钮（图标与颜色随置顶状态变化，见 _update_topmost_button）
+        top_canvas = style(tk.Canvas(btn_frame, width=24, height=26, highlightthickness=0, cursor="hand2"),
+                           bg="header")
         top_canvas.pack(side="right", fill="y")
         
-        is_pinned = self.is_topmost.get()
-        top_icon = "\uE840" if is_pinned else "\uE718"
-        top_color = colors["active"] if is_pinned else colors["subtext"]
-        
         # 居中显示图标 (width=24, 中心点=12)
-        top_canvas.create_text(12, 13, text=top_icon, fill=top_color, font=("Segoe MDL2 Assets", 9), anchor="center")
+        self.top_canvas = top_canvas
+        self.top_icon_item = top_canvas.create_text(12, 13, font=("Segoe MDL2 Assets", 9), anchor="center")
+        self._update_topmost_button()
+        self.theme.on_change(self._update_topmost_button)
         
         def on_top_enter(e): top_canvas.configure(bg=colors["btn_hover"])
         def on_top_leave(e): top_canvas.configure(bg=colors["header"])
@@ -1000,22 +1253,23 @@ class QuickBarApp:
             self.is_topmost.set(not self.is_topmost.get())
             self.root.attributes("-topmost", self.is_topmost.get())
             self.save_config()
-            self.setup_ui()
+            self.update_ui("toggle_topmost")
             return "break"
         top_canvas.bind("<Button-1>", toggle_top)
-        ToolTip(top_canvas, "切换窗口置顶")
+        self.tooltips.attach(top_canvas, "切换窗口置顶")
 
 
         # 1. 顶部模式选择区 (图标化切换)
-        top_frame = tk.Frame(container, bg=colors["bg"])
+        top_frame = style(tk.Frame(container), bg="bg")
         top_frame.pack(fill="x", padx=10, pady=(10, 5))
+        self.target_frame = top_frame
         
         # IDE 切换
-        ide_scroll = tk.Frame(top_frame, bg=colors["bg"])
+        ide_scroll = style(tk.Frame(top_frame), bg="bg")
         ide_scroll.pack(fill="x")
         
-        # 将显示用图标存入 cache 以免 GC
-        self.ui_icons = {}
+        # 图标由 icon_atlas 持有；icon_labels 记录图标 Label，主题切换后换上随主题着色的图标
+        self.icon_labels = {}
         
         ide_map = {
             "VS Code": "vscode",
@@ -1024,10 +1278,9 @@ class QuickBarApp:
         }
 
         for ide, cache_key in ide_map.items():
-            is_active = (self.current_ide.get() == ide)
-            f = tk.Frame(ide_scroll, bg=colors["header"],
-                         highlightbackground=colors["active"] if is_active else colors["header"],
-                         highlightthickness=1, bd=0, cursor="hand2")
+            # 选中高亮（边框与文字颜色）由 _update_selection_visuals 设置
+            f = style(tk.Frame(ide_scroll, highlightthickness=1, bd=0, cursor="hand2"),
+                      bg="header", highlightbackground="header")
 
 
             f.pack(side="left", expand=True, fill="x", padx=2)
@@ -1035,33 +1288,18 @@ class QuickBarApp:
             
             # 尝试加载图标
             try:
-                if cache_key in self.icon_cache:
-                    # 从内存缓存获取基础图像
-                    img = self.icon_cache[cache_key].copy()
-                    img = img.resize((16, 16), Image.LANCZOS)
-                    
-                    # 动态处理
-                    if ide == "Native CLI" and self.current_theme.get() == "Light":
-                        pixels = img.load()
-                        for y in range(img.height):
-                            for x in range(img.width):
-                                r, g, b, a = pixels[x, y]
-                                if r > 200 and g > 200 and b > 200 and a > 100:
-                                    pixels[x, y] = (80, 80, 80, a)
-                    
-                    photo = ImageTk.PhotoImage(img)
-                    self.ui_icons[ide] = photo
-                    lbl = tk.Label(f, image=photo, bg=colors["header"], cursor="hand2", padx=6, pady=4)
+                photo = self.icon_atlas.photo(cache_key, 16)
+                if photo:
+                    lbl = style(tk.Label(f, image=photo, cursor="hand2", padx=6, pady=4), bg="header")
+                    self.icon_labels[ide] = (lbl, cache_key)
 
                 else:
-                    lbl = tk.Label(f, text=ide[:2], bg=colors["header"], 
-                                  fg=colors["text_active"] if is_active else colors["subtext"], 
-                                  font=("Segoe UI", 9, "bold"), cursor="hand2")
+                    lbl = style(tk.Label(f, text=ide[:2], font=("Segoe UI", 9, "bold"), cursor="hand2"),
+                                bg="header", fg="subtext")
             except Exception as e:
                 print(f"IDE 图标渲染失败 ({ide}): {e}")
-                lbl = tk.Label(f, text=ide[:2], bg=colors["header"], 
-                              fg=colors["text_active"] if is_active else colors["subtext"], 
-                              font=("Segoe UI", 9, "bold"), cursor="hand2")
+                lbl = style(tk.Label(f, text=ide[:2], font=("Segoe UI", 9, "bold"), cursor="hand2"),
+                            bg="header", fg="subtext")
             
             lbl.pack(fill="x")
 
@@ -1073,98 +1311,64 @@ class QuickBarApp:
                 lbl._val = ide
                 lbl._val_type = 'ide'
                 widget.bind("<Button-1>", lambda e, n=ide: self.set_ide(n))
-                ToolTip(widget, ide) # 同时为 Frame 和 Label 绑定 ToolTip
-
-
-
-
-        # AI 切换
-        if self.current_ide.get() != "Native CLI":
-            ai_frame = tk.Frame(container, bg=colors["bg"])
-            ai_frame.pack(fill="x", padx=10, pady=2)
-            
-            # AI 图标映射
-            ai_icon_files = {
-                "Claude": os.path.join(ASSETS_DIR, "Claude.png"),
-                "Codex": os.path.join(ASSETS_DIR, "Codex.png"),
-                "Antigravity": os.path.join(ASSETS_DIR, "Antigravity.png")
-            }
-
-            for ai in self.target_settings[self.current_ide.get()].keys():
-                is_active = (self.current_ai.get() == ai)
-                # 使用 Frame 包装以实现边框效果
-                af = tk.Frame(ai_frame, bg=colors["header"], 
-                              highlightbackground=colors["active"] if is_active else colors["header"],
-                              highlightthickness=1, bd=0, cursor="hand2")
-                af.pack(side="left", expand=True, fill="x", padx=2)
-                
-                # 尝试加载 AI 图标
-                ai_key = ai.lower()
-                if ai_key in self.icon_cache:
-                    try:
-                        ai_img = self.icon_cache[ai_key].copy().resize((16, 16), Image.LANCZOS)
-                        
-                        if ai == "Codex" and self.current_theme.get() == "Dark":
-                            pixels = ai_img.load()
-                            for y in range(ai_img.height):
-                                for x in range(ai_img.width):
-                                    r, g, b, a = pixels[x, y]
-                                    if r < 100 and g < 100 and b < 100 and a > 100:
-                                        pixels[x, y] = (200, 200, 200, a)
-                        
-                        ai_photo = ImageTk.PhotoImage(ai_img)
-                        self.ui_icons[f"ai_{ai}"] = ai_photo
-                        b = tk.Label(af, image=ai_photo, bg=colors["header"], cursor="hand2", padx=6, pady=4)
-                    except:
-                        b = tk.Label(af, text=ai, bg=colors["header"], 
-                                    fg=colors["text_active"] if is_active else colors["subtext"], 
-                                    font=("Segoe UI", 7, "bold" if is_active else "normal"),
-                                    padx=8, pady=4, cursor="hand2")
-                else:
-                    b = tk.Label(af, text=ai, bg=colors["header"], 
-                                fg=colors["text_active"] if is_active else colors["subtext"], 
-                                font=("Segoe UI", 7, "bold" if is_active else "normal"),
-                                padx=6, pady=2, cursor="hand2")
-
-                b.pack(fill="x")
-                # 为 Frame 和 Label 同时绑定点击和 ToolTip
-                for widget in (af, b):
-                    # 在 Label 上标记值，以便 _update_selection_visuals 局部定位
-                    b._val = ai
-                    b._val_type = 'ai'
-                    widget.bind("<Button-1>", lambda e, n=ai: self.set_ai(n))
-                    ToolTip(widget, ai)
+                self.tooltips.attach(widget, ide) # 同时为 Frame 和 Label 登记提示
 
 
 
 
+        # AI 切换（以 AI 名称为键保留按钮，切换 IDE 时只增删不同的部分）
+        self.ai_frame = style(tk.Frame(container), bg="bg")
+        self.ai_buttons = {}
+        self._sync_ai_buttons()
+        self._update_selection_visuals()
+        self.theme.on_change(self._refresh_target_icons)
+        self.theme.on_change(self._update_selection_visuals)
 
         # 2. 中间指令列表区 (取消 expand，方便高度自适应)
-        self.cmd_container = tk.Frame(container, bg=colors["bg"])
+        search_frame = style(tk.Frame(container), bg="btn")
+        search_frame.pack(fill="x", pady=(6, 0), padx=12)
+        style(tk.Label(search_frame, text="\uE721", font=("Segoe MDL2 Assets", 9), padx=4),
+              bg="btn", fg="subtext").pack(side="left")
+        search_entry = style(tk.Entry(search_frame, textvariable=self.search_var, relief="flat", bd=0,
+                                      font=("Microsoft YaHei", 9)),
+                             bg="btn", fg="text", insertbackground="text")
+        search_entry.pack(side="left", fill="x", expand=True, ipady=3)
+        # 回车发送排在最前的结果，Esc 清空查询
+        search_entry.bind("<Return>", lambda e: [self._send_top_search_hit(), "break"][-1])
+        search_entry.bind("<Escape>", lambda e: [self.search_var.set(""), "break"][-1])
+        self.tooltips.attach(search_entry, self.t("search_tip"))
+
+        self.cmd_container = style(tk.Frame(container), bg="bg")
         self.cmd_container.pack(fill="x", expand=False, pady=5, padx=10)
+        # 全部指令按钮画在同一个 Canvas 上，只创建视口内的按钮；点击、右键、悬停按位置分发
+        self.cmd_list = CommandListView(self.cmd_container, colors,
+                                        self.root.winfo_screenheight() - CMD_LIST_RESERVED_HEIGHT,
+                                        on_press=self._on_cmd_press, on_motion=self.do_drag,
+                                        on_release=self.stop_drag, on_context=self._on_cmd_context,
+                                        on_hover=self._on_cmd_hover)
+        self.theme.on_change(self.cmd_list.restyle)
         self.refresh_cmd_list()
 
 
         # 3. 底部集成工具栏 (回归自然布局，通过非对称 pady 实现像素级对齐)
-        footer = tk.Frame(container, bg=colors["header"])
+        footer = style(tk.Frame(container), bg="header")
         footer.pack(fill="x", side="bottom")
 
         # 1. 自动发送组 (最左侧)
-        auto_frame = tk.Frame(footer, bg=colors["header"])
+        auto_frame = style(tk.Frame(footer), bg="header")
         auto_frame.pack(side="left", padx=(5, 0))
         
-        is_auto = self.auto_send.get()
-        # 使用更通用的 Unicode 复选框字符
-        check_icon = "☑" if is_auto else "☐"
-        check_color = colors["active"] if is_auto else colors["subtext"]
-        
-        check_box = tk.Label(auto_frame, text=check_icon, bg=colors["header"], fg=check_color,
-                            font=("Segoe UI Symbol", 12), cursor="hand2", padx=0, bd=0)
+        # 使用更通用的 Unicode 复选框字符（图标与颜色随勾选状态变化，见 _update_auto_send_check）
+        check_box = style(tk.Label(auto_frame, font=("Segoe UI Symbol", 12), cursor="hand2", padx=0, bd=0),
+                          bg="header")
         # 视觉修正：复选框字体偏下，通过 pady 上移 3 像素
         check_box.pack(side="left", pady=(4, 6))
+        self.auto_check = check_box
+        self._update_auto_send_check()
+        self.theme.on_change(self._update_auto_send_check)
         
-        auto_lbl = tk.Label(auto_frame, text="发送", bg=colors["header"], fg=colors["subtext"], 
-                          font=("Microsoft YaHei", 8), cursor="hand2", padx=0, bd=0)
+        auto_lbl = style(tk.Label(auto_frame, text="发送", font=("Microsoft YaHei", 8), cursor="hand2", padx=0, bd=0),
+                         bg="header", fg="subtext")
         # 视觉修正：文字恢复完全垂直居中 (5, 5)
         auto_lbl.pack(side="left", padx=(2, 0), pady=5) 
         
@@ -1172,62 +1376,120 @@ class QuickBarApp:
             self.auto_send.set(not self.auto_send.get())
             self.save_config()
             # 只刷新复选框图标，避免重建整个UI导致闪动
-            new_icon = "☑" if self.auto_send.get() else "☐"
-            new_color = colors["active"] if self.auto_send.get() else colors["subtext"]
-            check_box.config(text=new_icon, fg=new_color)
+            self.update_ui("toggle_auto_send")
             return "break"
         
         def on_auto_enter(e, lbl=auto_lbl, cb=check_box, c=colors):
             lbl.config(fg=c["active"])
             cb.config(fg=c["active"])
             
-        def on_auto_leave(e, lbl=auto_lbl, cb=check_box, c=colors, cc=check_color):
+        def on_auto_leave(e, lbl=auto_lbl, cb=check_box, c=colors):
             lbl.config(fg=c["subtext"])
-            cb.config(fg=cc)
+            cb.config(fg=c["active"] if self.auto_send.get() else c["subtext"])
 
         for w in (check_box, auto_lbl):
             w.bind("<Button-1>", toggle_auto)
             w.bind("<Enter>", on_auto_enter)
             w.bind("<Leave>", on_auto_leave)
 
-        ToolTip(auto_frame, "发送命令后自动紧接 Enter 键")
+        self.tooltips.attach(auto_frame, "发送命令后自动紧接 Enter 键")
 
         # 1.5 讯飞模式状态显示 (赋予 ID 以便局部刷新)
-        self.ifly_status_container = tk.Frame(footer, bg=colors["header"])
+        self.ifly_status_container = style(tk.Frame(footer), bg="header")
         self.ifly_status_container.pack(side="left", padx=(12, 0))
         self.update_ifly_status_display()
         
         # 修正：所有右侧图标统一采用 (8, 3) 的下沉比例，确保与左侧文字齐平
         # 4. 设置按钮（最右）
-        set_btn = tk.Label(footer, text="\uE713", bg=colors["header"], fg=colors["subtext"],
-                          font=("Segoe MDL2 Assets", 9), cursor="hand2", padx=4, pady=5)
+        set_btn = style(tk.Label(footer, text="\uE713", font=("Segoe MDL2 Assets", 9), cursor="hand2", padx=4, pady=5),
+                        bg="header", fg="subtext")
         set_btn.pack(side="right", padx=(0, 2))
         set_btn.bind("<Button-1>", lambda e: [self.open_settings(), "break"][-1])
         set_btn.bind("<Enter>", lambda e, w=set_btn: w.config(fg=colors["active"]))
         set_btn.bind("<Leave>", lambda e, w=set_btn: w.config(fg=colors["subtext"]))
-        ToolTip(set_btn, "打开设置")
+        self.tooltips.attach(set_btn, "打开设置")
 
         # 3. 校准按钮（中间）
-        cal_btn = tk.Label(footer, text="\uE81D", bg=colors["header"], fg=colors["subtext"],
-                          font=("Segoe MDL2 Assets", 9), cursor="hand2", padx=4, pady=5)
+        cal_btn = style(tk.Label(footer, text="\uE81D", font=("Segoe MDL2 Assets", 9), cursor="hand2", padx=4, pady=5),
+                        bg="header", fg="subtext")
         cal_btn.pack(side="right", padx=(0, 2))
         cal_btn.bind("<Button-1>", lambda e: [self.start_calibration(), "break"][-1])
         cal_btn.bind("<Enter>", lambda e, w=cal_btn: w.config(fg=colors["active"]))
         cal_btn.bind("<Leave>", lambda e, w=cal_btn: w.config(fg=colors["subtext"]))
-        ToolTip(cal_btn, "输入框校准")
+        self.tooltips.attach(cal_btn, "输入框校准")
 
         # 2. 加号按钮（最左）
-        add_btn = tk.Label(footer, text="\uE710", bg=colors["header"], fg=colors["subtext"], 
-                          font=("Segoe MDL2 Assets", 9), cursor="hand2", padx=4, pady=5)
+        add_btn = style(tk.Label(footer, text="\uE710", font=("Segoe MDL2 Assets", 9), cursor="hand2", padx=4, pady=5),
+                        bg="header", fg="subtext")
         add_btn.pack(side="right", padx=(0, 2))
         add_btn.bind("<Button-1>", lambda e: [self.add_command_dialog(), "break"][-1])
         add_btn.bind("<Enter>", lambda e, w=add_btn: w.config(fg=colors["active"]))
         add_btn.bind("<Leave>", lambda e, w=add_btn: w.config(fg=colors["subtext"]))
-        ToolTip(add_btn, "添加新指令")
+        self.tooltips.attach(add_btn, "添加新指令")
         
         self.auto_adjust_height()
 
 
+    def _refresh_target_icons(self):
+        """主题切换后换上随主题着色的图标（图集淘汰旧主题的变体）"""
+        if not self.icon_atlas.set_theme(self.theme.name): return
+        for icon_key, (lbl, cache_key) in list(self.icon_labels.items()):
+            if not self.icon_atlas.themed(cache_key): continue
+            try:
+                lbl.config(image=self.icon_atlas.photo(cache_key, 16))
+            except tk.TclError:
+                self.icon_labels.pop(icon_key, None)
+
+    def _sync_ai_buttons(self):
+        """按当前 IDE 的 AI 列表增删 AI 切换按钮并保持顺序；Native CLI 下隐藏整行"""
+        ide = self.current_ide.get()
+        wanted = [] if ide == "Native CLI" else list(self.target_settings[ide].keys())
+        for ai in [a for a in self.ai_buttons if a not in wanted]:
+            self.ai_buttons.pop(ai).destroy()
+            self.icon_labels.pop(f"ai_{ai}", None)
+        for ai in wanted:
+            if ai not in self.ai_buttons:
+                self.ai_buttons[ai] = self._create_ai_button(ai)
+        frames = [self.ai_buttons[ai] for ai in wanted]
+        if self.ai_frame.pack_slaves() != frames:
+            for af in frames: af.pack_forget()
+            for af in frames: af.pack(side="left", expand=True, fill="x", padx=2)
+        if not frames:
+            self.ai_frame.pack_forget()
+        elif not self.ai_frame.winfo_manager():
+            self.ai_frame.pack(fill="x", padx=10, pady=2, after=self.target_frame)
+
+    def _create_ai_button(self, ai):
+        style = self.theme.style
+        is_active = (self.current_ai.get() == ai)
+        # 使用 Frame 包装以实现边框效果（选中高亮由 _update_selection_visuals 设置）
+        af = style(tk.Frame(self.ai_frame, highlightthickness=1, bd=0, cursor="hand2"),
+                   bg="header", highlightbackground="header")
+        
+        # 尝试加载 AI 图标
+        ai_key = ai.lower()
+        if ai_key in self.icon_cache:
+            try:
+                ai_photo = self.icon_atlas.photo(ai_key, 16)
+                b = style(tk.Label(af, image=ai_photo, cursor="hand2", padx=6, pady=4), bg="header")
+                self.icon_labels[f"ai_{ai}"] = (b, ai_key)
+            except:
+                b = style(tk.Label(af, text=ai, font=("Segoe UI", 7, "bold" if is_active else "normal"),
+                                   padx=8, pady=4, cursor="hand2"), bg="header", fg="subtext")
+        else:
+            b = style(tk.Label(af, text=ai, font=("Segoe UI", 7, "bold" if is_active else "normal"),
+                               padx=6, pady=2, cursor="hand2"), bg="header", fg="subtext")
+
+        b.pack(fill="x")
+        # 为 Frame 和 Label 同时绑定点击并登记提示
+        for widget in (af, b):
+            # 在 Label 上标记值，以便 _update_selection_visuals 局部定位
+            b._val = ai
+            b._val_type = 'ai'
+            widget.bind("<Button-1>", lambda e, n=ai: self.set_ai(n))
+            self.tooltips.attach(widget, ai)
+        return af
+
     def update_ifly_status_display(self):
         """局部刷新：仅更新底栏讯飞状态，不影响其他组件"""
         if not hasattr(self, 'ifly_status_container'): return
@@ -1236,15 +1498,15 @@ class QuickBarApp:
         for w in self.ifly_status_container.winfo_children(): w.destroy()
         
         if self.win_h_action.get() == "ifly":
-            colors = self.themes[self.current_theme.get()]
-            tk.Label(self.ifly_status_container, text="\uE720", bg=colors["header"], fg=colors["active"],
-                     font=("Segoe MDL2 Assets", 9), padx=0, bd=0).pack(side="left", pady=(6, 5)) 
-            tk.Label(self.ifly_status_container, text="讯飞", bg=colors["header"], fg=colors["subtext"],
-                     font=("Microsoft YaHei", 8), padx=0, bd=0).pack(side="left", fill="y", padx=(2, 0), pady=5) 
-            ToolTip(self.ifly_status_container, "当前 Win+H 已映射至讯飞语音")
+            style = self.theme.style
+            style(tk.Label(self.ifly_status_container, text="\uE720", font=("Segoe MDL2 Assets", 9), padx=0, bd=0),
+                  bg="header", fg="active").pack(side="left", pady=(6, 5)) 
+            style(tk.Label(self.ifly_status_container, text="讯飞", font=("Microsoft YaHei", 8), padx=0, bd=0),
+                  bg="header", fg="subtext").pack(side="left", fill="y", padx=(2, 0), pady=5) 
+            self.tooltips.attach(self.ifly_status_container, "当前 Win+H 已映射至讯飞语音")
         else:
             # 系统模式下隐藏容器
-            pass
+            self.tooltips.detach(self.ifly_status_container)
 
     def _refresh_settings_ui(self):
         """原地刷新设置窗口内容，不改变窗口位置且不闪烁"""
@@ -1472,7 +1734,7 @@ class QuickBarApp:
             self.language.set(val)
             self.save_config()
             # 语言切换必须全量重绘界面以刷新翻译
-            self.setup_ui()
+            self.update_ui("language")
 
         for val, label in lang_options:
             is_selected = self.language.get() == val
@@ -1503,11 +1765,10 @@ class QuickBarApp:
                 try:
                     with open(file_path, "r", encoding="utf-8") as f:
                         imported = json.load(f)
-                    self.config_data = imported
-                    self.save_config()
+                    self._replace_config(imported)
                     messagebox.showinfo("QuickBar", self.t("import_success"))
                     win.destroy()
-                    self.setup_ui()
+                    self.update_ui("import_config")
                 except Exception as e:
                     messagebox.showerror("Error", str(e))
         
@@ -1521,8 +1782,10 @@ class QuickBarApp:
             )
             if file_path:
                 try:
+                    self._collect_state()
+                    data = dict(self.config_data, commands=command_store.strip_ids(self.commands))
                     with open(file_path, "w", encoding="utf-8") as f:
-                        json.dump(self.config_data, f, ensure_ascii=False, indent=4)
+                        json.dump(data, f, ensure_ascii=False, indent=4)
                     messagebox.showinfo("QuickBar", self.t("export_success"))
                 except Exception as e:
                     messagebox.showerror("Error", str(e))
@@ -1544,11 +1807,9 @@ class QuickBarApp:
         
         # 在版本文字前显示图标
         try:
-            if "app" in self.icon_cache:
-                s_img = self.icon_cache["app"].copy().resize((14, 14), Image.LANCZOS)
-                s_photo = ImageTk.PhotoImage(s_img)
+            s_photo = self.icon_atlas.photo("app", 14)
+            if s_photo:
                 s_lbl = tk.Label(bottom_frame, image=s_photo, bg=colors["bg"])
-                s_lbl.image = s_photo
                 s_lbl.pack(side="left", padx=(0, 5))
         except: pass
 
@@ -1564,79 +1825,65 @@ class QuickBarApp:
 
 
     def refresh_cmd_list(self):
-        """刷新指令按钮列表并绑定交互事件 (Canvas 绘制圆角，支持自适应)"""
-        for widget in self.cmd_container.winfo_children(): widget.destroy()
-        colors = self.themes[self.current_theme.get()]
+        """刷新指令列表（虚拟化列表只重画视口内的按钮，耗时与指令总数无关）"""
+        self.visible_commands = self._visible_commands()
         
         # 根据设置决定列数
         col_setting = self.column_count.get()
         if col_setting == "auto":
             # 自动模式：超过 10 个用双列
-            num_columns = 2 if len(self.commands) > 10 else 1
+            num_columns = 2 if len(self.visible_commands) > 10 else 1
         else:
             num_columns = int(col_setting)
-        
-        # 预创建一个虚线框占位符（使用 Toplevel 窗口确保显示在最上层）
-        self.placeholder = None
-        self.placeholder_visible = False
-        
-        # 配置 grid 列权重
-        for col in range(num_columns):
-            self.cmd_container.columnconfigure(col, weight=1)
-        else:
-            self.cmd_container.columnconfigure(0, weight=1)
-        
-        for idx, cmd in enumerate(self.commands):
-            # 计算行列位置
-            row = idx // num_columns
-            col = idx % num_columns
-            
-            btn_canvas = tk.Canvas(self.cmd_container, bg=colors["bg"], height=38, highlightthickness=0, cursor="hand2")
-            
-            if num_columns > 1:
-                btn_canvas.grid(row=row, column=col, sticky="ew", pady=2, padx=2)
-            else:
-                btn_canvas.grid(row=row, column=0, sticky="ew", pady=2)
-            
-            # 使用列表存储 ID 以便在 resize 时更新
-            refs = {"rect": None, "text": None}
-            
-            def draw_btn(e, c=btn_canvas, name=cmd['name'], r=refs):
-                c.delete("all")
-                w = e.width
-                if w > 10:
-                    # 绘制带边框的圆角矩形，初始边框与背景同色（透明效果）
-                    r["rect"] = self._draw_rounded_rect(c, 2, 2, w-4, 32, radius=6, fill=colors["btn"], outline=colors["btn"])
-                    r["text"] = c.create_text(w/2, 17, text=name, fill=colors["text"], font=("Microsoft YaHei", 9))
-
-            btn_canvas.bind("<Configure>", draw_btn)
-            
-            # 悬停动效（含边框颜色变化）
-            def on_enter(e, c=btn_canvas, r=refs):
-                if r["rect"]: 
-                    c.itemconfigure(r["rect"], fill=colors["btn_hover"], outline=colors["active"])
-                if r["text"]: 
-                    c.itemconfigure(r["text"], fill=colors["text_active"])
-                
-            def on_leave(e, c=btn_canvas, r=refs):
-                if r["rect"]: 
-                    c.itemconfigure(r["rect"], fill=colors["btn"], outline=colors["btn"])
-                if r["text"]: 
-                    c.itemconfigure(r["text"], fill=colors["text"])
 
-            btn_canvas.bind("<Enter>", on_enter)
-            btn_canvas.bind("<Leave>", on_leave)
+        empty_text = self.t("search_no_match") if self.search_var.get().strip() else ""
+        self.cmd_list.set_items([cmd['name'] for _, cmd in self.visible_commands], num_columns, empty_text)
 
-            
-            # 绑定拖拽逻辑
-            btn_canvas.bind("<Button-1>", lambda e, i=idx, c=cmd: self.start_drag(e, i, c))
-            btn_canvas.bind("<B1-Motion>", self.do_drag)
-            btn_canvas.bind("<ButtonRelease-1>", self.stop_drag)
-            btn_canvas.bind("<Button-3>", lambda e, c=cmd, i=idx: self.show_context_menu(e, c, i))
+    def _on_cmd_press(self, event, pos):
+        idx, cmd = self.visible_commands[pos]
+        return self.start_drag(event, idx, cmd)
 
-            
-            ToolTip(btn_canvas, cmd['text'])
+    def _on_cmd_context(self, event, pos):
+        idx, cmd = self.visible_commands[pos]
+        self.show_context_menu(event, cmd, idx)
+        return "break"
+
+    def _on_cmd_hover(self, pos, area):
+        if pos is None:
+            self.tooltips.hide()
+            return
+        # 提示显示时才读取指令内容（过长时由提示管理器截断）
+        cmd = self.visible_commands[pos][1]
+        self.tooltips.schedule(self.cmd_list.canvas, lambda: cmd.get('text', ''), area)
+
+    # --- 指令搜索 ---
+    def _command_index(self):
+        """当前指令列表的搜索索引（懒创建；指令较多时后台构建倒排索引，构建完成前先用扫描）"""
+        if self.search_index is None:
+            self.search_index = command_search.CommandIndex(self.commands).start_build()
+        return self.search_index
+
+    def _visible_commands(self):
+        """要显示的 (commands 下标, 指令)：无查询时为全部指令，否则为前 SEARCH_RESULT_LIMIT 个匹配"""
+        query = self.search_var.get()
+        if not query.strip():
+            return list(enumerate(self.commands))
+        try:
+            top, _, _ = self._command_index().query(query, SEARCH_RESULT_LIMIT)
+        except Exception as e:
+            logger.error(f"指令搜索失败: {e}")
+            return []
+        return [(i, self.commands[i]) for i in top]
 
+    def _on_search_changed(self):
+        if not hasattr(self, "cmd_container") or not self.cmd_container.winfo_exists(): return
+        self.refresh_cmd_list()
+        self.auto_adjust_height()
+
+    def _send_top_search_hit(self):
+        visible = self._visible_commands()
+        if visible:
+            self.send_to_target(visible[0][1])
 
     # --- 改进后的拖拽排序逻辑 ---
     def start_drag(self, event, idx, cmd):
@@ -1672,8 +1919,9 @@ class QuickBarApp:
         
         colors = self.themes[self.current_theme.get()]
         
-        # 检测是否开始真正拖拽（移动超过 5 像素）
-        if not self.is_real_drag and abs(event.y_root - self.drag_y_root_start) > 5:
+        # 检测是否开始真正拖拽（移动超过 5 像素）；搜索过滤时显示的并非完整列表，不支持拖动排序
+        if (not self.is_real_drag and not self.search_var.get().strip()
+                and abs(event.y_root - self.drag_y_root_start) > 5):
             self.is_real_drag = True
             # 创建浮动拖拽预览窗口
             self._create_drag_preview(colors)
@@ -1709,113 +1957,23 @@ class QuickBarApp:
         preview_canvas.create_text(preview_w/2, 18, text=cmd_name, 
                                    fill=colors["text_active"], font=("Microsoft YaHei", 9, "bold"))
         
-        # 隐藏原按钮（透明化）
-        self.drag_obj.config(bg=colors["bg"])
-        self.drag_obj.delete("all")
+        # 隐藏原按钮（拖拽只在未搜索时可用，此时显示位置即指令下标）
+        self.tooltips.hide()
+        self.cmd_list.hide_item(self.drag_start_idx)
     
     def _update_drop_indicator(self, event):
-        """更新蓝色横线指示器位置"""
-        colors = self.themes[self.current_theme.get()]
-        
-        # 获取容器内所有按钮（包括被拖拽的，但标记其位置）
-        all_buttons = []
-        drag_visual_idx = -1
-        btn_idx = 0
-        for child in self.cmd_container.winfo_children():
-            if child == self.placeholder:
-                continue
-            if child == self.drag_obj:
-                drag_visual_idx = btn_idx
-                btn_idx += 1
-                continue
-            all_buttons.append((btn_idx, child))
-            btn_idx += 1
-        
-        # 计算鼠标在容器内的相对 Y 坐标
-        container_y = self.cmd_container.winfo_rooty()
-        mouse_y = event.y_root - container_y
-        
-        # 找到目标插入位置（在原始列表中的位置）
-        # target_idx 表示：在原始 commands 列表中，插入到这个索引之前
-        target_idx = 0
-        line_y = 0
-        
-        if not all_buttons:
-            # 只有一个按钮（被拖拽的那个）
-            self.drag_target_idx = 0
-            return
-        
-        # 计算插入位置和虚线框显示位置
-        target_btn = None  # 目标位置的参考按钮
-        for i, (visual_idx, btn) in enumerate(all_buttons):
-            btn_y = btn.winfo_y()
-            btn_h = btn.winfo_height()
-            btn_center = btn_y + btn_h / 2
-            
-            if mouse_y > btn_center:
-                # 插入到这个按钮下方
-                target_idx = i + 1
-                # 虚线框显示在下一个按钮位置（如果有的话）
-                if i + 1 < len(all_buttons):
-                    target_btn = all_buttons[i + 1][1]
-                else:
-                    target_btn = btn  # 最后位置，用最后一个按钮参考
-            else:
-                # 插入到这个按钮上方
-                target_idx = i
-                target_btn = btn
-                break
-        else:
-            # 遍历完了，说明在最后一个按钮下方
-            target_idx = len(all_buttons)
-            if all_buttons:
-                target_btn = all_buttons[-1][1]
-        
-        # 将 target_idx 转换为原始列表位置
-        if target_idx >= self.drag_start_idx:
-            self.drag_target_idx = target_idx + 1
-        else:
-            self.drag_target_idx = target_idx
-        
-        # 显示横线指示器（显示在按钮之间的缝隙处）
-        if target_btn:
-            colors = self.themes[self.current_theme.get()]
-            container_w = self.cmd_container.winfo_width()
-            ph_width = container_w - 14
-            ph_height = 3  # 简单横线
-            
-            # 计算横线在屏幕上的绝对位置
-            container_x = self.cmd_container.winfo_rootx()
-            container_y = self.cmd_container.winfo_rooty()
-            
-            if target_idx >= len(all_buttons):
-                # 放在最后：在最后一个按钮下方
-                box_y = target_btn.winfo_y() + target_btn.winfo_height() + 2
-            else:
-                # 放在目标按钮上方（缝隙处）
-                box_y = target_btn.winfo_y() - 3
-            
-            abs_x = container_x + 7
-            abs_y = container_y + box_y
-            
-            # 创建或更新 Toplevel 横线窗口
-            if not self.placeholder:
-                self.placeholder = tk.Toplevel(self.root)
-                self.placeholder.overrideredirect(True)
-                self.placeholder.attributes("-topmost", True)
-            
-            # 更新位置、大小和颜色
-            self.placeholder.geometry(f"{ph_width}x{ph_height}+{abs_x}+{abs_y}")
-            self.placeholder.config(bg=colors["active"])
-            self.placeholder.deiconify()
+        """更新蓝色横线指示器位置（指针靠近列表上下边缘时自动滚动）"""
+        self.cmd_list.autoscroll(event.y)
+        # drag_target_idx 表示：在原始 commands 列表中，插入到这个索引之前
+        self.drag_target_idx = self.cmd_list.drop_index(event.x, event.y)
+        self.cmd_list.show_drop_line(self.drag_target_idx)
 
     def stop_drag(self, event):
         """松开鼠标：完成拖拽"""
         self.is_button_dragging = False
         
-        # 隐藏虚线框
-        if self.placeholder:
-            self.placeholder.withdraw()
+        # 隐藏指示横线
+        self.cmd_list.hide_drop_line()
         
         # 销毁浮动预览
         if hasattr(self, 'drag_preview') and self.drag_preview:
@@ -1841,7 +1999,7 @@ class QuickBarApp:
                     if to_idx > from_idx:
                         to_idx -= 1
                     self.commands.insert(to_idx, item)
-                    self.save_config()
+                    self._record_change("move", item, **{"from": from_idx, "to": to_idx})
         
         # 清理状态
         if hasattr(self, 'drag_target_idx'): 
@@ -1895,8 +2053,109 @@ class QuickBarApp:
 
     # --- 自动化工作流逻辑 ---
     def send_to_target(self, cmd):
-        """在新线程中启动自动化任务，避免界面卡死"""
-        threading.Thread(target=self._automation_task, args=(cmd,), daemon=True).start()
+        """提交到常驻自动化线程排队执行，避免界面卡死；目标在点击时确定，排队期间切换目标不影响该任务"""
+        ide, ai = self.current_ide.get(), self.current_ai.get()
+        if isinstance(cmd, str):
+            key = (ide, ai, "text", cmd)
+        else:
+            key = (ide, ai, cmd.get("type", "text"), cmd.get("send_mode", "paste"), cmd.get("text", ""))
+        self.automation_worker.submit(key, functools.partial(self._automation_task, cmd, ide, ai))
+
+    def send_broadcast(self, cmd, targets):
+        """把同一条指令广播到多个 (IDE, AI) 目标，作为一个任务排队执行"""
+        targets = [tuple(t) for t in targets if t[1] in self.target_settings.get(t[0], {})]
+        if not targets: return
+        key = ("broadcast", tuple(targets), cmd.get("type", "text"), cmd.get("text", ""))
+        self.automation_worker.submit(key, functools.partial(self._broadcast_task, cmd, targets))
+
+    def _prepare_target(self, ide, ai):
+        """
+        广播的并行阶段：解析目标窗口，并在窗口当前位置预定位锚点（不改变焦点）。返回 (句柄, 锚点的窗口相对位置或 None)。
+        此时窗口未激活、可能被遮挡，只在窗口自身范围内搜索且不记录命中位置；投递阶段激活窗口后先原位校验该位置
+        """
+        hwnd = self._find_target_hwnd(ide, ai)
+        if not hwnd:
+            raise LookupError(self.t('win_not_found'))
+        config = self.target_settings[ide][ai]
+        if ide == "Native CLI" or not os.path.exists(config.get("image", "")):
+            return hwnd, None
+        rect = win32gui.GetWindowRect(hwnd)
+        loc, _ = self.anchor_locator.locate(config, rect, (ide, ai), None, self._anchor_dpi_ratio(config, hwnd),
+                                            window_only=True, remember=False)
+        return hwnd, ([int(loc.left - rect[0]), int(loc.top - rect[1])] if loc else None)
+
+    def _broadcast_task(self, cmd, targets):
+        """串行投递阶段不逐个弹窗（否则会阻塞其余目标），失败原因记入汇总，全部完成后统一提示一次"""
+        def deliver(target, prepared):
+            errors = []
+            if not self._automation_task(cmd, *target, hint=prepared[1], errors=errors):
+                raise RuntimeError("；".join(errors) or "投递失败")
+            return True
+
+        reports = broadcast.broadcast(targets, lambda t: self._prepare_target(*t), deliver)
+        summary = broadcast.format_summary(reports)
+        logger.info(summary)
+        ok = all(r.ok for r in reports)
+        show = messagebox.showinfo if ok else messagebox.showwarning
+        self.root.after(0, lambda: show("QuickBar", summary))
+        return ok
+
+    def _task_warning(self, msg, errors, title="QuickBar"):
+        """自动化任务的失败提示：errors 为列表时（广播投递）记入列表，否则弹窗"""
+        if errors is not None:
+            errors.append(msg)
+        else:
+            messagebox.showwarning(title, msg)
+
+    def abort_macro(self):
+        """中止正在执行的宏（在当前步骤结束后生效，延时与等待步骤会立即结束）"""
+        self.macro_abort.set()
+
+    def _run_macro(self, cmd, ide, ai, errors=None):
+        """
+        在自动化线程中执行宏指令，返回是否全部步骤成功。
+        执行期间焦点在目标窗口，Esc 由低级键盘钩子捕获（见 _start_keyboard_hook）后中止宏
+        """
+        try:
+            macro = self.macro_cache.get(cmd.get("steps", []))
+        except ValueError as e:
+            self._task_warning(f"宏 [{cmd.get('name', '')}] 无效: {e}", errors)
+            return False
+        self.macro_abort.clear()
+        if win32gui: self._start_keyboard_hook()
+        executor = LiveMacroExecutor(self, ide, ai, self.macro_abort, errors)
+        old_pos = pyautogui.position()
+        self.macro_running = True
+        try:
+            result = macros.run_macro(macro, executor, self.macro_abort)
+            # 步骤之间从不发送；宏以文本步骤结束时按自动发送设置发送一次
+            if result.ok and self.auto_send.get() and macro.steps[-1].kind == "text":
+                executor.submit()
+        finally:
+            self.macro_running = False
+            pyautogui.moveTo(old_pos)
+        status = "完成" if result.ok else ("已中止" if result.aborted else "失败")
+        logger.info(f"宏 [{cmd.get('name', '')}] {status}: {len(result.steps)}/{len(macro.steps)} 步，"
+                    f"{result.elapsed_ms:.0f} ms")
+        return result.ok
+
+    def _find_target_hwnd(self, ide, ai):
+        """按注册表 -> 句柄缓存的顺序解析目标窗口句柄，找不到时返回 None"""
+        hwnd = self.window_registry.lookup(ide, ai) if self.window_registry else None
+        return hwnd or self.window_cache.resolve(ide, ai, self.target_settings[ide][ai]["win_title"])
+
+    def _pywinauto_window(self, hwnd):
+        """复用已连接的 pywinauto Application（仅在自动化线程中调用）"""
+        app = self._pywinauto_apps.get(hwnd)
+        if app is None:
+            from pywinauto import Application
+            app = self._pywinauto_apps[hwnd] = Application(backend="win32").connect(handle=hwnd)
+        return app.window(handle=hwnd)
+
+    def _forget_window(self, hwnd):
+        """窗口激活失败时丢弃该句柄的全部缓存状态"""
+        self.window_cache.invalidate(hwnd)
+        self._pywinauto_apps.pop(hwnd, None)
 
     def enable_cmd_shortcuts(self):
         """自动开启 Windows 控制台的 Ctrl+V 和右键粘贴支持"""
@@ -1907,178 +2166,213 @@ class QuickBarApp:
             winreg.SetValueEx(key, "InterceptCopyPaste", 0, winreg.REG_DWORD, 1)
             winreg.CloseKey(key)
         except: pass
-    def _automation_task(self, cmd):
-        """核心自动化流程：寻找窗口 -> 激活 -> 模拟输入"""
+
+    def _anchor_dpi_ratio(self, config, hwnd):
+        """目标窗口所在显示器 DPI 与校准时 DPI 之比，任一未知时返回 None"""
+        anchor_dpi, win_dpi = config.get("anchor_dpi"), monitor_dpi(hwnd)
+        return win_dpi / anchor_dpi if anchor_dpi and win_dpi else None
+
+    def _automation_task(self, cmd, ide=None, ai=None, hint=None, errors=None):
+        """
+        核心自动化流程：寻找窗口 -> 激活 -> 模拟输入；返回是否已完成输入。
+        hint / errors 见 _focus_target（广播投递时传入）
+        """
         if isinstance(cmd, str):
             # 兼容旧代码调用
             prompt = cmd
             cmd_type = "text"
+            send_mode = "paste"
         else:
             prompt = cmd.get("text", "")
             cmd_type = cmd.get("type", "text")
+            send_mode = cmd.get("send_mode", "paste")
+
+        ide = ide or self.current_ide.get()
+        ai = ai or self.current_ai.get()
+        if cmd_type == "macro":
+            return self._run_macro(cmd, ide, ai, errors)
 
         # 1. 立即记录原始鼠标位置（在任何窗口激活操作之前）
         old_pos = pyautogui.position()
-        
-        ide = self.current_ide.get()
-        ai = self.current_ai.get()
+        try:
+            target = self._focus_target(ide, ai, hint=hint, errors=errors)
+            if not target:
+                return False
+            self._input_to_target(target, cmd_type, prompt, send_mode, self.auto_send.get())
+            return True
+        except Exception as e:
+            print(f"自动化核心流程异常: {e}")
+            if errors is not None: errors.append(str(e))
+            return False
+        finally:
+            # 完成后返回原始位置
+            pyautogui.moveTo(old_pos)
+
+    def _focus_target(self, ide, ai, clear=True, hint=None, errors=None):
+        """
+        输入前的准备：寻找并激活目标窗口；非终端目标再定位锚点、点击输入框，clear 时清空原有内容。
+        返回供 _input_to_target 使用的目标信息 dict，失败时提示用户并返回 None。
+        宏在切换目标后只调用一次，之后的各步骤直接输入，不再重复点击和清空。
+        hint 为锚点优先原位校验的窗口相对位置（广播准备阶段的预定位结果）；
+        errors 为列表时失败原因记入列表而不弹窗，广播投递据此避免逐个目标弹出模态提示
+        """
         config = self.target_settings[ide][ai]
-        
         # 安全检查：未校准则禁止点击图标模式
         if ide != "Native CLI" and config.get("offset_x", 0) == 0 and config.get("offset_y", 0) == 0:
-            messagebox.showwarning("需要校准", f"当前目标 [{ide} -> {ai}] 尚未校准，请先点击底部的🎯按钮。")
-            return
+            self._task_warning(f"当前目标 [{ide} -> {ai}] 尚未校准，请先点击底部的🎯按钮。", errors, "需要校准")
+            return None
+
+        # 统一使用 win32gui 方案进行筛选，获得最精准的类名和可见性控制；已解析的句柄走缓存复核
+        hwnd = self._find_target_hwnd(ide, ai)
+        target_win = None
+        if hwnd:
+            try:
+                target_win = self._pywinauto_window(hwnd)
+            except:
+                self._pywinauto_apps.pop(hwnd, None)
+        if target_win is None:
+            msg = f"{self.t('win_not_found')} [{ide}]\n\n请确保它已打开，且没有被最小化（缩小到任务栏）。"
+            logger.warning(f"Window not found: {config['win_title']}")
+            self._task_warning(msg, errors)
+            return None
 
         try:
-            # 统一使用 win32gui 方案进行初次筛选，获得最精准的类名和可见性控制
-            terminal_wins = []
-            target_regex = config["win_title"]
-            
-            def filter_window(hwnd, results_tuple):
-                results_list, current_ide_mode = results_tuple
-                if not win32gui.IsWindowVisible(hwnd) or win32gui.IsIconic(hwnd):
-                    return
-                
-                title = win32gui.GetWindowText(hwnd)
-                cls = win32gui.GetClassName(hwnd)
-                
-                # 排除 QuickBar 自身
-                if title and "QuickBar" in title and cls == "TkTopLevel": return
-                
-                is_vscode_cls = (cls == "Chrome_WidgetWin_1")
-                is_cmd_cls = (cls == "ConsoleWindowClass")
-                
-                # 只要标题包含关键词，就认为是候选
-                match_title = re.search(target_regex, title, re.I)
-                
-                if current_ide_mode in ["VS Code", "Antigravity"]:
-                    # 在 IDE 模式下，必须是编辑器类窗口
-                    if is_vscode_cls and match_title:
-                        # 额外安全检查：如果标题包含 Antigravity，确保匹配的是 Antigravity 特有的标题
-                        results_list.append(hwnd)
-                        print(f"匹配到目标窗口: {title}")
-                elif current_ide_mode == "Native CLI":
-                    # CLI 模式优先根据类名匹配真正终端，或正则匹配标题
-                    if (is_cmd_cls or match_title) and not is_vscode_cls:
-                        results_list.append(hwnd)
-                        print(f"匹配到终端窗口: {title}")
-
-            # 第一轮扫描
-            matching_hwnds = []
-            win32gui.EnumWindows(filter_window, (matching_hwnds, ide))
-            
-            # 将句柄转换为 pywinauto 窗口对象
-            if matching_hwnds:
-                from pywinauto import Application
-                # 默认使用第一个找到的窗口
-                try:
-                    app = Application(backend="win32").connect(handle=matching_hwnds[0])
-                    terminal_wins.append(app.window(handle=matching_hwnds[0]))
-                except: pass
+            # 尝试多种激活方式
+            if hasattr(target_win, 'set_focus'):
+                target_win.set_focus()
+            elif win32gui:
+                win32gui.ShowWindow(hwnd, win32con.SW_RESTORE)
+                win32gui.SetForegroundWindow(hwnd)
+            self.waiter.foreground(hwnd, fixed=0.1)
+        except Exception as e:
+            print(f"激活窗口失败: {e}")
+            self._forget_window(hwnd)
+            if errors is not None: errors.append(f"激活窗口失败: {e}")
+            return None
 
-            if not terminal_wins: 
-                msg = f"{self.t('win_not_found')} [{ide}]\n\n请确保它已打开，且没有被最小化（缩小到任务栏）。"
-                logger.warning(f"Window not found: {target_regex}")
-                messagebox.showwarning("QuickBar", msg)
-                return
-            
-            target_win = terminal_wins[0]
+        target = {"ide": ide, "ai": ai, "hwnd": hwnd, "win": target_win, "click": None}
+        if ide == "Native CLI":
+            self.enable_cmd_shortcuts()
+            return target
+
+        try:
+            # 检查锚点图片文件是否存在（处理首次使用或文件丢失）
+            if not os.path.exists(config["image"]):
+                if errors is not None:
+                    errors.append(f"锚点图片不存在，请先校准: {config['image']}")
+                elif messagebox.askyesno("QuickBar", self.t("calibration_tip")):
+                    self.root.after(100, self.start_calibration)
+                return None
+
+            # 在执行截图识别前，确保激活操作已成功且窗口就在当前视野内
             try:
-                # 尝试多种激活方式
-                if hasattr(target_win, 'set_focus'):
-                    target_win.set_focus()
-                elif win32gui:
-                    hwnd = target_win.wrapper_object().handle
-                    win32gui.ShowWindow(hwnd, win32con.SW_RESTORE)
-                    win32gui.SetForegroundWindow(hwnd)
-                time.sleep(0.1)
+                loc, scale = self.anchor_locator.locate(config, win32gui.GetWindowRect(hwnd), (ide, ai),
+                                                        {}, self._anchor_dpi_ratio(config, hwnd), hint)
             except Exception as e:
-                print(f"激活窗口失败: {e}")
-                return
+                msg = self.t('anchor_not_found')
+                logger.warning(f"{msg}: {config['image']} (Error: {e})")
+                self._task_warning(msg, errors)
+                return None
+            if not loc:
+                msg = self.t('anchor_not_found')
+                logger.warning(f"{msg}: {config['image']}")
+                self._task_warning(msg, errors)
+                return None
+
+            # 校准偏移是在校准时的 DPI 下测得的，需随锚点一起缩放
+            click_x = loc.left + loc.width/2 + config.get("offset_x", 0) * scale
+            click_y = loc.top + loc.height/2 + config["offset_y"] * scale
+            pyautogui.click(click_x, click_y)
+            self.waiter.input_focus(hwnd, fixed=0.05)
+            if clear:
+                # 增加清空逻辑的容错
+                pyautogui.hotkey('ctrl', 'a')
+                self.waiter.pause(0.05)
+                pyautogui.press('backspace')
+            target["click"] = (click_x, click_y)
+            return target
+        except Exception as e:
+            import traceback
+            print(f"识别或模拟点击失败详细日志:\n{traceback.format_exc()}")
+            if errors is not None:
+                errors.append(f"识别或模拟点击失败: {e}")
+            elif "Failed to read" in str(e):
+                messagebox.showerror("图片加载失败", f"校准图片文件损坏或无法读取：\n{config['image']}\n建议重新点击校准按钮。")
+            return None
+
+    def _input_to_target(self, target, cmd_type, prompt, send_mode="paste", submit=False):
+        """
+        向已由 _focus_target 激活并点击的目标输入一段文本或一个快捷键，不再点击或清空；
+        submit 时在文本渲染后按回车发送（快捷键不发送）
+        """
+        if cmd_type == "key":
+            # 模拟快捷键逻辑
+            keys = [k.strip().lower() for k in prompt.split('+')]
+            try:
+                pyautogui.hotkey(*keys)
+            except Exception as e:
+                logger.error(f"快捷键按下失败: {keys}, error: {e}")
+            return
 
-            if ide == "Native CLI":
-                self.enable_cmd_shortcuts()
-                if cmd_type == "key":
-                    # 模拟快捷键逻辑
-                    keys = [k.strip().lower() for k in prompt.split('+')]
-                    try:
-                        pyautogui.hotkey(*keys)
-                    except Exception as e:
-                        logger.error(f"快捷键按下失败: {keys}, error: {e}")
-                else:
-                    pyperclip.copy(prompt)
-                    time.sleep(0.05)
-                    rect = target_win.rectangle()
-                    pyautogui.moveTo((rect.left + rect.right)//2, (rect.top + rect.bottom)//2)
-                    time.sleep(0.05); pyautogui.rightClick()
-                    if self.auto_send.get(): pyautogui.press('enter')
-                pyautogui.moveTo(old_pos)
-            else:
-                try:
-                    # 检查锚点图片文件是否存在（处理首次使用或文件丢失）
-                    if not os.path.exists(config["image"]):
-                        if messagebox.askyesno("QuickBar", self.t("calibration_tip")):
-                            self.root.after(100, self.start_calibration)
-                        return
+        # 直接输入不可用时（非 Windows 或注入器初始化失败）回退到剪贴板粘贴
+        if send_mode == "type" and self.text_injector is not None:
+            # 直接输入：字符写入当前焦点处，不经过剪贴板
+            if text_input.type_text(prompt, self.text_injector) and submit:
+                pyautogui.press('enter')
+            return
 
-                    # 在执行截图识别前，确保激活操作已成功且窗口就在当前视野内
-                    try:
-                        loc = pyautogui.locateOnScreen(config["image"], confidence=0.7)
-                        if loc:
-                            pyautogui.click(loc.left + loc.width/2 + config.get("offset_x", 0), 
-                                            loc.top + loc.height/2 + config["offset_y"])
-                            time.sleep(0.05)
-                            # 增加清空逻辑的容错
-                            pyautogui.hotkey('ctrl', 'a')
-                            time.sleep(0.05)
-                            pyautogui.press('backspace') 
-                            
-                            if cmd_type == "key":
-                                # 模拟快捷键逻辑
-                                keys = [k.strip().lower() for k in prompt.split('+')]
-                                try:
-                                    pyautogui.hotkey(*keys)
-                                except Exception as e:
-                                    logger.error(f"快捷键按下失败: {keys}, error: {e}")
-                            else:
-                                pyperclip.copy(prompt)
-                                time.sleep(0.05)
-                                pyautogui.hotkey('ctrl', 'v') 
-                                if self.auto_send.get(): 
-                                    time.sleep(0.05)
-                                    pyautogui.press('enter')
-                            
-                            # 完成后返回原始位置
-                            pyautogui.moveTo(old_pos)
-                        else:
-                            msg = self.t('anchor_not_found')
-                            logger.warning(f"{msg}: {config['image']}")
-                            messagebox.showwarning("QuickBar", msg)
-                    except (pyautogui.ImageNotFoundException, Exception) as e:
-                        # PyAutoGUI 在新版本中找不到图片会直接抛出 ImageNotFoundException
-                        msg = self.t('anchor_not_found')
-                        logger.warning(f"{msg}: {config['image']} (Error: {e})")
-                        messagebox.showwarning("QuickBar", msg)
-                except Exception as e:
-                    import traceback
-                    print(f"识别或模拟点击失败详细日志:\n{traceback.format_exc()}")
-                    if "Failed to read" in str(e):
-                        messagebox.showerror("图片加载失败", f"校准图片文件损坏或无法读取：\n{config['image']}\n建议重新点击校准按钮。")
-        except Exception as e: 
-            print(f"自动化核心流程异常: {e}")
+        # 无论粘贴过程是否出错都要安排恢复，否则快照滞留，下一次 copy 会把本条指令当作用户内容保存
+        try:
+            self.clipboard.copy(prompt)
+            self.waiter.clipboard_set(prompt, fixed=0.05)
+            if target["click"] is None:
+                # 终端：右键粘贴后等待终端画面出现文字再回车
+                rect = target["win"].rectangle()
+                pyautogui.moveTo((rect.left + rect.right)//2, (rect.top + rect.bottom)//2)
+                region = (rect.left, rect.top, rect.right - rect.left, rect.bottom - rect.top)
+                baseline = self.waiter.snapshot(region) if submit else None
+                self.waiter.pause(0.05); pyautogui.rightClick()
+                if submit:
+                    self.waiter.region_changed(region, baseline, fixed=0)
+                    pyautogui.press('enter')
+            else:
+                # 输入框附近区域：粘贴的文字渲染出来后再回车
+                click_x, click_y = target["click"]
+                region = (int(click_x) - 200, int(click_y) - 30, 400, 60)
+                baseline = self.waiter.snapshot(region) if submit else None
+                pyautogui.hotkey('ctrl', 'v')
+                if submit:
+                    self.waiter.region_changed(region, baseline, fixed=0.05)
+                    pyautogui.press('enter')
+        finally:
+            self.clipboard.release()
 
     # --- 辅助弹窗方法 ---
     def add_command_dialog(self):
         d = EditDialog(self, "新增指令", "", "", "text", self.themes[self.current_theme.get()])
         if d.result: 
-            self.commands.append({"name": d.result[0], "text": d.result[1], "type": d.result[2]})
-            self.save_config(); self.setup_ui()
+            cmd = {"name": d.result[0], "text": d.result[1], "type": d.result[2], "send_mode": d.result[3]}
+            if cmd["type"] == "macro":
+                cmd["steps"] = macros.parse_script(cmd["text"])
+            self.commands.append(cmd)
+            self._record_change("add", cmd, index=len(self.commands) - 1)
+            self.update_ui("add_command")
 
     def edit_command_dialog(self, cmd):
-        d = EditDialog(self, "编辑指令", cmd['name'], cmd['text'], cmd.get('type', 'text'), self.themes[self.current_theme.get()])
+        text = cmd.get('text', '')
+        if cmd.get('type') == "macro" and cmd.get('steps') and not text:
+            text = macros.format_script(cmd['steps'])
+        d = EditDialog(self, "编辑指令", cmd['name'], text, cmd.get('type', 'text'), self.themes[self.current_theme.get()],
+                       send_mode=cmd.get('send_mode', 'paste'))
         if d.result: 
-            cmd['name'], cmd['text'], cmd['type'] = d.result
-            self.save_config(); self.setup_ui()
+            cmd['name'], cmd['text'], cmd['type'], cmd['send_mode'] = d.result
+            if cmd['type'] == "macro":
+                cmd['steps'] = macros.parse_script(cmd['text'])
+            else:
+                cmd.pop('steps', None)
+            idx = next(i for i, c in enumerate(self.commands) if c is cmd)
+            self._record_change("edit", cmd, index=idx)
+            self.update_ui("edit_command")
 
     def show_context_menu(self, event, cmd, idx):
         """显示右键上下文菜单"""
@@ -2087,9 +2381,48 @@ class QuickBarApp:
                        activebackground=colors["active"], activeforeground="white",
                        font=("Microsoft YaHei", 9))
         menu.add_command(label="编辑", command=lambda: self.edit_command_dialog(cmd))
+        menu.add_command(label=self.t("broadcast"), command=lambda: self.broadcast_dialog(cmd))
         menu.add_command(label="删除", command=lambda: self.delete_command(idx))
         menu.tk_popup(event.x_root, event.y_root)
 
+    def broadcast_dialog(self, cmd):
+        """选择广播目标（勾选多个 IDE / AI）后发送"""
+        colors = self.themes[self.current_theme.get()]
+        dialog = tk.Toplevel(self.root)
+        dialog.title(self.t("broadcast"))
+        dialog.geometry(f"+{self.root.winfo_x()+20}+{self.root.winfo_y()+50}")
+        dialog.configure(bg=colors["bg"], padx=15, pady=10)
+        dialog.attributes("-topmost", True)
+        dialog.resizable(False, False)
+        dialog.grab_set()
+
+        tk.Label(dialog, text=f"{cmd['name']}", bg=colors["bg"], fg=colors["text"],
+                 font=("Microsoft YaHei", 9, "bold")).pack(anchor="w", pady=(0, 8))
+        selected = set(self.broadcast_targets) or {(self.current_ide.get(), self.current_ai.get())}
+        choices = []
+        for ide, ais in self.target_settings.items():
+            for ai in ais:
+                var = tk.BooleanVar(value=(ide, ai) in selected)
+                tk.Checkbutton(dialog, text=f"{ide} / {ai}", variable=var, bg=colors["bg"], fg=colors["text"],
+                               activebackground=colors["bg"], activeforeground=colors["active"],
+                               selectcolor=colors["btn"], font=("Microsoft YaHei", 9)).pack(anchor="w")
+                choices.append(((ide, ai), var))
+
+        def on_send():
+            targets = [target for target, var in choices if var.get()]
+            dialog.destroy()
+            if not targets: return
+            self.broadcast_targets = targets
+            self.save_config()
+            self.send_broadcast(cmd, targets)
+
+        btn_frame = tk.Frame(dialog, bg=colors["bg"])
+        btn_frame.pack(pady=(10, 0))
+        tk.Button(btn_frame, text=self.t("broadcast_send"), bg=colors["active"], fg="white",
+                  relief="flat", width=8, command=on_send).pack(side="left", padx=10)
+        tk.Button(btn_frame, text="取消" if self.language.get() == "zh" else "Cancel", bg=colors["btn"],
+                  fg=colors["text"], relief="flat", width=8, command=dialog.destroy).pack(side="left", padx=10)
+
     def delete_command(self, idx):
         """删除指定索引的指令"""
         cmd = self.commands[idx]
@@ -2112,10 +2445,9 @@ class QuickBarApp:
         btn_frame.pack(pady=10)
         
         def on_yes():
-            self.commands.pop(idx)
-            self.save_config()
+            self._record_change("delete", self.commands.pop(idx), index=idx)
             dialog.destroy()
-            self.setup_ui()
+            self.update_ui("delete_command")
         
         tk.Button(btn_frame, text="是", bg=colors["active"], fg="white", 
                  relief="flat", width=8, command=on_yes).pack(side="left", padx=10)
@@ -2128,18 +2460,24 @@ class QuickBarApp:
         """启动两阶段校准：截图特征图 -> 点击目标位置"""
         ide, ai = self.current_ide.get(), self.current_ai.get()
         config = self.target_settings[ide][ai]
-        scr = ScreenshotDialog(self.root, config["image"], f"校准 - 步骤 1: 请框选特征锚点")
+        scr = ScreenshotDialog(self.root, config["image"], f"校准 - 步骤 1: 请框选特征锚点", self.anchor_cache)
         if scr.success:
-            loc = LocationDialog(self.root, config["image"], f"校准 - 步骤 2: 请点击目标输入框中心")
+            self.anchor_cache.invalidate(config["image"])
+            loc = LocationDialog(self.root, config["image"], f"校准 - 步骤 2: 请点击目标输入框中心", self.anchor_cache)
             if loc.success:
                 ax, ay = loc.anchor_pos
                 cx, cy = loc.click_pos
                 config["offset_x"], config["offset_y"] = cx - ax, cy - ay
-                with open(TARGET_CONFIG_FILE, "w", encoding="utf-8") as f: 
-                    json.dump(self.target_settings, f, indent=4)
+                # 锚点图已更换，上次命中位置及缩放比例失效；记录框选锚点所在显示器的 DPI
+                config.pop("anchor_rel", None)
+                config.pop("anchor_scale", None)
+                sx, sy, sw, sh = scr.region
+                config["anchor_dpi"] = monitor_dpi(point=(sx + sw // 2, sy + sh // 2))
+                self.anchor_locator.forget((ide, ai))
+                self.save_target_settings()
                 messagebox.showinfo("成功", "校准数据已保存")
                 self.save_config()
-                self.setup_ui()
+                self.update_ui("calibrate")
 
     def auto_adjust_height(self):
         """根据当前 UI 元素内容自动计算并调整窗口高度"""
@@ -2180,15 +2518,7 @@ class QuickBarApp:
         def _hook_loop():
             user32, kernel32 = ctypes.windll.user32, ctypes.windll.kernel32
             
-            # --- 内存对齐的 INPUT 结构 ---
-            class KEYBDINPUT(ctypes.Structure):
-                _fields_ = [("wVk", ctypes.c_ushort), ("wScan", ctypes.c_ushort), ("dwFlags", ctypes.c_ulong),
-                           ("time", ctypes.c_ulong), ("dwExtraInfo", ctypes.c_void_p)]
-            class INPUT_UNION(ctypes.Union):
-                _fields_ = [("ki", KEYBDINPUT)]
-            class INPUT(ctypes.Structure):
-                _fields_ = [("type", ctypes.c_ulong), ("u", INPUT_UNION)]
-
+            # INPUT / KEYBDINPUT 结构定义在 text_input 模块，与直接文本输入共用
             class KBDLLHOOKSTRUCT(ctypes.Structure):
                 _fields_ = [("vkCode", wintypes.DWORD), ("scanCode", wintypes.DWORD),
                            ("flags", wintypes.DWORD), ("time", wintypes.DWORD),
@@ -2225,9 +2555,14 @@ class QuickBarApp:
                         vk = struct.vkCode
                         w_param_val = wParam if wParam is not None else 0
                         is_key_down = w_param_val in (WM_KEYDOWN, WM_SYSKEYDOWN)
-                        
-                        # 核心判定：当按下 H 键且 Win 键被持有时
-                        if vk == VK_H and is_key_down:
+
+                        # 宏执行期间焦点在目标窗口，QuickBar 收不到 Esc：在钩子里拦下并中止宏
+                        if vk == VK_ESC and self.macro_running:
+                            if is_key_down: self.macro_abort.set()
+                            return ctypes.c_void_p(1).value
+
+                        # 核心判定：当按下 H 键且 Win 键被持有时（钩子也可能只为宏的 Esc 而启动，仅讯飞模式下处理）
+                        if vk == VK_H and is_key_down and self._ifly_active_sync:
                             lwin = user32.GetAsyncKeyState(VK_LWIN) & 0x8000
                             rwin = user32.GetAsyncKeyState(VK_RWIN) & 0x8000
                             
@@ -2386,19 +2721,84 @@ class QuickBarApp:
             else:
                 logger.warning("未定位到 iFlyVoice 安装路径")
 
+class LiveMacroExecutor:
+    """
+    宏的实际执行器：复用 _automation_task 的窗口查找、锚点定位与输入流程，但按目标分段执行——
+    切换到某个目标后的第一个输入步骤激活窗口、点击输入框并清空一次，之后的步骤只输入、不清空、不发送
+    """
+    def __init__(self, app, ide, ai, abort, errors=None):
+        self.app, self.ide, self.ai, self.abort = app, ide, ai, abort
+        # 广播投递时失败原因记入该列表而不弹窗（见 _focus_target）
+        self.errors = errors
+        # 当前目标的 _focus_target 结果；切换目标后置空，下一个输入步骤重新激活
+        self.target = None
+
+    def _focused(self):
+        if self.target is None:
+            self.target = self.app._focus_target(self.ide, self.ai, errors=self.errors)
+        return self.target
+
+    def text(self, text, send_mode):
+        target = self._focused()
+        if not target: return False
+        self.app._input_to_target(target, "text", text, send_mode, submit=False)
+        return True
+
+    def hotkey(self, keys):
+        target = self._focused()
+        if not target: return False
+        self.app._input_to_target(target, "key", "+".join(keys))
+        return True
+
+    def submit(self):
+        """宏以文本步骤结束且开启了自动发送时，全部步骤完成后按一次回车"""
+        if self.target:
+            pyautogui.press('enter')
+
+    def wait_window(self, timeout):
+        ok, _ = wait_until(lambda: self.app._find_target_hwnd(self.ide, self.ai), timeout, max_interval=0.2,
+                           abort=self.abort)
+        return ok
+
+    def wait_anchor(self, timeout):
+        if self.ide == "Native CLI": return True  # 终端不使用锚点
+        config = self.app.target_settings[self.ide][self.ai]
+
+        def anchor_visible():
+            hwnd = self.app._find_target_hwnd(self.ide, self.ai)
+            if not hwnd: return False
+            loc, _ = self.app.anchor_locator.locate(config, win32gui.GetWindowRect(hwnd), (self.ide, self.ai),
+                                                    None, self.app._anchor_dpi_ratio(config, hwnd))
+            return loc
+
+        ok, _ = wait_until(anchor_visible, timeout, interval=0.05, max_interval=0.5, abort=self.abort)
+        return ok
+
+    def delay(self, seconds):
+        # 延时期间按 Esc 立即结束
+        return not self.abort.wait(seconds)
+
+    def switch_target(self, ide, ai):
+        if ai not in self.app.target_settings.get(ide, {}): return False
+        if (ide, ai) != (self.ide, self.ai):
+            self.target = None
+        self.ide, self.ai = ide, ai
+        return True
+
+
 class EditDialog(tk.Toplevel):
     """自适应主题且视觉精美的指令编辑弹窗"""
-    def __init__(self, app, title, name, text, cmd_type, colors):
+    def __init__(self, app, title, name, text, cmd_type, colors, send_mode="paste"):
         super().__init__(app.root)
         self.app = app
         self.title(title); self.result = None
         self.colors = colors
         
         # 窗口大小 (适度增加高度以适应更大的行间距)
-        w, h = 360, 320
+        w, h = 360, 355
         self.attributes("-topmost", True); self.resizable(True, True)
         self.configure(bg=colors["bg"])
-        self.minsize(340, 300)
+        self.minsize(340, 335)
         
         # 计算弹出位置：默认在主窗口右侧弹出，但如果超出屏幕则向左偏置
         root_x = app.root.winfo_x()
@@ -2436,7 +2836,21 @@ class EditDialog(tk.Toplevel):
         
         # 增加 padx 以拉开标签和单选按钮的水平间距
         tk.Radiobutton(type_row, text=app.t("text_mode"), variable=self.type_var, value="text", **rb_style).pack(side="left", padx=(15, 10))
-        tk.Radiobutton(type_row, text=app.t("key_mode"), variable=self.type_var, value="key", **rb_style).pack(side="left")
+        tk.Radiobutton(type_row, text=app.t("key_mode"), variable=self.type_var, value="key", **rb_style).pack(side="left", padx=(0, 10))
+        tk.Radiobutton(type_row, text=app.t("macro_mode"), variable=self.type_var, value="macro", **rb_style).pack(side="left")
+
+        # 2.1 发送方式（仅纯文本指令）：剪贴板粘贴 / 直接输入（不占用剪贴板）
+        mode_row = tk.Frame(self.main_frame, bg=colors["bg"])
+        mode_row.pack(fill="x", pady=(0, 15))
+        tk.Label(mode_row, text=app.t("send_mode"), bg=colors["bg"], fg=colors["subtext"], 
+                 font=("Microsoft YaHei", 9), width=10, anchor="ne").pack(side="left")
+        self.send_mode_var = tk.StringVar(value=send_mode)
+        self.send_mode_btns = [
+            tk.Radiobutton(mode_row, text=app.t("send_paste"), variable=self.send_mode_var, value="paste", **rb_style),
+            tk.Radiobutton(mode_row, text=app.t("send_type"), variable=self.send_mode_var, value="type", **rb_style),
+        ]
+        self.send_mode_btns[0].pack(side="left", padx=(15, 10))
+        self.send_mode_btns[1].pack(side="left")
 
         # 3. 指令内容部分 (标签与输入框在同一行，优化对齐)
         self.content_row = tk.Frame(self.main_frame, bg=colors["bg"])
@@ -2514,9 +2928,15 @@ class EditDialog(tk.Toplevel):
         # 强制性地统一高度配置，确保无跳变
         self.ta.config(height=2)
         
+        for btn in self.send_mode_btns:
+            btn.config(state="normal" if ctype == "text" else "disabled")
         if ctype == "text":
             self.content_lbl.config(text=self.app.t("cmd_content"))
             self.tip_label.config(text="") # 仅清空文字，保留占位
+        elif ctype == "macro":
+            # 宏的每个文本步骤自带发送方式（text: 粘贴 / type: 直接输入）
+            self.content_lbl.config(text=self.app.t("macro_content"))
+            self.tip_label.config(text=self.app.t("macro_tip"))
         else:
             self.content_lbl.config(text=self.app.t("key_content"))
             self.tip_label.config(text=self.app.t("key_tip"))
@@ -2546,13 +2966,22 @@ class EditDialog(tk.Toplevel):
         n, t = self.ne.get().strip(), self.ta.get("1.0", "end-1c").strip()
         ctype = self.type_var.get()
         if not t: return 
+        if ctype == "macro":
+            try:
+                macros.compile_macro(macros.parse_script(t), self.app.target_settings)
+            except ValueError as e:
+                messagebox.showwarning("QuickBar", str(e), parent=self)
+                return
         if not n: n = (t[:10] + "..") if len(t) > 10 else t
-        self.result = (n, t, ctype)
+        self.result = (n, t, ctype, self.send_mode_var.get())
         self.destroy()
 
 class ScreenshotDialog:
-    def __init__(self, parent, filename, prompt):
+    def __init__(self, parent, filename, prompt, anchor_cache=None):
         self.filename, self.success = filename, False
+        # 框选区域的屏幕坐标 (x, y, 宽, 高)
+        self.region = None
+        self.anchor_cache = anchor_cache
         self.root = tk.Toplevel(parent)
         self.root.attributes("-fullscreen", True, "-alpha", 0.2, "-topmost", True)
         self.canvas = tk.Canvas(self.root, cursor="arrow", bg="grey"); self.canvas.pack(fill="both", expand=True)
@@ -2595,7 +3024,7 @@ class ScreenshotDialog:
 
     def update_zoom(self, x, y):
         r = self.zoom_size // (2 * self.zoom_scale)
-        shot = ImageGrab.grab(bbox=(x-r, y-r, x+r, y+r)).resize((self.zoom_size, self.zoom_size), Image.NEAREST)
+        shot = capture.get_default().grab_image((x-r, y-r, 2*r, 2*r)).resize((self.zoom_size, self.zoom_size), Image.NEAREST)
         self.z_img = ImageTk.PhotoImage(shot)
         self.z_can.delete("all"); self.z_can.create_image(0, 0, anchor="nw", image=self.z_img)
         m = self.zoom_size // 2
@@ -2612,9 +3041,11 @@ class ScreenshotDialog:
         if x2-x1 > 5:
             try:
                 # 显式截取并保存
-                img = ImageGrab.grab(bbox=(x1, y1, x2, y2))
+                img = capture.get_default().grab_image((x1, y1, x2-x1, y2-y1))
                 img.save(self.filename)
+                if self.anchor_cache: self.anchor_cache.invalidate(self.filename)
                 logger.info(f"Screenshot saved to: {self.filename}")
+                self.region = (self.root.winfo_rootx() + x1, self.root.winfo_rooty() + y1, x2-x1, y2-y1)
                 self.success = True
             except Exception as ex:
                 logger.error(f"Failed to save screenshot: {ex}")
@@ -2624,8 +3055,9 @@ class ScreenshotDialog:
             self.root.destroy()
 
 class LocationDialog:
-    def __init__(self, parent, image_path, prompt):
+    def __init__(self, parent, image_path, prompt, anchor_cache=None):
         self.success, self.image_path = False, image_path
+        self.anchor_cache = anchor_cache or matcher.AnchorCache()
         self.root = tk.Toplevel(parent); self.root.attributes("-fullscreen", True, "-alpha", 0.2, "-topmost", True)
         self.canvas = tk.Canvas(self.root, cursor="arrow", bg="grey"); self.canvas.pack(fill="both", expand=True)
         self.zoom_size, self.zoom_scale = 180, 4
@@ -2663,7 +3095,7 @@ class LocationDialog:
 
     def update_zoom(self, x, y):
         r = self.zoom_size // (2 * self.zoom_scale)
-        shot = ImageGrab.grab(bbox=(x-r, y-r, x+r, y+r)).resize((self.zoom_size, self.zoom_size), Image.NEAREST)
+        shot = capture.get_default().grab_image((x-r, y-r, 2*r, 2*r)).resize((self.zoom_size, self.zoom_size), Image.NEAREST)
         self.z_img = ImageTk.PhotoImage(shot)
         self.z_can.delete("all"); self.z_can.create_image(0, 0, anchor="nw", image=self.z_img)
         m = self.zoom_size // 2
@@ -2676,8 +3108,11 @@ class LocationDialog:
     def on_click(self, e):
         self.click_pos = (e.x, e.y); self.root.withdraw(); self.z_win.withdraw(); self.root.update(); time.sleep(0.2)
         try:
-            loc = pyautogui.locateOnScreen(self.image_path, confidence=0.7)
-            if loc: self.anchor_pos = (loc.left+loc.width/2, loc.top+loc.height/2); self.success = True
+            backend = capture.get_default()
+            vx, vy, vw, vh = backend.bounds()
+            shot = backend.grab((vx, vy, vw, vh))
+            loc = matcher.Pyramid(shot).locate(self.anchor_cache.get(self.image_path), ANCHOR_CONFIDENCE)
+            if loc: self.anchor_pos = (vx+loc.left+loc.width/2, vy+loc.top+loc.height/2); self.success = True
             else: messagebox.showerror("错误", "无法定位特征图")
         except Exception as ex: messagebox.showerror("错误", str(ex))
         self.z_win.destroy(); self.root.destroy()
@@ -0,0 +1,149 @@
+"""
+锚点定位流程：上次命中位置原位校验 -> 目标窗口矩形内金字塔搜索 -> 逐级外扩 -> 整个虚拟桌面。
+只依赖截图后端与匹配引擎，不依赖 Windows API，可配合 capture.FileCapture 在无界面环境运行。
+"""
+import logging
+import threading
+
+import matcher
+
+logger = logging.getLogger(__name__)
+
+
+class AnchorLocator:
+    """按目标配置（target_settings.json 中的单个条目）定位锚点，并维护上次命中位置与快速路径统计"""
+    # 目标窗口矩形的逐级外扩比例（0 为窗口本身），全部未命中时最后回退到整个虚拟桌面
+    SEARCH_GROWTH = (0.0, 0.5, 1.5)
+    # 上次命中位置附近的搜索边距（像素）
+    HINT_MARGIN = 48
+
+    def __init__(self, capture, anchor_cache=None, confidence=0.7, on_update=None):
+        self.capture = capture
+        self.cache = anchor_cache or matcher.AnchorCache()
+        self.confidence = confidence
+        # 命中位置或缩放比例变化时回调（用于写回 target_settings.json）
+        self.on_update = on_update
+        # 每个 (IDE, AI) 上次锚点命中的窗口相对位置
+        self.last_hits = {}
+        # 原位校验快速路径的命中统计
+        self.stats = {"hit": 0, "miss": 0}
+        # 广播的准备阶段在线程池中并发定位，统计与上次命中位置的更新需加锁
+        self._lock = threading.Lock()
+
+    def forget(self, key):
+        """锚点重新校准后丢弃该目标的上次命中位置"""
+        with self._lock:
+            self.last_hits.pop(key, None)
+
+    def search_regions(self, config, win_rect, anchor_size, window_only=False):
+        """
+        由近及远生成锚点搜索区域：上次命中位置 -> 目标窗口 -> 逐级外扩 -> 整个虚拟桌面；
+        window_only 时只搜索上次命中位置和目标窗口本身
+        """
+        left, top, right, bottom = win_rect
+        aw, ah = anchor_size
+        vx, vy, vw, vh = self.capture.bounds()
+
+        def clamp(x1, y1, x2, y2):
+            x1, y1 = max(int(x1), vx), max(int(y1), vy)
+            x2, y2 = min(int(x2), vx + vw), min(int(y2), vy + vh)
+            # 区域必须能容纳整张锚点图
+            if x2 - x1 < aw or y2 - y1 < ah: return None
+            return (x1, y1, x2 - x1, y2 - y1)
+
+        candidates = []
+        hint = config.get("anchor_rel")
+        if hint:
+            m = self.HINT_MARGIN
+            hx, hy = left + hint[0], top + hint[1]
+            candidates.append(clamp(hx - m, hy - m, hx + aw + m, hy + ah + m))
+
+        w, h = right - left, bottom - top
+        for growth in self.SEARCH_GROWTH[:1] if window_only else self.SEARCH_GROWTH:
+            dx, dy = w * growth / 2, h * growth / 2
+            candidates.append(clamp(left - dx, top - dy, right + dx, bottom + dy))
+        if not window_only:
+            candidates.append((vx, vy, vw, vh))
+
+        regions = []
+        for region in candidates:
+            if region and region not in regions:
+                regions.append(region)
+        return regions
+
+    def verify_last(self, key, config, win_rect, needle, hint=None):
+        """
+        快速路径：只截取上次命中位置（hint 优先，如广播准备阶段的预定位结果）的锚点大小区域做一次差异校验，
+        通过则直接返回 Box
+        """
+        rel = hint or self.last_hits.get(key) or config.get("anchor_rel")
+        if not rel or needle is None: return None
+        h, w = needle.shape
+        x, y = win_rect[0] + rel[0], win_rect[1] + rel[1]
+        try:
+            ok = matcher.verify(self.capture.grab((x, y, w, h)), needle)
+        except Exception as e:
+            logger.warning(f"锚点原位校验失败: {e}")
+            ok = False
+
+        with self._lock:
+            self.stats["hit" if ok else "miss"] += 1
+            hits, misses = self.stats["hit"], self.stats["miss"]
+        logger.info(f"锚点快速路径{'命中' if ok else '未命中'} (累计 命中 {hits} / 未命中 {misses})")
+        return matcher.Box(x, y, w, h) if ok else None
+
+    def locate(self, config, win_rect, key=None, frames=None, dpi_ratio=None,
+               hint=None, window_only=False, remember=True):
+        """
+        在目标窗口矩形 win_rect (left, top, right, bottom) 内查找锚点，未命中时逐级扩大范围。
+        frames 为同一次任务内共享的 {区域: 金字塔} 缓存，同一区域只截图并构建一次金字塔。
+        先在各区域依次尝试优先的缩放比例（上次命中 / DPI 换算 / 1.0），全部未命中时再用其余默认比例
+        重新遍历各区域（适配不同 DPI 的显示器），返回 (Box, 缩放比例)，未命中为 (None, 1.0)。
+        hint 为优先原位校验的窗口相对位置；窗口未激活、可能被遮挡时（广播的准备阶段）应传入
+        window_only=True 只在窗口自身范围内搜索，并以 remember=False 不记录命中位置，避免把别的窗口里的锚点记为本目标的位置。
+        """
+        if frames is None: frames = {}
+        image_path = config["image"]
+        preferred = matcher.preferred_scales(config.get("anchor_scale"), dpi_ratio)
+        fallback = [s for s in matcher.candidate_scales(config.get("anchor_scale"), dpi_ratio) if s not in preferred]
+        needle = self.cache.get(image_path, preferred[0])
+
+        loc = self.verify_last(key, config, win_rect, needle, hint)
+        if loc: return loc, preferred[0]
+
+        base = self.cache.get(image_path)
+        anchor_size = (base.shape[1], base.shape[0])
+        if needle is not None:
+            anchor_size = (min(anchor_size[0], needle.shape[1]), min(anchor_size[1], needle.shape[0]))
+        regions = self.search_regions(config, win_rect, anchor_size, window_only)
+
+        for scales in (preferred, fallback):
+            for level, region in enumerate(regions):
+                x, y, w, h = region
+                pyramid = frames.get(region)
+                if pyramid is None:
+                    pyramid = frames[region] = matcher.Pyramid(self.capture.grab(region))
+                for scale in scales:
+                    needle = self.cache.get(image_path, scale)
+                    box = pyramid.locate(needle, self.confidence) if needle is not None else None
+                    if box: break
+                else:
+                    continue
+
+                loc = matcher.Box(box.left + x, box.top + y, box.width, box.height)
+                logger.info(f"锚点命中: 第 {level} 级搜索区域 {region}，缩放 {scale}")
+                rel = [int(loc.left - win_rect[0]), int(loc.top - win_rect[1])]
+                if not remember:
+                    return loc, scale
+                with self._lock:
+                    self.last_hits[key] = rel
+                    changed = config.get("anchor_rel") != rel or config.get("anchor_scale", 1.0) != scale
+                    if changed:
+                        config["anchor_rel"], config["anchor_scale"] = rel, scale
+                if changed and self.on_update:
+                    try:
+                        self.on_update()
+                    except Exception as e:
+                        logger.warning(f"保存锚点位置失败: {e}")
+                return loc, scale
+        return None, 1.0
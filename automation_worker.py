@@ -0,0 +1,116 @@
+"""
+自动化任务队列：单个常驻工作线程按 FIFO 顺序串行执行指令，避免连续点击时多个线程争抢剪贴板、鼠标和焦点。
+
+队列语义：
+- 合并：同一指令已在队列中等待，或刚开始执行不到 coalesce_window 秒，重复按下直接合并
+- 过期：出队时已等待超过 stale_after 秒的任务直接丢弃（例如前一个任务卡在弹窗上）
+- 有界：队列满时丢弃最早的等待任务，保证最新的点击能被执行
+"""
+import collections
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+Job = collections.namedtuple("Job", "key payload submitted")
+
+
+class AutomationWorker:
+    """常驻自动化工作线程；handler(payload) 在工作线程中执行，预热状态（窗口缓存、锚点等）跨任务复用"""
+    def __init__(self, handler, maxsize=8, coalesce_window=0.5, stale_after=10.0, name="QuickBarAutomation"):
+        self.handler = handler
+        self.maxsize = maxsize
+        self.coalesce_window = coalesce_window
+        self.stale_after = stale_after
+        self.name = name
+        self._queue = collections.deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+        # 当前 / 最近一次开始执行的任务 key 及开始时间，用于合并执行中的重复按下
+        self._last_key, self._last_start = None, 0.0
+        self.stats = {"submitted": 0, "done": 0, "failed": 0, "coalesced": 0, "stale": 0, "overflow": 0,
+                      "max_depth": 0, "last_wait_ms": 0.0, "last_run_ms": 0.0, "total_run_ms": 0.0}
+
+    # --- 生命周期 ---
+    def start(self):
+        with self._cond:
+            if self._thread and self._thread.is_alive():
+                return self
+            self._running = True
+            self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=1.0):
+        """停止接收新任务并丢弃等待中的任务；正在执行的任务在 timeout 内结束"""
+        with self._cond:
+            self._running = False
+            self._queue.clear()
+            self._cond.notify_all()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    # --- 提交 ---
+    def depth(self):
+        with self._cond:
+            return len(self._queue)
+
+    def submit(self, key, payload):
+        """提交任务，返回是否入队（被合并时返回 False）"""
+        now = time.perf_counter()
+        with self._cond:
+            if not self._running:
+                return False
+            self.stats["submitted"] += 1
+            if any(job.key == key for job in self._queue) or \
+                    (key == self._last_key and now - self._last_start < self.coalesce_window):
+                self.stats["coalesced"] += 1
+                logger.info(f"重复指令已合并，队列深度 {len(self._queue)}")
+                return False
+            if len(self._queue) >= self.maxsize:
+                self._queue.popleft()
+                self.stats["overflow"] += 1
+                logger.warning(f"自动化队列已满 ({self.maxsize})，丢弃最早的等待任务")
+            self._queue.append(Job(key, payload, now))
+            self.stats["max_depth"] = max(self.stats["max_depth"], len(self._queue))
+            self._cond.notify()
+            return True
+
+    # --- 执行 ---
+    def _next_job(self):
+        with self._cond:
+            while self._running:
+                while self._queue:
+                    job = self._queue.popleft()
+                    now = time.perf_counter()
+                    if now - job.submitted > self.stale_after:
+                        self.stats["stale"] += 1
+                        logger.warning(f"丢弃过期任务（已等待 {now - job.submitted:.1f} 秒）")
+                        continue
+                    self._last_key, self._last_start = job.key, now
+                    return job, len(self._queue)
+                self._cond.wait()
+            return None, 0
+
+    def _loop(self):
+        while True:
+            job, remaining = self._next_job()
+            if job is None:
+                return
+            start = time.perf_counter()
+            ok = True
+            try:
+                self.handler(job.payload)
+            except Exception as e:
+                ok = False
+                logger.error(f"自动化任务异常: {e}")
+            end = time.perf_counter()
+
+            wait_ms, run_ms = (start - job.submitted) * 1000, (end - start) * 1000
+            with self._cond:
+                self.stats["done" if ok else "failed"] += 1
+                self.stats["last_wait_ms"], self.stats["last_run_ms"] = wait_ms, run_ms
+                self.stats["total_run_ms"] += run_ms
+            logger.info(f"自动化任务完成: 排队 {wait_ms:.1f} ms，执行 {run_ms:.1f} ms，剩余队列深度 {remaining}")
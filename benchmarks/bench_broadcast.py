@@ -0,0 +1,83 @@
+"""
+广播发送基准：在一张合成的多窗口截图上，对多个目标并行执行“窗口区域锚点定位”准备阶段，
+与逐个串行定位比较总耗时；投递阶段用固定延时模拟激活窗口与输入。
+
+用法: python benchmarks/bench_broadcast.py [--size 3840x2160] [--targets 4] [--workers 4]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import broadcast  # noqa: E402
+import capture  # noqa: E402
+import matcher  # noqa: E402
+from anchors import AnchorLocator  # noqa: E402
+from bench_matcher import synthetic_screen  # noqa: E402
+
+
+def build_desktop(workdir, width, height, count):
+    """把屏幕横向切成 count 个窗口，每个窗口底部取一块作为该目标的锚点，返回 (截图路径, {目标: (配置, 窗口矩形)})"""
+    screen = synthetic_screen(width, height)
+    path = os.path.join(workdir, "desktop.png")
+    screen.save(path)
+    targets = {}
+    win_w = width // count
+    for i in range(count):
+        rect = (i * win_w, 0, (i + 1) * win_w, height)
+        ax, ay = rect[0] + win_w // 3, height - 200
+        anchor_path = os.path.join(workdir, f"anchor_{i}.png")
+        screen.crop((ax, ay, ax + 120, ay + 36)).save(anchor_path)
+        targets[(f"IDE{i}", "AI")] = ({"image": anchor_path, "offset_x": 0, "offset_y": -45}, rect)
+    return path, targets
+
+
+def run(targets, workers, deliver_ms, backend, cache):
+    locator = AnchorLocator(backend, cache)
+
+    def prepare(target):
+        config, rect = targets[target]
+        # 与 QuickBar._prepare_target 一致：只搜索窗口自身范围，不记录命中位置
+        loc, _ = locator.locate(dict(config), rect, target, window_only=True, remember=False)
+        if loc is None:
+            raise LookupError("锚点未命中")
+        return loc
+
+    def deliver(target, loc):
+        time.sleep(deliver_ms / 1000)
+        return True
+
+    start = time.perf_counter()
+    reports = broadcast.broadcast(list(targets), prepare, deliver, max_workers=workers)
+    return (time.perf_counter() - start) * 1000, reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", default="3840x2160")
+    parser.add_argument("--targets", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--deliver-ms", type=float, default=150, help="模拟的单个目标激活 + 输入耗时")
+    args = parser.parse_args()
+    width, height = map(int, args.size.split("x"))
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path, targets = build_desktop(workdir, width, height, args.targets)
+        backend = capture.FileCapture(path)
+        cache = matcher.AnchorCache()
+        cache.warm([config["image"] for config, _ in targets.values()])
+        backend.frame()
+
+        for label, workers in (("串行", 1), (f"线程池 x{args.workers}", args.workers)):
+            total, reports = run(targets, workers, args.deliver_ms, backend, cache)
+            prepare = sum(r.prepare_ms for r in reports)
+            print(f"{label:>10}: 总耗时 {total:8.1f} ms（准备累计 {prepare:7.1f} ms）")
+        print(broadcast.format_summary(reports))
+
+
+if __name__ == "__main__":
+    import logging
+    logging.disable(logging.INFO)
+    main()
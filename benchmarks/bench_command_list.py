@@ -0,0 +1,159 @@
+"""
+指令列表渲染基准：在 N 条指令上比较原来的逐按钮 Canvas 重建与虚拟化列表的刷新耗时和进程内存增量，
+并测量虚拟化列表滚动一屏的耗时。需要图形界面（Tk 显示）。
+
+原方案按旧版 refresh_cmd_list 复现：每条指令一个 Canvas（grid 布局）、<Configure> 重绘闭包、
+悬停与拖拽绑定和一对 ToolTip 绑定；耗时包含 update_idletasks（布局与首次绘制）。
+
+用法: python benchmarks/bench_command_list.py [--commands 100,1000,10000] [--repeat 3]
+"""
+import argparse
+import ctypes
+import gc
+import os
+import statistics
+import sys
+import time
+import tkinter as tk
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import command_list  # noqa: E402
+
+COLORS = {"bg": "#1e1e1e", "btn": "#333333", "btn_hover": "#444444", "text": "#cccccc",
+          "text_active": "#ffffff", "subtext": "#858585", "active": "#007acc"}
+MAX_HEIGHT = 700
+
+
+def rss_mb():
+    """当前进程常驻内存（MB）；无法获取时返回 None"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 1e6
+    except ImportError:
+        pass
+    if sys.platform == "win32":
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [("cb", ctypes.c_ulong), ("PageFaultCount", ctypes.c_ulong),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+        counters = PROCESS_MEMORY_COUNTERS(cb=ctypes.sizeof(PROCESS_MEMORY_COUNTERS))
+        handle = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+            return counters.WorkingSetSize / 1e6
+        return None
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except OSError:
+        return None
+
+
+def legacy_refresh(container, names):
+    """旧版 refresh_cmd_list：清空容器后为每条指令创建一个带绑定的 Canvas"""
+    for widget in container.winfo_children(): widget.destroy()
+    num_columns = 2 if len(names) > 10 else 1
+    for col in range(num_columns):
+        container.columnconfigure(col, weight=1)
+    for idx, name in enumerate(names):
+        c = tk.Canvas(container, bg=COLORS["bg"], height=38, highlightthickness=0, cursor="hand2")
+        c.grid(row=idx // num_columns, column=idx % num_columns, sticky="ew", pady=2, padx=2)
+        refs = {"rect": None, "text": None}
+
+        def draw_btn(e, c=c, name=name, r=refs):
+            c.delete("all")
+            if e.width > 10:
+                r["rect"] = command_list.rounded_rect(c, 2, 2, e.width - 4, 32, radius=6,
+                                                      fill=COLORS["btn"], outline=COLORS["btn"])
+                r["text"] = c.create_text(e.width / 2, 17, text=name, fill=COLORS["text"],
+                                          font=("Microsoft YaHei", 9))
+
+        def on_hover(e, c=c, r=refs, hot=True):
+            if r["rect"]:
+                c.itemconfigure(r["rect"], fill=COLORS["btn_hover" if hot else "btn"])
+
+        c.bind("<Configure>", draw_btn)
+        c.bind("<Enter>", on_hover)
+        c.bind("<Leave>", lambda e, c=c, r=refs: on_hover(e, c, r, False))
+        c.bind("<Button-1>", lambda e, i=idx: None)
+        c.bind("<B1-Motion>", lambda e: None)
+        c.bind("<ButtonRelease-1>", lambda e: None)
+        c.bind("<Button-3>", lambda e, i=idx: None)
+        # ToolTip 的两个追加绑定
+        c.bind("<Enter>", lambda e: None, add="+")
+        c.bind("<Leave>", lambda e: None, add="+")
+
+
+def measure(root, refresh, repeat):
+    """返回 (刷新耗时中位数 ms, 内存增量 MB)；刷新前后都让 Tk 完成布局与绘制"""
+    root.update()
+    gc.collect()
+    before = rss_mb()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        refresh()
+        root.update_idletasks()
+        samples.append((time.perf_counter() - start) * 1000)
+    root.update()
+    after = rss_mb()
+    return statistics.median(samples), (after - before) if before is not None and after is not None else None
+
+
+def fmt_mb(value):
+    return f"{value:7.1f} MB" if value is not None else "    n/a"
+
+
+def scroll_page_ms(root, view):
+    """从顶部逐帧平滑滚动一屏，返回每帧（含增删行）的平均耗时"""
+    view.offset = view.target_offset = 0
+    view._set_offset(0)
+    view._sync_rows()
+    frames, start = 0, time.perf_counter()
+    view.target_offset = min(view.max_height, view._max_offset())
+    while view.offset != view.target_offset:
+        view._scroll_step()
+        if view._scroll_job:
+            view.canvas.after_cancel(view._scroll_job)
+            view._scroll_job = None
+        root.update_idletasks()
+        frames += 1
+    return (time.perf_counter() - start) * 1000 / max(1, frames), frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--commands", default="100,1000,10000")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    root = tk.Tk()
+    root.geometry(f"320x{MAX_HEIGHT}+0+0")
+    for count in map(int, args.commands.split(",")):
+        names = [f"指令 {i} 解释这段代码" for i in range(count)]
+
+        legacy_frame = tk.Frame(root, bg=COLORS["bg"])
+        legacy_frame.pack(fill="x")
+        legacy_ms, legacy_mem = measure(root, lambda: legacy_refresh(legacy_frame, names), args.repeat)
+        legacy_frame.destroy()
+
+        view_frame = tk.Frame(root, bg=COLORS["bg"])
+        view_frame.pack(fill="x")
+        view = command_list.CommandListView(view_frame, COLORS, MAX_HEIGHT)
+        view_ms, view_mem = measure(root, lambda: view.set_items(names, 2 if count > 10 else 1), args.repeat)
+        items = len(view.canvas.find_all())
+        frame_ms, frames = scroll_page_ms(root, view)
+        view_frame.destroy()
+
+        print(f"{count:>6} 条指令")
+        print(f"    逐按钮 Canvas: 刷新 {legacy_ms:9.1f} ms，内存 +{fmt_mb(legacy_mem)}，{count} 个 Canvas")
+        print(f"    虚拟化列表:    刷新 {view_ms:9.1f} ms，内存 +{fmt_mb(view_mem)}，{items} 个图元；"
+              f"平滑滚动一屏 {frames} 帧，每帧 {frame_ms:.2f} ms")
+    root.destroy()
+
+
+if __name__ == "__main__":
+    import logging
+    logging.disable(logging.INFO)
+    main()
@@ -0,0 +1,115 @@
+"""
+指令搜索基准：在 N 条合成指令上模拟逐键输入，统计每次按键的过滤耗时（含取前 30 条结果），
+比较每次逐条扫描全部指令、索引构建完成前（扁平文本扫描 + 增量过滤）与三字符片段倒排索引 + 增量过滤，
+并与一帧（16.7 ms）比较。只统计输入方向的按键（删除方向命中查询缓存，耗时可忽略）。
+
+--vocab 控制词表大小：词表越小，每个词命中的指令越多（20 左右即每个查询都命中大部分指令的极端情况）。
+
+用法: python benchmarks/bench_command_search.py [--commands 50000] [--vocab 3000] [--queries 30]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import command_search  # noqa: E402
+
+FRAME_MS = 1000 / 60
+LIMIT = 30
+
+
+def make_vocab(size, rnd):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = set()
+    while len(words) < size:
+        if rnd.random() < 0.25:
+            words.add("".join(chr(rnd.randrange(0x4E00, 0x9FA5)) for _ in range(rnd.randint(2, 3))))
+        else:
+            words.add("".join(rnd.choice(letters) for _ in range(rnd.randint(3, 9))))
+    return sorted(words)
+
+
+def make_commands(count, vocab, rnd):
+    return [{"name": " ".join(rnd.choice(vocab) for _ in range(rnd.randint(2, 4))),
+             "text": " ".join(rnd.choice(vocab) for _ in range(rnd.randint(20, 60)))} for _ in range(count)]
+
+
+def make_queries(commands, count, rnd):
+    """从随机指令的名称或内容中取 1~2 个词作为要输入的查询"""
+    queries = []
+    for _ in range(count):
+        cmd = rnd.choice(commands)
+        words = (cmd["name"] if rnd.random() < 0.5 else cmd["text"]).split()
+        queries.append(" ".join(rnd.sample(words, min(len(words), rnd.randint(1, 2)))))
+    return queries
+
+
+class LinearScan:
+    """对照组：每次按键逐条检查全部指令"""
+    def __init__(self, commands):
+        self.names = [c["name"].casefold() for c in commands]
+        self.hays = [f"{n}\n{c['text']}".casefold() for n, c in zip(self.names, commands)]
+
+    def query(self, query, limit):
+        terms = command_search.split_terms(query)
+        matches = [i for i, hay in enumerate(self.hays) if all(t in hay for t in terms)]
+        in_name = [i for i in matches if all(t in self.names[i] for t in terms)]
+        seen = set(in_name)
+        return (in_name + [i for i in matches if i not in seen])[:limit], len(matches), True
+
+
+def type_queries(index, queries):
+    """逐键输入每个查询，返回 (每次按键的耗时列表（毫秒）, 每次的结果)"""
+    samples, results = [], []
+    for query in queries:
+        for text in (query[:k] for k in range(1, len(query) + 1)):
+            start = time.perf_counter()
+            results.append(index.query(text, LIMIT))
+            samples.append((time.perf_counter() - start) * 1000)
+    return samples, results
+
+
+def report(label, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    within = sum(s <= FRAME_MS for s in samples) / len(samples) * 100
+    print(f"{label:>14}: {len(samples)} 次按键，中位 {statistics.median(samples):6.2f} ms，"
+          f"P95 {p95:6.2f} ms，最大 {samples[-1]:6.2f} ms，一帧内 {within:5.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--commands", type=int, default=50000)
+    parser.add_argument("--vocab", type=int, default=3000)
+    parser.add_argument("--queries", type=int, default=30)
+    args = parser.parse_args()
+
+    rnd = random.Random(0)
+    commands = make_commands(args.commands, make_vocab(args.vocab, rnd), rnd)
+    queries = make_queries(commands, args.queries, rnd)
+
+    scan_samples, expected = type_queries(LinearScan(commands), queries)
+    print(f"{args.commands} 条指令，词表 {args.vocab}")
+    report("逐条扫描", scan_samples)
+
+    for label, build in (("扫描 + 增量", False), ("索引 + 增量", True)):
+        index = command_search.CommandIndex(commands)
+        if build:
+            index.build()
+        samples, results = type_queries(index, queries)
+        # 只枚举前 cap 条匹配：前 LIMIT 条结果必须一致，完整时计数也必须一致
+        same = all(r[0] == e[0] and (r[1] == e[1] if r[2] else e[1] > index.cap) for r, e in zip(results, expected))
+        report(label, samples)
+        s = index.stats
+        print(f"    {s['queries']} 次查询：增量 {s['incremental']}，索引 {s['indexed']}，扫描 {s['scanned']}，结果一致: {same}")
+    t = index.trigrams
+    print(f"    索引构建 {t.build_ms:.0f} ms，{len(t.grams)} 个片段，{t.docs.nbytes / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    import logging
+    logging.disable(logging.INFO)
+    main()
@@ -0,0 +1,98 @@
+"""
+SQLite 指令库基准：对 N 条指令测量一次性迁移、加载、单次编辑 / 拖动排序 / 新增 / 删除的耗时，
+与每次整体序列化 commands 列表比较。
+
+用法: python benchmarks/bench_command_store.py [--commands 10000,100000] [--ops 200]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import command_store  # noqa: E402
+
+WORDS = ["解释", "代码", "重构", "测试", "性能", "函数", "接口", "文档", "review", "refactor", "bug", "python",
+         "async", "cache", "index", "query", "优化", "日志", "异常", "类型"]
+
+
+def make_commands(count, seed=0):
+    rnd = random.Random(seed)
+    return [{"name": f"{rnd.choice(WORDS)} {i}",
+             "text": " ".join(rnd.choice(WORDS) for _ in range(12)) + f" #{i}",
+             "type": "text"} for i in range(count)]
+
+
+def timed(fn, repeat):
+    """重复执行 fn，返回每次耗时的中位数（毫秒）"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def run(count, ops, workdir):
+    live = make_commands(count)
+    path = os.path.join(workdir, f"commands_{count}.db")
+    store = command_store.CommandStore(path)
+    rnd = random.Random(1)
+
+    start = time.perf_counter()
+    store.migrate(live)
+    migrate_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    live = store.load()
+    load_ms = (time.perf_counter() - start) * 1000
+
+    def edit():
+        idx = rnd.randrange(len(live))
+        live[idx]["name"] += "*"
+        store.record("edit", live[idx], live, index=idx)
+
+    def move():
+        a, b = rnd.randrange(len(live)), rnd.randrange(len(live) - 1)
+        item = live.pop(a)
+        live.insert(b, item)
+        store.record("move", item, live, **{"from": a, "to": b})
+
+    def add():
+        cmd = {"name": "新指令", "text": "新内容 review", "type": "text"}
+        live.append(cmd)
+        store.record("add", cmd, live, index=len(live) - 1)
+
+    def delete():
+        idx = rnd.randrange(len(live))
+        store.record("delete", live.pop(idx), live, index=idx)
+
+    results = {name: timed(fn, ops) for name, fn in (("编辑", edit), ("排序", move), ("新增", add), ("删除", delete))}
+    serialize_ms = timed(lambda: json.dumps({"commands": live}, ensure_ascii=False, indent=4), 5)
+
+    consistent = [c["id"] for c in store.load()] == [c["id"] for c in live]
+    store.close()
+
+    print(f"{count:>7} 条指令: 迁移 {migrate_ms:8.0f} ms，加载 {load_ms:6.0f} ms，"
+          f"数据库 {os.path.getsize(path) / 1024 / 1024:5.1f} MB，顺序一致: {consistent}")
+    print("          单次更新 (ms): " + "，".join(f"{k} {v:.3f}" for k, v in results.items())
+          + f"；整体序列化 {serialize_ms:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--commands", default="10000,100000")
+    parser.add_argument("--ops", type=int, default=200)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as workdir:
+        for count in map(int, args.commands.split(",")):
+            run(count, args.ops, workdir)
+
+
+if __name__ == "__main__":
+    import logging
+    logging.disable(logging.INFO)
+    main()
@@ -0,0 +1,101 @@
+"""
+配置存储基准：对含 N 条指令的配置执行一串随机的编辑 / 拖动排序 / 新增 / 删除，
+比较每次整体重写 config.json 与追加变更日志（含后台压缩）的界面线程耗时和写入字节数，并校验重放结果一致。
+
+用法: python benchmarks/bench_config_journal.py [--commands 1000,5000] [--ops 300]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import config_journal  # noqa: E402
+from config_writer import atomic_write  # noqa: E402
+
+
+def make_config(count):
+    return {"commands": [{"name": f"指令 {i}", "text": f"请帮我检查这段代码 #{i}\n" * 4, "type": "text"}
+                         for i in range(count)], "state": {"theme": "Dark"}}
+
+
+def random_ops(count, ops, seed=0):
+    """生成与 QuickBar 各操作对应的变更（对 live 列表的修改 + 日志记录参数）"""
+    rnd = random.Random(seed)
+    size = count
+    for n in range(ops):
+        kind = rnd.choice(("edit", "edit", "move", "move", "add", "delete"))
+        if kind == "add":
+            size += 1
+            yield "add", {"index": size - 1, "cmd": {"name": f"新指令 {n}", "text": "新内容", "type": "text"}}
+        elif kind == "edit":
+            yield "edit", {"index": rnd.randrange(size)}
+        elif kind == "move":
+            yield "move", {"from": rnd.randrange(size), "to": rnd.randrange(size - 1)}
+        else:
+            size -= 1
+            yield "delete", {"index": rnd.randrange(size + 1)}
+
+
+def apply_live(data, op, fields):
+    """修改界面持有的配置，返回要记入日志的字段（编辑需带上修改后的指令）"""
+    if op == "edit":
+        cmd = dict(data["commands"][fields["index"]])
+        cmd["name"] += "*"
+        fields = dict(fields, cmd=cmd)
+    config_journal.apply_record(data, dict(fields, op=op))
+    return fields
+
+
+def run_json(path, count, ops):
+    data = make_config(count)
+    start = time.perf_counter()
+    written = 0
+    for op, fields in random_ops(count, ops):
+        apply_live(data, op, fields)
+        written += atomic_write(path, json.dumps(data, ensure_ascii=False, indent=4))
+    return (time.perf_counter() - start) * 1000, written, data
+
+
+def run_journal(path, count, ops):
+    data = make_config(count)
+    atomic_write(path, json.dumps(data, ensure_ascii=False, indent=4))
+    journal = config_journal.ChangeJournal(path, data).start()
+    start = time.perf_counter()
+    ui_ms = 0.0
+    for op, fields in random_ops(count, ops):
+        fields = apply_live(data, op, fields)
+        t = time.perf_counter()
+        journal.append(op, **fields)
+        ui_ms += (time.perf_counter() - t) * 1000
+    journal.flush()
+    total = (time.perf_counter() - start) * 1000
+    loaded = json.load(open(path, encoding="utf-8"))
+    config_journal.replay(path, loaded)
+    return total, ui_ms, journal.stats, loaded == data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--commands", default="1000,5000")
+    parser.add_argument("--ops", type=int, default=300)
+    args = parser.parse_args()
+
+    for count in map(int, args.commands.split(",")):
+        with tempfile.TemporaryDirectory() as workdir:
+            path = os.path.join(workdir, "config.json")
+            json_ms, json_bytes, _ = run_json(path, count, args.ops)
+            total, ui_ms, stats, same = run_journal(path, count, args.ops)
+            print(f"{count:>6} 条指令 x {args.ops} 次变更")
+            print(f"    整体重写: {json_ms:8.1f} ms，写入 {json_bytes / 1024:9.0f} KB")
+            print(f"    变更日志: 界面线程 {ui_ms:6.1f} ms（含后台共 {total:7.1f} ms），"
+                  f"日志 {stats['bytes'] / 1024:6.0f} KB，压缩 {stats['compactions']} 次，重放一致: {same}")
+
+
+if __name__ == "__main__":
+    import logging
+    logging.disable(logging.INFO)
+    main()
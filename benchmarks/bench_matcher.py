@@ -0,0 +1,95 @@
+"""
+锚点匹配基准：在合成截图上比较内置 NumPy 匹配器与 pyscreeze 现有路径的吞吐量。
+
+用法: python benchmarks/bench_matcher.py [--sizes 1920x1080,7680x2160] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import matcher  # noqa: E402
+
+
+def synthetic_screen(width, height, seed=0):
+    """生成类似 IDE 界面的合成截图：深色底 + 随机色块 + 文本状噪点"""
+    rng = np.random.default_rng(seed)
+    img = np.full((height, width, 3), 30, dtype=np.uint8)
+    for _ in range(max(40, width * height // 40000)):
+        x, y = rng.integers(0, width - 8), rng.integers(0, height - 8)
+        w, h = rng.integers(8, 240), rng.integers(8, 60)
+        img[y:y + h, x:x + w] = rng.integers(20, 235, size=3)
+    mask = rng.random((height, width)) < 0.04
+    img[mask] = 220
+    return Image.fromarray(img)
+
+
+def time_it(fn, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def bench_pyscreeze(haystack, needle, repeat):
+    """现有路径：pyscreeze.locate（有 OpenCV 时走 confidence=0.7，否则走纯 Python 精确匹配）"""
+    try:
+        import pyscreeze
+    except ImportError:
+        return None, "pyscreeze 未安装"
+    try:
+        return time_it(lambda: pyscreeze.locate(needle, haystack, confidence=0.7), repeat)[0], "confidence=0.7"
+    except NotImplementedError:
+        # 未安装 OpenCV 时 pyscreeze 不支持 confidence
+        return time_it(lambda: pyscreeze.locate(needle, haystack), repeat)[0], "精确匹配 (无 OpenCV)"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="1920x1080,3840x2160,7680x2160")
+    parser.add_argument("--needle", default="120x36")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    nw, nh = map(int, args.needle.split("x"))
+    print(f"{'haystack':>12} {'method':>22} {'best(ms)':>10} {'Mpx/s':>8}  result")
+    for size in args.sizes.split(","):
+        width, height = map(int, size.split("x"))
+        haystack = synthetic_screen(width, height)
+        nx, ny = width * 2 // 3, height // 2
+        needle = haystack.crop((nx, ny, nx + nw, ny + nh))
+        hay_gray, needle_gray = matcher.to_gray(haystack), matcher.to_gray(needle)
+        mpx = width * height / 1e6
+
+        rows = []
+        for method in ("fft", "direct"):
+            if method == "direct" and width * height > 1920 * 1080:
+                continue  # 直接滑窗在 4K 上耗时过长，仅作小图对照
+            elapsed, (box, score) = time_it(lambda m=method: matcher.best_match(hay_gray, needle_gray, m), args.repeat)
+            rows.append((f"matcher[{method}]", elapsed, f"{box} score={score:.3f}"))
+        elapsed, box = time_it(lambda: matcher.locate(haystack, needle), args.repeat)
+        rows.append(("matcher.locate(PIL)", elapsed, str(box)))
+        elapsed, pyramid = time_it(lambda: matcher.Pyramid(hay_gray), args.repeat)
+        rows.append(("Pyramid build", elapsed, f"{len(pyramid.levels)} levels"))
+        elapsed, (box, score) = time_it(lambda: pyramid.best_match(needle_gray), args.repeat)
+        rows.append(("Pyramid.best_match", elapsed, f"{box} score={score:.3f}"))
+
+        elapsed, note = bench_pyscreeze(haystack, needle, args.repeat)
+        rows.append(("pyscreeze.locate", elapsed, note))
+
+        for name, elapsed, result in rows:
+            if elapsed is None:
+                print(f"{size:>12} {name:>22} {'-':>10} {'-':>8}  {result}")
+            else:
+                print(f"{size:>12} {name:>22} {elapsed * 1000:>10.1f} {mpx / elapsed:>8.1f}  {result}")
+
+
+if __name__ == "__main__":
+    main()
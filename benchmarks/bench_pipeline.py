@@ -0,0 +1,88 @@
+"""
+锚点定位全流程基准：用 capture.FileCapture 回放合成的 PNG 截图夹具，在无界面环境下跑完整的
+原位校验 -> 窗口区域金字塔搜索 -> 逐级外扩 流程，并输出每次按键的耗时与快速路径统计。
+
+用法: python benchmarks/bench_pipeline.py [--size 3840x2160] [--presses 5]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import capture  # noqa: E402
+import matcher  # noqa: E402
+from anchors import AnchorLocator  # noqa: E402
+from bench_matcher import synthetic_screen  # noqa: E402
+
+
+def build_fixtures(workdir, width, height):
+    """生成三帧夹具：原始位置 / 窗口右移 300px / 150% DPI 显示器，返回 (帧路径, 锚点路径, 各帧窗口矩形)"""
+    base = synthetic_screen(width, height)
+    win = (width // 4, height // 6, width // 4 + 1400, height // 6 + 900)
+    anchor_xy = (win[0] + 900, win[1] + 760)
+    anchor = base.crop((anchor_xy[0], anchor_xy[1], anchor_xy[0] + 120, anchor_xy[1] + 36))
+    anchor_path = os.path.join(workdir, "anchor.png")
+    anchor.save(anchor_path)
+
+    frames, rects = [], []
+    frames.append(base)
+    rects.append(win)
+
+    moved = synthetic_screen(width, height, seed=1)
+    moved.paste(base.crop(win), (win[0] + 300, win[1]))
+    frames.append(moved)
+    rects.append((win[0] + 300, win[1], win[2] + 300, win[3]))
+
+    window = base.crop(win)
+    scaled = window.resize((int(window.width * 1.5), int(window.height * 1.5)), Image.BILINEAR)
+    hidpi = synthetic_screen(width, height, seed=2)
+    hidpi.paste(scaled, (win[0], win[1]))
+    frames.append(hidpi)
+    rects.append((win[0], win[1], win[0] + scaled.width, win[1] + scaled.height))
+
+    paths = []
+    for i, frame in enumerate(frames):
+        path = os.path.join(workdir, f"frame_{i}.png")
+        frame.save(path)
+        paths.append(path)
+    return paths, anchor_path, rects
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", default="3840x2160")
+    parser.add_argument("--presses", type=int, default=5, help="每帧模拟的按键次数")
+    args = parser.parse_args()
+    width, height = map(int, args.size.split("x"))
+
+    with tempfile.TemporaryDirectory() as workdir:
+        paths, anchor_path, rects = build_fixtures(workdir, width, height)
+        backend = capture.FileCapture(paths)
+        backend.frame()  # 预先解码第一帧，避免计入首次按键
+        cache = matcher.AnchorCache()
+        cache.warm([anchor_path])
+        locator = AnchorLocator(backend, cache)
+        config = {"image": anchor_path, "offset_x": 0, "offset_y": -45}
+        labels = ["原始位置", "窗口右移", "150% DPI"]
+
+        print(f"{'frame':>10} {'press':>5} {'ms':>8} {'grabs':>5}  result")
+        for i, rect in enumerate(rects):
+            if i:
+                backend.advance()
+                backend.frame()
+            for press in range(args.presses):
+                grabs = backend.grab_count
+                start = time.perf_counter()
+                # 每次按键对应一次 _automation_task，金字塔缓存只在单次任务内共享
+                loc, scale = locator.locate(config, rect, key=("VS Code", "Claude"), frames={})
+                elapsed = (time.perf_counter() - start) * 1000
+                print(f"{labels[i]:>10} {press:>5} {elapsed:>8.1f} {backend.grab_count - grabs:>5}  {loc} scale={scale}")
+        print(f"快速路径统计: {locator.stats}")
+
+
+if __name__ == "__main__":
+    main()
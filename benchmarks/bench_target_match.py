@@ -0,0 +1,83 @@
+"""
+目标窗口规则基准：比较每个窗口都执行 re.search(win_title, title, re.I) 的原筛选逻辑
+与预编译 TargetMatcher（类名 + 字面量预筛 + 必要时正则）的耗时，并校验两者结果一致。
+
+用法: python benchmarks/bench_target_match.py [--windows 2000] [--title-len 200]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from window_finder import CONSOLE_CLASS, EDITOR_CLASS, compile_target  # noqa: E402
+
+RULES = [
+    ("VS Code", ".*Visual Studio Code.*"),
+    ("Antigravity", ".*Antigravity.*"),
+    ("Native CLI", "^(?!.*(Antigravity|QuickBar)).*(PowerShell|Windows PowerShell|CMD|cmd.exe|powershell.exe|WindowsTerminal|bash|zsh).*"),
+    ("Native CLI", "^(?!.*(Antigravity|QuickBar)).*(PowerShell|zsh|bash).*"),
+    ("VS Code", "^main\\.py - .*Visual Studio Code$"),
+]
+
+WORDS = ["main.py", "project", "Visual Studio Code", "Antigravity", "Windows PowerShell", "cmd.exe", "bash",
+         "Inbox", "Google Chrome", "QuickBar", "notes", "README.md", "Terminal", "zsh", "Mail", "设置"]
+CLASSES = [EDITOR_CLASS, EDITOR_CLASS, CONSOLE_CLASS, "ApplicationFrameWindow", "Notepad", "CASCADIA_HOSTING_WINDOW_CLASS"]
+
+
+def legacy_matches(ide_mode, title, cls, target_regex):
+    """原 filter_window 规则：每个窗口现场 re.search"""
+    if title and "QuickBar" in title and cls == "TkTopLevel": return False
+    is_vscode_cls = (cls == EDITOR_CLASS)
+    is_cmd_cls = (cls == CONSOLE_CLASS)
+    if ide_mode in ["VS Code", "Antigravity"]:
+        return is_vscode_cls and bool(re.search(target_regex, title, re.I))
+    if ide_mode == "Native CLI":
+        return (is_cmd_cls or bool(re.search(target_regex, title, re.I))) and not is_vscode_cls
+    return False
+
+
+def synthetic_windows(count, title_len, rng):
+    windows = []
+    for _ in range(count):
+        words = []
+        while sum(len(w) + 3 for w in words) < rng.randint(8, title_len):
+            words.append(rng.choice(WORDS))
+        title = " - ".join(words)
+        if rng.random() < 0.3:
+            title = title.upper() if rng.random() < 0.5 else title.lower()
+        windows.append((title, rng.choice(CLASSES)))
+    return windows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--windows", type=int, default=2000)
+    parser.add_argument("--title-len", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    windows = synthetic_windows(args.windows, args.title_len, random.Random(0))
+
+    for mode, rule in RULES:
+        matcher = compile_target(mode, rule)
+        mismatches = sum(legacy_matches(mode, t, c, rule) != matcher.matches(t, c) for t, c in windows)
+
+        timings = []
+        for fn in (lambda t, c: legacy_matches(mode, t, c, rule), matcher.matches):
+            best = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                for title, cls in windows:
+                    fn(title, cls)
+                best = min(best, time.perf_counter() - start)
+            timings.append(best / len(windows) * 1e6)
+
+        kind = "纯子串" if matcher.exact else ("预筛+正则" if matcher.include is not None else "仅正则")
+        print(f"[{mode}] {rule[:48]:<48} re.search {timings[0]:6.2f} us | TargetMatcher {timings[1]:6.2f} us "
+              f"({kind}) | 不一致 {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
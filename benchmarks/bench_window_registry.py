@@ -0,0 +1,99 @@
+"""
+窗口注册表基准：在模拟桌面上用合成事件流驱动 WindowRegistry，比较事件索引吞吐、
+O(1) 查表与每次点击全量枚举（window_finder.enum_target_windows）的耗时。
+
+用法: python benchmarks/bench_window_registry.py [--windows 300] [--events 50000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from window_finder import compile_target, enum_target_windows  # noqa: E402
+from window_registry import SimulatedDesktop, WindowRegistry  # noqa: E402
+
+TARGETS = {
+    ("VS Code", "Claude"): ("VS Code", ".*Visual Studio Code.*"),
+    ("VS Code", "Codex"): ("VS Code", ".*Visual Studio Code.*"),
+    ("Antigravity", "Claude"): ("Antigravity", ".*Antigravity.*"),
+    ("Native CLI", "Terminal"): ("Native CLI", "^(?!.*(Antigravity|QuickBar)).*(PowerShell|Windows PowerShell|CMD|cmd.exe|powershell.exe|WindowsTerminal|bash|zsh).*"),
+}
+
+TITLES = [
+    ("main.py - project - Visual Studio Code", "Chrome_WidgetWin_1"),
+    ("agent - Antigravity", "Chrome_WidgetWin_1"),
+    ("Windows PowerShell", "ConsoleWindowClass"),
+    ("Inbox - Mail", "ApplicationFrameWindow"),
+    ("Google Chrome", "Chrome_WidgetWin_1"),
+    ("Untitled - Notepad", "Notepad"),
+    ("", "IME"),
+]
+
+
+def populate(desktop, count, rng):
+    hwnds = []
+    for i in range(count):
+        title, cls = rng.choice(TITLES)
+        hwnds.append(desktop.create(f"{title} {i}" if title else "", cls))
+    return hwnds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--windows", type=int, default=300)
+    parser.add_argument("--events", type=int, default=50000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    desktop = SimulatedDesktop()
+    hwnds = populate(desktop, args.windows, rng)
+    registry = WindowRegistry(desktop, {key: compile_target(*rule) for key, rule in TARGETS.items()}, desktop)
+
+    start = time.perf_counter()
+    registry.start()
+    print(f"初始索引 ({args.windows} 个窗口): {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    # 合成事件流：以标题变化和前台切换为主，夹杂窗口创建 / 销毁 / 最小化
+    start = time.perf_counter()
+    for i in range(args.events):
+        r = rng.random()
+        if r < 0.55:
+            hwnd = rng.choice(hwnds)
+            title, _ = rng.choice(TITLES)
+            desktop.rename(hwnd, f"{title} #{i}")
+        elif r < 0.85:
+            desktop.focus(rng.choice(hwnds))
+        elif r < 0.92:
+            hwnd = rng.choice(hwnds)
+            desktop.minimize(hwnd, not desktop.IsIconic(hwnd))
+        else:
+            victim = hwnds.pop(rng.randrange(len(hwnds)))
+            desktop.destroy(victim)
+            title, cls = rng.choice(TITLES)
+            hwnds.append(desktop.create(f"{title} new{i}", cls))
+    elapsed = time.perf_counter() - start
+    print(f"事件索引: {args.events} 个事件 {elapsed * 1000:.1f} ms ({args.events / elapsed:,.0f} 事件/秒)")
+
+    for (ide, ai), (mode, regex) in TARGETS.items():
+        start = time.perf_counter()
+        for _ in range(args.lookups):
+            hwnd = registry.lookup(ide, ai)
+        lookup_us = (time.perf_counter() - start) / args.lookups * 1e6
+
+        start = time.perf_counter()
+        for _ in range(max(1, args.lookups // 20)):
+            found = enum_target_windows(desktop, mode, regex)
+        enum_us = (time.perf_counter() - start) / max(1, args.lookups // 20) * 1e6
+
+        consistent = (hwnd in found) if found else hwnd is None
+        print(f"{ide + '/' + ai:>22}: 查表 {lookup_us:8.2f} us | 全量枚举 {enum_us:10.2f} us | 一致: {consistent}")
+    print(f"统计: {registry.stats}")
+
+
+if __name__ == "__main__":
+    import logging
+    logging.disable(logging.INFO)
+    main()
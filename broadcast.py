@@ -0,0 +1,62 @@
+"""
+广播发送：把同一条指令发往多个 (IDE, AI) 目标。
+
+分两个阶段：
+1. 准备（并行）：在线程池中同时解析各目标窗口并预定位锚点。截图（BitBlt）与 NumPy 匹配大部分时间
+   不持有 GIL，线程池即可重叠执行；窗口缓存、锚点缓存等预热状态都在进程内，因此不使用进程池
+2. 投递（串行）：激活窗口并输入，涉及焦点、鼠标和键盘，只能逐个进行；锚点已在准备阶段命中，
+   投递时走原位校验快速路径
+"""
+import collections
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+TargetReport = collections.namedtuple("TargetReport", "target ok prepare_ms deliver_ms error")
+
+
+def broadcast(targets, prepare, deliver, max_workers=4):
+    """
+    prepare(target) 在线程池中并行执行，返回值传给 deliver(target, prepared)，抛出异常则跳过该目标的投递；
+    deliver 按 targets 顺序串行执行，返回是否成功。返回每个目标的 TargetReport 列表（顺序与 targets 一致）。
+    """
+    targets = list(targets)
+
+    def timed_prepare(target):
+        start = time.perf_counter()
+        try:
+            return prepare(target), None, (time.perf_counter() - start) * 1000
+        except Exception as e:
+            return None, e, (time.perf_counter() - start) * 1000
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(targets)))) as pool:
+        prepared = list(pool.map(timed_prepare, targets))
+
+    reports = []
+    for target, (value, error, prepare_ms) in zip(targets, prepared):
+        if error is not None:
+            reports.append(TargetReport(target, False, prepare_ms, 0.0, str(error)))
+            continue
+        start = time.perf_counter()
+        try:
+            ok, error = bool(deliver(target, value)), None
+        except Exception as e:
+            ok, error = False, str(e)
+        reports.append(TargetReport(target, ok, prepare_ms, (time.perf_counter() - start) * 1000, error))
+    return reports
+
+
+def format_summary(reports):
+    """汇总为一段文本：每个目标一行（成功与否、准备与投递耗时）"""
+    ok_count = sum(r.ok for r in reports)
+    lines = [f"广播完成: {ok_count}/{len(reports)} 个目标成功"]
+    for r in reports:
+        ide, ai = r.target
+        status = "成功" if r.ok else "失败"
+        line = f"  {ide} / {ai}: {status}，准备 {r.prepare_ms:.0f} ms，投递 {r.deliver_ms:.0f} ms"
+        if r.error:
+            line += f"（{r.error}）"
+        lines.append(line)
+    return "\n".join(lines)
@@ -0,0 +1,221 @@
+"""
+屏幕截图后端：统一的区域截图接口，供锚点匹配、校准放大镜和锚点保存共用。
+
+- GdiCapture: Windows 下的快速后端，BitBlt 只拷贝请求的矩形，像素写入可复用的缓冲区（mss 同款做法）
+- PilCapture: 基于 PIL.ImageGrab 的通用后端
+- FileCapture: 回放 PNG 截图夹具的确定性后端，用于在 Linux 无界面环境下测试与基准
+"""
+import ctypes
+import glob
+import logging
+import os
+import sys
+import threading
+from ctypes import wintypes
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+class CaptureBackend:
+    """截图后端基类，区域统一为 (left, top, width, height)，坐标为虚拟桌面坐标"""
+    name = "base"
+
+    def bounds(self):
+        """返回可截取范围（虚拟桌面）的 (left, top, width, height)"""
+        raise NotImplementedError
+
+    def grab(self, region):
+        """返回区域的 RGB uint8 数组；后端可能复用缓冲区，需要保留时请自行 copy"""
+        raise NotImplementedError
+
+    def grab_image(self, region):
+        """返回区域的 PIL 图像（独立副本，可保存或显示）"""
+        return Image.fromarray(np.ascontiguousarray(self.grab(region)))
+
+
+def _win_virtual_screen():
+    user32 = ctypes.windll.user32
+    # SM_XVIRTUALSCREEN / SM_YVIRTUALSCREEN / SM_CXVIRTUALSCREEN / SM_CYVIRTUALSCREEN
+    return tuple(user32.GetSystemMetrics(i) for i in (76, 77, 78, 79))
+
+
+class BITMAPINFOHEADER(ctypes.Structure):
+    _fields_ = [("biSize", wintypes.DWORD), ("biWidth", wintypes.LONG), ("biHeight", wintypes.LONG),
+                ("biPlanes", wintypes.WORD), ("biBitCount", wintypes.WORD), ("biCompression", wintypes.DWORD),
+                ("biSizeImage", wintypes.DWORD), ("biXPelsPerMeter", wintypes.LONG),
+                ("biYPelsPerMeter", wintypes.LONG), ("biClrUsed", wintypes.DWORD), ("biClrImportant", wintypes.DWORD)]
+
+
+class BITMAPINFO(ctypes.Structure):
+    _fields_ = [("bmiHeader", BITMAPINFOHEADER), ("bmiColors", wintypes.DWORD * 3)]
+
+
+class GdiCapture(CaptureBackend):
+    """
+    GDI 区域截图：只 BitBlt 请求的矩形，再用 GetDIBits 写入按尺寸复用的 BGRA 缓冲区。
+    GDI 设备上下文与线程相关，因此每个线程维护各自的 DC / 位图 / 缓冲区。
+    """
+    name = "gdi"
+    SRCCOPY = 0x00CC0020
+    DIB_RGB_COLORS = 0
+    # DPI_AWARENESS_CONTEXT_PER_MONITOR_AWARE，与 PIL.ImageGrab 一致地按物理像素截图
+    DPI_CONTEXT = ctypes.c_void_p(-3)
+
+    def __init__(self):
+        self._user32 = ctypes.windll.user32
+        self._gdi32 = ctypes.windll.gdi32
+        for fn in ("GetDC", "CreateCompatibleDC", "CreateCompatibleBitmap", "SelectObject"):
+            lib = self._user32 if fn == "GetDC" else self._gdi32
+            getattr(lib, fn).restype = ctypes.c_void_p
+        self._gdi32.CreateCompatibleDC.argtypes = [ctypes.c_void_p]
+        self._gdi32.CreateCompatibleBitmap.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.c_int]
+        self._gdi32.SelectObject.argtypes = [ctypes.c_void_p, ctypes.c_void_p]
+        self._gdi32.DeleteObject.argtypes = [ctypes.c_void_p]
+        self._gdi32.BitBlt.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int,
+                                       ctypes.c_void_p, ctypes.c_int, ctypes.c_int, wintypes.DWORD]
+        self._gdi32.GetDIBits.argtypes = [ctypes.c_void_p, ctypes.c_void_p, wintypes.UINT, wintypes.UINT,
+                                          ctypes.c_void_p, ctypes.c_void_p, wintypes.UINT]
+        self._set_dpi_context = getattr(self._user32, "SetThreadDpiAwarenessContext", None)
+        if self._set_dpi_context:
+            self._set_dpi_context.restype = ctypes.c_void_p
+            self._set_dpi_context.argtypes = [ctypes.c_void_p]
+        self._local = threading.local()
+
+    def _state(self):
+        st = self._local
+        if not getattr(st, "src_dc", None):
+            st.src_dc = self._user32.GetDC(None)
+            st.mem_dc = self._gdi32.CreateCompatibleDC(st.src_dc)
+            st.bitmap, st.size, st.buffer = None, (0, 0), None
+            st.bmi = BITMAPINFO()
+            st.bmi.bmiHeader.biSize = ctypes.sizeof(BITMAPINFOHEADER)
+            st.bmi.bmiHeader.biPlanes, st.bmi.bmiHeader.biBitCount = 1, 32
+        return st
+
+    def bounds(self):
+        return _win_virtual_screen()
+
+    def grab(self, region):
+        left, top, width, height = (int(v) for v in region)
+        st = self._state()
+        if st.size != (width, height):
+            # 仅在尺寸变化时重建位图与缓冲区，相同区域的连续截图零分配
+            if st.bitmap:
+                self._gdi32.DeleteObject(st.bitmap)
+            st.bitmap = self._gdi32.CreateCompatibleBitmap(st.src_dc, width, height)
+            self._gdi32.SelectObject(st.mem_dc, st.bitmap)
+            st.bmi.bmiHeader.biWidth, st.bmi.bmiHeader.biHeight = width, -height  # 负高度 = 自顶向下
+            st.buffer = np.empty((height, width, 4), dtype=np.uint8)
+            st.size = (width, height)
+
+        prev = self._set_dpi_context(self.DPI_CONTEXT) if self._set_dpi_context else None
+        try:
+            self._gdi32.BitBlt(st.mem_dc, 0, 0, width, height, st.src_dc, left, top, self.SRCCOPY)
+            self._gdi32.GetDIBits(st.mem_dc, st.bitmap, 0, height, st.buffer.ctypes.data,
+                                  ctypes.byref(st.bmi), self.DIB_RGB_COLORS)
+        finally:
+            if prev:
+                self._set_dpi_context(prev)
+        # BGRA -> RGB 视图，不产生拷贝
+        return st.buffer[..., 2::-1]
+
+
+class PilCapture(CaptureBackend):
+    """基于 PIL.ImageGrab 的通用后端（Windows 上会先截整个虚拟桌面再裁剪，较慢）"""
+    name = "pil"
+
+    def bounds(self):
+        if sys.platform == "win32":
+            return _win_virtual_screen()
+        from PIL import ImageGrab
+        w, h = ImageGrab.grab().size
+        return (0, 0, w, h)
+
+    def grab_image(self, region):
+        from PIL import ImageGrab
+        left, top, width, height = region
+        return ImageGrab.grab(bbox=(left, top, left + width, top + height), all_screens=True)
+
+    def grab(self, region):
+        return np.asarray(self.grab_image(region).convert("RGB"))
+
+
+class FileCapture(CaptureBackend):
+    """
+    回放 PNG 夹具的确定性后端：每帧是一张完整的虚拟桌面截图，origin 为其左上角的桌面坐标。
+    advance() 切换到下一帧（循环），区域超出帧范围的部分以黑色填充。
+    """
+    name = "file"
+
+    def __init__(self, paths, origin=(0, 0)):
+        if isinstance(paths, str):
+            paths = [paths]
+        if not paths:
+            raise ValueError("FileCapture 需要至少一张 PNG 夹具")
+        self.paths = list(paths)
+        self.origin = origin
+        self.index = 0
+        self.grab_count = 0
+        self._frames = {}
+
+    def frame(self):
+        """当前帧的 RGB 数组（首次访问时解码并缓存）"""
+        path = self.paths[self.index]
+        arr = self._frames.get(path)
+        if arr is None:
+            with Image.open(path) as img:
+                arr = self._frames[path] = np.asarray(img.convert("RGB"))
+        return arr
+
+    def advance(self):
+        self.index = (self.index + 1) % len(self.paths)
+        return self.index
+
+    def bounds(self):
+        h, w = self.frame().shape[:2]
+        return (self.origin[0], self.origin[1], w, h)
+
+    def grab(self, region):
+        self.grab_count += 1
+        frame = self.frame()
+        left, top, width, height = (int(v) for v in region)
+        out = np.zeros((height, width, 3), dtype=np.uint8)
+        x0, y0 = left - self.origin[0], top - self.origin[1]
+        sx0, sy0 = max(x0, 0), max(y0, 0)
+        sx1, sy1 = min(x0 + width, frame.shape[1]), min(y0 + height, frame.shape[0])
+        if sx1 > sx0 and sy1 > sy0:
+            out[sy0 - y0:sy1 - y0, sx0 - x0:sx1 - x0] = frame[sy0:sy1, sx0:sx1]
+        return out
+
+
+def create_backend(spec=None):
+    """
+    按名称创建截图后端：auto / gdi / pil / file:<glob>。
+    未指定时读取环境变量 QUICKBAR_CAPTURE，默认 auto（Windows 用 GDI，其余平台用 PIL）。
+    """
+    spec = spec or os.environ.get("QUICKBAR_CAPTURE", "auto")
+    if spec.startswith("file:"):
+        return FileCapture(sorted(glob.glob(spec[len("file:"):])))
+    if spec in ("auto", "gdi") and sys.platform == "win32":
+        try:
+            return GdiCapture()
+        except Exception as e:
+            logger.warning(f"GDI 截图后端初始化失败，回退到 PIL: {e}")
+    return PilCapture()
+
+
+_default_backend = None
+_default_lock = threading.Lock()
+
+
+def get_default():
+    """进程内共享的默认截图后端"""
+    global _default_backend
+    with _default_lock:
+        if _default_backend is None:
+            _default_backend = create_backend()
+            logger.info(f"截图后端: {_default_backend.name}")
+        return _default_backend
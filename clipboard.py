@@ -0,0 +1,290 @@
+"""
+剪贴板读写与保存/恢复：粘贴指令前快照用户剪贴板的全部可读格式，粘贴完成后在后台恢复。
+
+后端接口与 pyperclip 一致（copy / paste），另加 snapshot / restore：
+- Win32Clipboard: ctypes 直接操作剪贴板，一次打开即完成整段写入，适合数 MB 的长指令
+- PyperclipClipboard: 通用后端，只能保存/恢复纯文本
+- MemoryClipboard: 内存替身，用于在无剪贴板环境下验证保存/恢复流程
+"""
+import ctypes
+import logging
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CF_UNICODETEXT = 13
+# 快照读取的时间预算（秒）：延迟渲染的格式在读取时才由来源程序生成，可能很慢；
+# 超出预算后不再读取剩余格式（文本格式总是最先读取）
+SNAPSHOT_BUDGET = 0.03
+
+
+class ClipboardBackend:
+    """剪贴板后端基类；快照为 {格式: bytes} 字典"""
+    name = "base"
+
+    def copy(self, text):
+        raise NotImplementedError
+
+    def paste(self):
+        raise NotImplementedError
+
+    def snapshot(self, budget=None):
+        """快照当前剪贴板；budget 为读取各格式的时间预算（秒），None 表示不限"""
+        raise NotImplementedError
+
+    def restore(self, snapshot):
+        raise NotImplementedError
+
+
+class MemoryClipboard(ClipboardBackend):
+    """内存剪贴板替身：文本以 CF_UNICODETEXT 格式与其它格式一起保存"""
+    name = "memory"
+
+    def __init__(self, formats=None):
+        self.formats = dict(formats or {})
+        self.writes = 0
+
+    def copy(self, text):
+        self.formats = {CF_UNICODETEXT: (text + "\0").encode("utf-16-le")}
+        self.writes += 1
+
+    def paste(self):
+        data = self.formats.get(CF_UNICODETEXT)
+        return data.decode("utf-16-le").rstrip("\0") if data else ""
+
+    def snapshot(self, budget=None):
+        return dict(self.formats)
+
+    def restore(self, snapshot):
+        self.formats = dict(snapshot)
+        self.writes += 1
+
+
+class PyperclipClipboard(ClipboardBackend):
+    """基于 pyperclip 的通用后端，快照只包含文本"""
+    name = "pyperclip"
+
+    def __init__(self):
+        import pyperclip
+        self._pyperclip = pyperclip
+
+    def copy(self, text):
+        self._pyperclip.copy(text)
+
+    def paste(self):
+        return self._pyperclip.paste()
+
+    def snapshot(self, budget=None):
+        text = self.paste()
+        return {CF_UNICODETEXT: (text + "\0").encode("utf-16-le")} if text else {}
+
+    def restore(self, snapshot):
+        data = snapshot.get(CF_UNICODETEXT)
+        self.copy(data.decode("utf-16-le").rstrip("\0") if data else "")
+
+
+class Win32Clipboard(ClipboardBackend):
+    """ctypes 剪贴板后端：枚举并复制所有 HGLOBAL 格式，写入时整段一次 GlobalAlloc + memmove"""
+    name = "win32"
+    GMEM_MOVEABLE = 0x0002
+    # 句柄不是 HGLOBAL 内存块的格式（GDI 对象、元文件、自绘格式），无法按字节保存；
+    # CF_BITMAP 等会由系统从 CF_DIB 自动合成，因此不影响图片恢复
+    SKIP_FORMATS = {2, 3, 9, 14, 0x0080, 0x0082, 0x0083, 0x008E}
+    GDI_OBJECT_RANGE = range(0x0300, 0x0400)
+    # 系统可由另一格式自动合成的格式 -> 来源格式：来源存在时不读取（CF_TEXT / CF_OEMTEXT / CF_LOCALE
+    # 由 CF_UNICODETEXT 合成，CF_DIBV5 由 CF_DIB 合成），恢复来源后系统会重新合成
+    SYNTHESIZED = {1: CF_UNICODETEXT, 7: CF_UNICODETEXT, 16: CF_UNICODETEXT, 17: 8}
+    OPEN_RETRIES = 10
+
+    def __init__(self):
+        self._user32 = ctypes.windll.user32
+        self._kernel32 = ctypes.windll.kernel32
+        self._user32.GetClipboardData.restype = ctypes.c_void_p
+        self._user32.SetClipboardData.argtypes = [ctypes.c_uint, ctypes.c_void_p]
+        self._user32.SetClipboardData.restype = ctypes.c_void_p
+        self._kernel32.GlobalAlloc.argtypes = [ctypes.c_uint, ctypes.c_size_t]
+        self._kernel32.GlobalAlloc.restype = ctypes.c_void_p
+        for fn in ("GlobalLock", "GlobalUnlock", "GlobalSize", "GlobalFree"):
+            getattr(self._kernel32, fn).argtypes = [ctypes.c_void_p]
+        self._kernel32.GlobalLock.restype = ctypes.c_void_p
+        self._kernel32.GlobalSize.restype = ctypes.c_size_t
+        self._kernel32.GlobalFree.restype = ctypes.c_void_p
+
+    def _open(self):
+        # 其它进程可能正占用剪贴板，短暂重试
+        for attempt in range(self.OPEN_RETRIES):
+            if self._user32.OpenClipboard(None):
+                return
+            time.sleep(0.005 * (attempt + 1))
+        raise OSError("无法打开剪贴板（被其它程序占用）")
+
+    def _set(self, fmt, data):
+        handle = self._kernel32.GlobalAlloc(self.GMEM_MOVEABLE, max(len(data), 1))
+        if not handle:
+            raise MemoryError(f"GlobalAlloc 失败 ({len(data)} 字节)")
+        ptr = self._kernel32.GlobalLock(handle)
+        ctypes.memmove(ptr, data, len(data))
+        self._kernel32.GlobalUnlock(handle)
+        # SetClipboardData 成功后内存归系统所有，失败时需自行释放
+        if not self._user32.SetClipboardData(fmt, handle):
+            self._kernel32.GlobalFree(handle)
+            logger.warning(f"剪贴板格式 {fmt} 写入失败")
+
+    def copy(self, text):
+        data = (text + "\0").encode("utf-16-le")
+        self._open()
+        try:
+            self._user32.EmptyClipboard()
+            self._set(CF_UNICODETEXT, data)
+        finally:
+            self._user32.CloseClipboard()
+
+    def paste(self):
+        self._open()
+        try:
+            handle = self._user32.GetClipboardData(CF_UNICODETEXT)
+            if not handle: return ""
+            ptr = self._kernel32.GlobalLock(handle)
+            try:
+                return ctypes.wstring_at(ptr)
+            finally:
+                self._kernel32.GlobalUnlock(handle)
+        finally:
+            self._user32.CloseClipboard()
+
+    def snapshot(self, budget=None):
+        """
+        先枚举全部格式（只取格式号，不触发延迟渲染），去掉不可保存和可由系统合成的格式后按
+        文本优先的顺序读取；超出 budget 时放弃剩余格式
+        """
+        formats = {}
+        self._open()
+        try:
+            available, fmt = [], self._user32.EnumClipboardFormats(0)
+            while fmt:
+                available.append(fmt)
+                fmt = self._user32.EnumClipboardFormats(fmt)
+            wanted = [f for f in available if f not in self.SKIP_FORMATS and f not in self.GDI_OBJECT_RANGE
+                      and self.SYNTHESIZED.get(f) not in available]
+            wanted.sort(key=lambda f: f != CF_UNICODETEXT)
+            deadline = time.perf_counter() + budget if budget is not None else None
+            for i, fmt in enumerate(wanted):
+                if deadline is not None and i and time.perf_counter() > deadline:
+                    logger.warning(f"剪贴板快照超出 {budget * 1000:.0f} ms 预算，未保存格式: {wanted[i:]}")
+                    break
+                handle = self._user32.GetClipboardData(fmt)
+                ptr = self._kernel32.GlobalLock(handle) if handle else None
+                if ptr:
+                    try:
+                        formats[fmt] = ctypes.string_at(ptr, self._kernel32.GlobalSize(handle))
+                    finally:
+                        self._kernel32.GlobalUnlock(handle)
+        finally:
+            self._user32.CloseClipboard()
+        return formats
+
+    def restore(self, snapshot):
+        self._open()
+        try:
+            self._user32.EmptyClipboard()
+            for fmt, data in snapshot.items():
+                self._set(fmt, data)
+        finally:
+            self._user32.CloseClipboard()
+
+
+def create_backend():
+    """Windows 下使用 ctypes 后端，其余平台回退到 pyperclip"""
+    if sys.platform == "win32":
+        try:
+            return Win32Clipboard()
+        except Exception as e:
+            logger.warning(f"Win32 剪贴板后端初始化失败，回退到 pyperclip: {e}")
+    return PyperclipClipboard()
+
+
+class ClipboardKeeper:
+    """
+    粘贴前保存用户剪贴板，粘贴后延迟 restore_delay 秒在后台恢复。
+    快照必须在写入指令前完成，只能在发送路径上同步进行：读取耗时以 snapshot_budget 为上限，
+    累计耗时记录在 stats["snapshot_ms"]，每次快照的耗时写入日志。
+    - 恢复前确认剪贴板仍是本次写入的指令，用户期间复制了新内容则放弃恢复
+    - 连续发送时上一次的恢复尚未执行，则取消它并沿用其快照（此时剪贴板里是上一条指令而非用户内容）
+    """
+    def __init__(self, backend, restore_delay=0.5, enabled=True, snapshot_budget=SNAPSHOT_BUDGET):
+        self.backend = backend
+        self.restore_delay = restore_delay
+        self.snapshot_budget = snapshot_budget
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._pending = None  # (定时器, 快照, 写入的文本)
+        self._snapshot = None
+        self._text = None
+        self.stats = {"saved": 0, "restored": 0, "skipped": 0, "snapshot_ms": 0.0, "write_ms": 0.0}
+
+    def copy(self, text):
+        """写入指令文本；启用恢复时先快照当前剪贴板"""
+        snapshot = None
+        if self.enabled:
+            with self._lock:
+                if self._pending:
+                    timer, snapshot, _ = self._pending
+                    timer.cancel()
+                    self._pending = None
+            if snapshot is None:
+                start = time.perf_counter()
+                try:
+                    snapshot = self.backend.snapshot(self.snapshot_budget)
+                    self.stats["saved"] += 1
+                except Exception as e:
+                    logger.warning(f"剪贴板快照失败，本次不恢复: {e}")
+                elapsed = (time.perf_counter() - start) * 1000
+                self.stats["snapshot_ms"] += elapsed
+                logger.info(f"剪贴板快照 {len(snapshot or {})} 种格式，耗时 {elapsed:.1f} ms")
+
+        # 先记下快照再写入：写入失败时调用方的 release() 仍能恢复（快照可能沿用自上一次未执行的恢复）
+        self._snapshot, self._text = snapshot, text
+        start = time.perf_counter()
+        self.backend.copy(text)
+        self.stats["write_ms"] += (time.perf_counter() - start) * 1000
+
+    def paste(self):
+        return self.backend.paste()
+
+    def release(self):
+        """粘贴已发出（或发送途中出错），安排后台恢复；调用方应在 finally 中调用"""
+        snapshot, text = self._snapshot, self._text
+        self._snapshot = self._text = None
+        if snapshot is None: return
+        timer = threading.Timer(self.restore_delay, self._restore, args=(snapshot, text))
+        timer.daemon = True
+        with self._lock:
+            self._pending = (timer, snapshot, text)
+        timer.start()
+
+    def _restore(self, snapshot, text):
+        # 恢复全程持锁：与之并发的下一次 copy 会等恢复完成后再快照，拿到的是用户内容
+        with self._lock:
+            if not self._pending or self._pending[1] is not snapshot:
+                return
+            self._pending = None
+            try:
+                if self.backend.paste() != text:
+                    self.stats["skipped"] += 1
+                    logger.info("剪贴板已被用户更新，跳过恢复")
+                    return
+                self.backend.restore(snapshot)
+                self.stats["restored"] += 1
+            except Exception as e:
+                logger.warning(f"剪贴板恢复失败: {e}")
+
+    def flush(self):
+        """立即执行尚未触发的恢复（退出程序前调用）"""
+        with self._lock:
+            pending = self._pending
+        if pending:
+            timer, snapshot, text = pending
+            timer.cancel()
+            self._restore(snapshot, text)
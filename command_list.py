@@ -0,0 +1,359 @@
+"""
+虚拟化指令列表：全部指令按钮画在同一个 Canvas 上，只为视口内（上下各多留一行）的按钮创建图元。
+
+- 行高固定，显示位置 <-> (行, 列) 直接换算：点击、右键、悬停都按坐标算出位置，不为每个按钮创建组件和绑定
+- 滚动以像素为单位：滚轮设定目标位置，之后每帧移动剩余距离的一部分，几帧内平滑到位；
+  滚动或尺寸变化时只增删进入 / 离开视口的按钮
+- set_items 原地复用视口内已创建的按钮：只改名称变化的文字、增删多出 / 缺少的按钮，
+  代价与视口大小成正比，与指令总数无关
+- 列表只认显示位置，位置对应哪条指令由调用方维护（搜索过滤时两者不同）
+"""
+import logging
+import tkinter as tk
+
+logger = logging.getLogger(__name__)
+
+ROW_HEIGHT = 42      # 与原来每个按钮 Canvas（高 38）加上下 2px 间距一致
+BTN_TOP, BTN_BOTTOM = 4, 34
+RADIUS = 6
+WHEEL_STEP = ROW_HEIGHT * 2  # 滚轮每一格滚动的像素
+SCROLL_EASE = 0.35           # 平滑滚动每帧移动剩余距离的比例
+FRAME_MS = 16
+AUTOSCROLL_EDGE = 24         # 拖拽时指针距上下边缘多近开始自动滚动
+
+
+def rounded_rect(canvas, x1, y1, x2, y2, radius, **kwargs):
+    points = [x1+radius, y1, x1+radius, y1, x2-radius, y1, x2-radius, y1, x2, y1, x2, y1+radius, x2, y1+radius,
+              x2, y2-radius, x2, y2-radius, x2, y2, x2-radius, y2, x2-radius, y2, x1+radius, y2, x1+radius, y2,
+              x1, y2, x1, y2-radius, x1, y2-radius, x1, y1+radius, x1, y1+radius, x1, y1]
+    return canvas.create_polygon(points, **kwargs, smooth=True)
+
+
+class CommandListView:
+    """
+    on_press(event, pos) / on_context(event, pos) 在左键按下 / 右键点中按钮时调用，返回值作为事件处理结果；
+    左键拖动与松开的事件原样交给 on_motion / on_release；on_hover(pos, area) 在悬停的按钮变化时调用，
+    area 为按钮相对 Canvas 的 (x, y, 宽, 高)，离开按钮时 pos 为 None。
+    colors 为配色 dict，原地更新（切换主题）后调用 restyle()
+    """
+    total_created = 0  # 所有列表累计创建的按钮数（界面更新统计用）
+
+    def __init__(self, parent, colors, max_height, on_press=None, on_motion=None, on_release=None,
+                 on_context=None, on_hover=None, font=("Microsoft YaHei", 9)):
+        self.colors = colors
+        self.max_height = max_height
+        self.font = font
+        self.on_press, self.on_motion, self.on_release = on_press, on_motion, on_release
+        self.on_context, self.on_hover = on_context, on_hover
+        self.canvas = tk.Canvas(parent, bg=colors["bg"], height=0, highlightthickness=0, bd=0,
+                                cursor="hand2", yscrollincrement=1)
+        self.canvas.pack(fill="x")
+        self.names = []
+        self.columns = 1
+        self.empty_text = ""
+        self.width = 0
+        self.offset = 0          # 当前滚动位置（像素）
+        self.target_offset = 0
+        self.rows = {}           # 已创建图元的行号 -> [(rect, text) 或 None, ...]（按列）
+        self.hover = None
+        self.hidden = None       # 拖拽中隐藏的显示位置
+        self.drop_line = None
+        self.thumb = None
+        self.message = None
+        self._scroll_job = None
+        self.stats = {"created": 0, "updated": 0, "deleted": 0}
+
+        c = self.canvas
+        c.bind("<Configure>", self._on_configure)
+        c.bind("<Button-1>", self._on_press)
+        c.bind("<B1-Motion>", lambda e: self.on_motion(e) if self.on_motion else None)
+        c.bind("<ButtonRelease-1>", lambda e: self.on_release(e) if self.on_release else None)
+        c.bind("<Button-3>", self._on_context)
+        c.bind("<Motion>", self._on_pointer)
+        c.bind("<Leave>", lambda e: self._set_hover(None))
+        c.bind("<MouseWheel>", lambda e: self.scroll_by(-e.delta / 120 * WHEEL_STEP))
+        c.bind("<Button-4>", lambda e: self.scroll_by(-WHEEL_STEP))
+        c.bind("<Button-5>", lambda e: self.scroll_by(WHEEL_STEP))
+
+    # --- 数据与尺寸 ---
+    def set_items(self, names, columns=1, empty_text=""):
+        """更新列表内容：列数不变时复用视口内已有的按钮，名称变化的只改文字，多出 / 缺少的增删"""
+        old, old_hover = self.names, self.hover
+        relayout = max(1, columns) != self.columns
+        self.names = list(names)
+        self.columns = max(1, columns)
+        self.empty_text = empty_text
+        self.hover = self.hidden = None
+        self.canvas.configure(height=self.view_height())
+        self._set_offset(self.offset)
+        if relayout:
+            self.redraw()
+            return
+        self.hide_drop_line()
+        self._update_message()
+        for row, cells in self.rows.items():
+            for col, cell in enumerate(cells):
+                pos = row * self.columns + col
+                if pos >= len(self.names):
+                    if cell:
+                        self.canvas.delete(*cell)
+                        self.stats["deleted"] += 1
+                        cells[col] = None
+                elif cell is None:
+                    cells[col] = self._draw_button(pos)
+                else:
+                    if pos >= len(old) or old[pos] != self.names[pos]:
+                        self.canvas.itemconfigure(cell[1], text=self.names[pos])
+                        self.stats["updated"] += 1
+                    if pos == old_hover:
+                        self._restyle(pos)
+        self._sync_rows()
+
+    @property
+    def row_count(self):
+        return -(-len(self.names) // self.columns)
+
+    def content_height(self):
+        return self.row_count * ROW_HEIGHT
+
+    def view_height(self):
+        """Canvas 请求的高度：内容不超过 max_height 时全部显示，否则固定为 max_height 并滚动"""
+        if not self.names:
+            return ROW_HEIGHT if self.empty_text else 0
+        return min(self.content_height(), self.max_height)
+
+    def _viewport(self):
+        h = self.canvas.winfo_height()
+        return h if h > 1 else self.view_height()
+
+    def _max_offset(self):
+        return max(0, self.content_height() - self._viewport())
+
+    def _on_configure(self, event):
+        if event.width != self.width:
+            self.width = event.width
+            self.redraw()
+        else:
+            self._set_offset(self.offset)
+            self._sync_rows()
+
+    # --- 绘制 ---
+    def redraw(self):
+        """丢弃已创建的行并按当前数据重画视口"""
+        for row in list(self.rows):
+            self._delete_row(row)
+        self.hide_drop_line()
+        self._update_message()
+        self._sync_rows()
+
+    def _update_message(self):
+        """列表为空时显示 empty_text"""
+        if self.message:
+            self.canvas.delete(self.message)
+            self.message = None
+        if not self.names and self.empty_text:
+            self.message = self.canvas.create_text(self.width / 2, ROW_HEIGHT / 2, text=self.empty_text,
+                                                   fill=self.colors["subtext"], font=self.font)
+
+    def _cell_width(self):
+        return self.width / self.columns
+
+    def _draw_button(self, pos):
+        row, col = divmod(pos, self.columns)
+        w = self._cell_width()
+        x1, y = col * w, row * ROW_HEIGHT
+        # 单列时按钮占满宽度，多列时左右各留 2px 间距（同原 grid 的 padx）
+        pad = 2 if self.columns > 1 else 0
+        hot = pos == self.hover
+        fill = self.colors["btn_hover"] if hot else self.colors["btn"]
+        rect = rounded_rect(self.canvas, x1 + pad + 2, y + BTN_TOP, x1 + w - pad - 4, y + BTN_BOTTOM, RADIUS,
+                            fill=fill, outline=self.colors["active"] if hot else fill)
+        text = self.canvas.create_text(x1 + w / 2, y + (BTN_TOP + BTN_BOTTOM) / 2, text=self.names[pos],
+                                       fill=self.colors["text_active"] if hot else self.colors["text"], font=self.font)
+        self.stats["created"] += 1
+        CommandListView.total_created += 1
+        return rect, text
+
+    def _create_row(self, row):
+        cells = []
+        for col in range(self.columns):
+            pos = row * self.columns + col
+            visible = pos < len(self.names) and pos != self.hidden
+            cells.append(self._draw_button(pos) if visible else None)
+        self.rows[row] = cells
+
+    def _delete_row(self, row):
+        for cell in self.rows.pop(row):
+            if cell:
+                self.canvas.delete(*cell)
+                self.stats["deleted"] += 1
+
+    def _sync_rows(self):
+        """创建进入视口的行、删除离开视口的行（上下各多留一行，滚动时边缘不会露白）"""
+        if self.width <= 10:
+            return
+        first = max(0, self.offset // ROW_HEIGHT - 1)
+        last = min(self.row_count - 1, (self.offset + self._viewport()) // ROW_HEIGHT + 1)
+        for row in [r for r in self.rows if not first <= r <= last]:
+            self._delete_row(row)
+        for row in range(first, last + 1):
+            if row not in self.rows:
+                self._create_row(row)
+        self._update_thumb()
+
+    def _update_thumb(self):
+        """内容超出视口时在右侧画一条细滚动条（只作位置指示）"""
+        c = self.canvas
+        if self.thumb:
+            c.delete(self.thumb)
+            self.thumb = None
+        content, view = self.content_height(), self._viewport()
+        if content <= view:
+            return
+        h = max(20, view * view / content)
+        y = self.offset + (view - h) * self.offset / max(1, content - view)
+        self.thumb = c.create_rectangle(self.width - 3, y, self.width - 1, y + h,
+                                        fill=self.colors["subtext"], outline="")
+
+    def _restyle(self, pos):
+        cells = self.rows.get(pos // self.columns)
+        cell = cells[pos % self.columns] if cells else None
+        if not cell: return
+        hot = pos == self.hover
+        fill = self.colors["btn_hover"] if hot else self.colors["btn"]
+        self.canvas.itemconfigure(cell[0], fill=fill, outline=self.colors["active"] if hot else fill)
+        self.canvas.itemconfigure(cell[1], fill=self.colors["text_active"] if hot else self.colors["text"])
+
+    def restyle(self):
+        """colors 原地更新后（切换主题）重设 Canvas 背景和已创建图元的颜色"""
+        c = self.canvas
+        c.configure(bg=self.colors["bg"])
+        for row, cells in self.rows.items():
+            for col in range(len(cells)):
+                self._restyle(row * self.columns + col)
+        if self.message:
+            c.itemconfigure(self.message, fill=self.colors["subtext"])
+        if self.thumb:
+            c.itemconfigure(self.thumb, fill=self.colors["subtext"])
+        if self.drop_line:
+            c.itemconfigure(self.drop_line, fill=self.colors["active"])
+
+    # --- 滚动 ---
+    def _set_offset(self, offset):
+        self.offset = int(min(max(0, offset), self._max_offset()))
+        self.canvas.configure(scrollregion=(0, 0, self.width, max(self.content_height(), self._viewport())))
+        self.canvas.yview_moveto(self.offset / max(1, max(self.content_height(), self._viewport())))
+
+    def scroll_by(self, pixels):
+        """平滑滚动 pixels 像素（滚轮连续滚动时累加到目标位置）"""
+        if self._max_offset() <= 0:
+            return "break"
+        base = self.target_offset if self._scroll_job else self.offset
+        self.target_offset = min(max(0, base + pixels), self._max_offset())
+        if not self._scroll_job:
+            self._scroll_step()
+        return "break"
+
+    def _scroll_step(self):
+        remaining = self.target_offset - self.offset
+        step = remaining * SCROLL_EASE
+        step = int(step) if abs(step) >= 1 else (1 if remaining > 0 else -1 if remaining < 0 else 0)
+        self._set_offset(self.offset + step)
+        self._sync_rows()
+        self._set_hover(None)
+        if self.offset != self.target_offset and step:
+            self._scroll_job = self.canvas.after(FRAME_MS, self._scroll_step)
+        else:
+            self._scroll_job = None
+
+    def autoscroll(self, y):
+        """拖拽中指针靠近上下边缘时滚动（y 为相对 Canvas 的坐标）"""
+        view = self._viewport()
+        if y < AUTOSCROLL_EDGE:
+            self._set_offset(self.offset - ROW_HEIGHT // 4)
+        elif y > view - AUTOSCROLL_EDGE:
+            self._set_offset(self.offset + ROW_HEIGHT // 4)
+        else:
+            return
+        self._sync_rows()
+
+    # --- 命中测试 ---
+    def pos_at(self, x, y):
+        """Canvas 坐标 (x, y) 处按钮的显示位置；落在按钮间隙或空白处时返回 None"""
+        if self.width <= 10: return None
+        cy = self.offset + y
+        row, dy = divmod(int(cy), ROW_HEIGHT)
+        col = int(x // self._cell_width())
+        if not (BTN_TOP <= dy <= BTN_BOTTOM and 0 <= col < self.columns):
+            return None
+        pos = row * self.columns + col
+        return pos if 0 <= pos < len(self.names) else None
+
+    def area(self, pos):
+        """按钮相对 Canvas 的 (x, y, 宽, 高)"""
+        row, col = divmod(pos, self.columns)
+        w = self._cell_width()
+        return int(col * w), row * ROW_HEIGHT - self.offset + BTN_TOP, int(w), BTN_BOTTOM - BTN_TOP
+
+    def drop_index(self, x, y):
+        """拖拽放下时的插入位置（0 ~ len）：落在按钮后半部分时插到它后面"""
+        cy = self.offset + y
+        row = min(max(0, int(cy // ROW_HEIGHT)), self.row_count - 1)
+        w = self._cell_width()
+        col = min(max(0, int(x // w)), self.columns - 1)
+        pos = row * self.columns + col
+        if self.columns > 1:
+            after = x - col * w > w / 2
+        else:
+            after = cy - row * ROW_HEIGHT > ROW_HEIGHT / 2
+        return min(pos + after, len(self.names))
+
+    def _on_press(self, event):
+        pos = self.pos_at(event.x, event.y)
+        if pos is None or not self.on_press: return None
+        return self.on_press(event, pos)
+
+    def _on_context(self, event):
+        pos = self.pos_at(event.x, event.y)
+        if pos is None or not self.on_context: return None
+        return self.on_context(event, pos)
+
+    def _on_pointer(self, event):
+        if event.state & 0x0100:  # 按住左键（拖拽中）不更新悬停
+            return
+        self._set_hover(self.pos_at(event.x, event.y))
+
+    def _set_hover(self, pos):
+        if pos == self.hover: return
+        old, self.hover = self.hover, pos
+        for p in (old, pos):
+            if p is not None: self._restyle(p)
+        if self.on_hover:
+            self.on_hover(pos, self.area(pos) if pos is not None else None)
+
+    # --- 拖拽反馈 ---
+    def hide_item(self, pos):
+        """拖拽开始后把原按钮画成空位"""
+        self.hidden = pos
+        row = pos // self.columns
+        if row in self.rows:
+            self._delete_row(row)
+            self._create_row(row)
+
+    def show_drop_line(self, index):
+        """在插入位置 index 前画一条横线（插到末尾时画在最后一个按钮下方）"""
+        c = self.canvas
+        if self.drop_line:
+            c.delete(self.drop_line)
+        end = index >= len(self.names)
+        pos = len(self.names) - 1 if end else index
+        row, col = divmod(pos, self.columns)
+        w = self._cell_width()
+        y = row * ROW_HEIGHT + (BTN_BOTTOM + 3 if end else 1)
+        x1, x2 = (col * w + 7, col * w + w - 7) if self.columns > 1 else (7, self.width - 7)
+        self.drop_line = c.create_rectangle(x1, y, x2, y + 2, fill=self.colors["active"], outline="")
+
+    def hide_drop_line(self):
+        if self.drop_line:
+            self.canvas.delete(self.drop_line)
+            self.drop_line = None
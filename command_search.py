@@ -0,0 +1,240 @@
+"""
+指令搜索：主窗口搜索框按输入逐键过滤指令。
+
+- 查询按空白拆成若干词，每个词（不区分大小写）出现在名称或内容中即匹配，词的顺序不限；
+  名称中包含全部词的指令排在前面，同组内保持用户的指令顺序
+- 三字符片段倒排索引（TrigramIndex）：用 NumPy 一次性算出所有 (片段, 指令) 对并排序去重，
+  以 CSR 形式保存（片段编码 / 偏移 / 指令下标）。长词取其各片段列表的交集作为候选，
+  一两个字符的短词取以它开头的片段范围；候选再逐条校验子串，代价与候选数成正比
+- 扁平文本扫描（FlatText）：索引构建完成前、以及所有词都很常见（候选过多）时，用 str.find 在拼接的长串上跳跃，
+  命中后直接跳到下一条指令，只枚举前 cap 条即停止
+- 逐键增量：上一次结果已完整枚举且新查询是它的延伸（末尾追加字符或新词）时，只在上一次的结果中校验；
+  退格命中按查询缓存的结果
+- 超过 cap 条匹配时只枚举前 cap 条（足够显示），计数显示为 cap+
+"""
+import bisect
+import collections
+import itertools
+import logging
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CACHE_SIZE = 64
+MATCH_CAP = 1000
+# 指令数少于该值时逐条扫描已足够快，不构建倒排索引
+INDEX_MIN_COMMANDS = 2000
+# 词的候选超过该数量时视为常见词改用扫描：常见词扫描很快就能凑满 cap，而校验大量候选反而更慢
+COMMON_MAX = 8000
+SEP = "\0"
+_SHIFT = np.uint64(21)  # Unicode 码位最多 21 位，三个码位拼成一个 uint64 片段编码
+
+
+def split_terms(query):
+    return tuple(query.casefold().replace(SEP, " ").split())
+
+
+class FlatText:
+    """以 \\0 分隔的多段文本；find_docs 依次产出包含某个词的段下标"""
+    def __init__(self, texts):
+        self.corpus = SEP.join(texts) + SEP
+        self.starts = list(itertools.accumulate((len(t) + 1 for t in texts), initial=0))
+
+    def find_docs(self, term):
+        starts, find = self.starts, self.corpus.find
+        pos = find(term)
+        while pos != -1:
+            doc = bisect.bisect_right(starts, pos) - 1
+            yield doc
+            pos = find(term, starts[doc + 1])
+
+
+class TrigramIndex:
+    """三字符片段 -> 升序指令下标的倒排索引；每条文本末尾补两个 \\0，使一两个字符的短词在结尾处也有片段"""
+    CHUNK = 4096
+
+    def __init__(self, texts):
+        start = time.perf_counter()
+        codes, docs = [], []
+        for first in range(0, len(texts), self.CHUNK):
+            c, d = self._chunk(texts[first:first + self.CHUNK], first)
+            codes.append(c)
+            docs.append(d)
+        codes = np.concatenate(codes) if codes else np.zeros(0, np.uint64)
+        docs = np.concatenate(docs) if docs else np.zeros(0, np.int32)
+        # 稳定排序：同一片段内指令下标保持升序
+        order = np.argsort(codes, kind="stable")
+        codes, self.docs = codes[order], docs[order]
+        del order
+        heads = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(codes) else np.zeros(0, np.int64)
+        self.grams = codes[heads]
+        self.offsets = np.r_[heads, len(codes)]
+        self.build_ms = (time.perf_counter() - start) * 1000
+
+    @staticmethod
+    def _chunk(texts, first):
+        corpus = (SEP * 2).join(texts) + SEP * 2
+        points = np.frombuffer(corpus.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        lengths = np.fromiter((len(t) + 2 for t in texts), dtype=np.int64, count=len(texts))
+        owner = np.repeat(np.arange(first, first + len(texts), dtype=np.int32), lengths)
+        head = points[:-2]
+        valid = head != 0  # 以 \0 开头的片段跨越了两条指令
+        codes = ((head << (_SHIFT * np.uint64(2))) | (points[1:-1] << _SHIFT) | points[2:])[valid]
+        docs = owner[:-2][valid]
+        order = np.argsort(codes, kind="stable")
+        codes, docs = codes[order], docs[order]
+        keep = np.ones(len(codes), dtype=bool)
+        keep[1:] = (codes[1:] != codes[:-1]) | (docs[1:] != docs[:-1])
+        return codes[keep], docs[keep]
+
+    @staticmethod
+    def _code(chars):
+        code = 0
+        for ch in chars:
+            code = (code << 21) | ord(ch)
+        return code << (21 * (3 - len(chars)))
+
+    def _range(self, chars):
+        """以 chars（1~3 个字符）开头的片段在 docs 中对应的切片范围"""
+        low = self._code(chars)
+        high = low + (1 << (21 * (3 - len(chars))))
+        lo, hi = np.searchsorted(self.grams, np.uint64(low)), np.searchsorted(self.grams, np.uint64(high))
+        return self.offsets[lo], self.offsets[hi]
+
+    def candidates(self, term):
+        """包含 term 的指令下标的超集（升序 ndarray）；候选超过 COMMON_MAX 时返回 None"""
+        if len(term) < 3:
+            lo, hi = self._range(term)
+            if hi - lo > COMMON_MAX * 4:  # 范围内同一指令会出现多次，去重前适当放宽
+                return None
+            docs = np.unique(self.docs[lo:hi])
+            return docs if len(docs) <= COMMON_MAX else None
+        slices = sorted((self._range(term[i:i + 3]) for i in range(len(term) - 2)), key=lambda r: r[1] - r[0])
+        if slices[0][1] - slices[0][0] > COMMON_MAX:
+            return None
+        result = None
+        for lo, hi in slices:
+            docs = self.docs[lo:hi]
+            result = docs if result is None else np.intersect1d(result, docs, assume_unique=True)
+            if not len(result): break
+        return result
+
+
+class CommandIndex:
+    """commands 列表的只读搜索索引；指令增删改后应丢弃并重建（位置即 commands 中的下标）"""
+    def __init__(self, commands, cap=MATCH_CAP):
+        self.commands = list(commands)
+        self.cap = cap
+        self.names = [cmd.get("name", "").casefold().replace(SEP, " ") for cmd in self.commands]
+        self.hays = [f"{name}\n{cmd.get('text', '')}".casefold().replace(SEP, " ")
+                     for name, cmd in zip(self.names, self.commands)]
+        self.flat_names = FlatText(self.names)
+        self.flat_hays = FlatText(self.hays)
+        self.trigrams = None
+        self._cache = collections.OrderedDict()
+        self._last = None
+        self.stats = {"queries": 0, "incremental": 0, "cached": 0, "indexed": 0, "scanned": 0}
+
+    def build(self):
+        """构建倒排索引（应在后台线程调用；NumPy 排序期间释放 GIL，界面不受影响）"""
+        trigrams = TrigramIndex(self.hays)
+        self.trigrams = trigrams
+        logger.info(f"指令搜索索引: {len(self.hays)} 条指令，{len(trigrams.grams)} 个片段，"
+                    f"{trigrams.docs.nbytes / 1e6:.1f} MB，{trigrams.build_ms:.0f} ms")
+        return self
+
+    def start_build(self):
+        if len(self.hays) >= INDEX_MIN_COMMANDS:
+            threading.Thread(target=self.build, name="CommandIndex", daemon=True).start()
+        return self
+
+    @staticmethod
+    def _collect(docs, texts, terms, cap):
+        """从候选下标中取出包含 terms 各词的前 cap 个，返回 (列表, 是否已完整枚举)"""
+        found = []
+        for doc in docs:
+            if all(t in texts[doc] for t in terms):
+                found.append(doc)
+                if len(found) > cap:
+                    return found[:cap], False
+        return found, True
+
+    def _narrow(self, terms):
+        """上一次结果完整且新查询是它的延伸时，在上一次结果中只校验变化的词；否则返回 None"""
+        if self._last is None: return None
+        prev_terms, (prev_matches, prev_in_name, complete) = self._last
+        n = len(prev_terms)
+        if not (complete and n and len(terms) >= n and terms[:n - 1] == prev_terms[:n - 1]
+                and terms[n - 1].startswith(prev_terms[n - 1])):
+            return None
+        self.stats["incremental"] += 1
+        check = terms[n:] if terms[n - 1] == prev_terms[n - 1] else terms[n - 1:]
+        matches = [i for i in prev_matches if all(t in self.hays[i] for t in check)]
+        in_name = [i for i in prev_in_name if all(t in self.names[i] for t in check)]
+        return matches, in_name, True
+
+    def _lookup(self, terms):
+        """用倒排索引求候选（各词候选的交集）；索引未就绪或所有词都过于常见时返回 None"""
+        trigrams = self.trigrams
+        if trigrams is None: return None
+        result = None
+        for term in sorted(terms, key=len, reverse=True):
+            docs = trigrams.candidates(term)
+            if docs is None: continue
+            result = docs if result is None else np.intersect1d(result, docs, assume_unique=True)
+            if not len(result): break
+        return None if result is None else result.tolist()
+
+    def _search(self, terms):
+        """返回 (匹配位置, 名称命中位置, 是否完整)，均为升序"""
+        result = self._cache.get(terms)
+        if result is not None:
+            self.stats["cached"] += 1
+            self._cache.move_to_end(terms)
+        else:
+            result = self._narrow(terms)
+            if result is None:
+                candidates = self._lookup(terms)
+                if candidates is not None:
+                    self.stats["indexed"] += 1
+                    matches, complete = self._collect(candidates, self.hays, terms, self.cap)
+                else:
+                    # 以最长的词驱动 str.find 跳跃（通常命中最少），其余词在命中的指令上校验
+                    self.stats["scanned"] += 1
+                    driver = max(terms, key=len)
+                    others = [t for t in terms if t is not driver]
+                    matches, complete = self._collect(self.flat_hays.find_docs(driver), self.hays, others, self.cap)
+                if complete:
+                    in_name = [i for i in matches if all(t in self.names[i] for t in terms)]
+                else:
+                    driver = max(terms, key=len)
+                    others = [t for t in terms if t is not driver]
+                    in_name, _ = self._collect(self.flat_names.find_docs(driver), self.names, others, self.cap)
+                result = (matches, in_name, complete)
+            self._cache[terms] = result
+            if len(self._cache) > CACHE_SIZE:
+                self._cache.popitem(last=False)
+        self._last = (terms, result)
+        return result
+
+    def query(self, query, limit):
+        """
+        返回 (前 limit 个位置, 匹配数, 是否完整)：名称中包含全部词的排在前面，同组内保持原顺序。
+        不完整时匹配数即 cap，实际匹配更多
+        """
+        terms = split_terms(query)
+        if not terms:
+            return list(range(min(limit, len(self.hays)))), len(self.hays), True
+        self.stats["queries"] += 1
+        matches, in_name, complete = self._search(terms)
+        top = in_name[:limit]
+        if len(top) < limit:
+            seen = set(top)
+            for i in matches:
+                if i not in seen:
+                    top.append(i)
+                    if len(top) >= limit: break
+        return top, len(matches), complete
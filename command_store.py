@@ -0,0 +1,229 @@
+"""
+SQLite 指令库：指令较多时替代 config.json 中的 commands 列表（state.storage 为 "sqlite" 时启用）。
+
+- commands 表以 pos（REAL）排序并建索引：拖动排序只把被移动的一行改为前后两行 pos 的中点，
+  新增取 MAX(pos) + 1，删除/编辑按主键定位，均为 O(log n) 的单行更新
+- target_ide / target_ai 列记录指令绑定的目标；指令字典中不对应列的字段（steps、tags 等）存入 extra（JSON），
+  读取时还原，导出格式与 config.json 一致
+- 不建全文索引：搜索框始终在内存中过滤（command_search），写入时不必同步额外的索引表
+- 首次打开时从 config.json 一次性迁移；界面持有的指令字典带 "id" 字段对应行主键，导出时去掉
+"""
+import functools
+import json
+import logging
+import os
+import sqlite3
+import time
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ("name", "text", "type", "send_mode")
+DEFAULTS = {"text": "", "type": "text", "send_mode": "paste"}
+# 不写入 extra 的字段（有独立的列）
+_RESERVED = set(COLUMNS) | {"id", "target"}
+# 中点间距小于该值时重新编号，避免浮点精度耗尽
+MIN_GAP = 1e-9
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS commands (
+    id INTEGER PRIMARY KEY,
+    pos REAL NOT NULL,
+    name TEXT NOT NULL,
+    text TEXT NOT NULL DEFAULT '',
+    type TEXT NOT NULL DEFAULT 'text',
+    send_mode TEXT NOT NULL DEFAULT 'paste',
+    target_ide TEXT,
+    target_ai TEXT,
+    extra TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS commands_pos ON commands(pos);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+# 旧版本数据库中已不再维护的全文索引、触发器与标签表
+_LEGACY = """
+DROP TRIGGER IF EXISTS commands_ai;
+DROP TRIGGER IF EXISTS commands_ad;
+DROP TRIGGER IF EXISTS commands_au;
+DROP TABLE IF EXISTS commands_fts;
+DROP INDEX IF EXISTS commands_target;
+DROP TABLE IF EXISTS command_tags;
+"""
+
+_SELECT = "SELECT id, name, text, type, send_mode, target_ide, target_ai, extra FROM commands"
+
+
+def _timed(fn):
+    """写操作包装：在一个事务中执行并累计耗时"""
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        start = time.perf_counter()
+        with self.conn:
+            result = fn(self, *args, **kwargs)
+        self.stats["updates"] += 1
+        self.stats["update_ms"] += (time.perf_counter() - start) * 1000
+        return result
+    return wrapper
+
+
+def strip_ids(commands):
+    """去掉界面字典中的 id 字段，得到与 config.json 相同格式的指令列表"""
+    return [{k: v for k, v in cmd.items() if k != "id"} for cmd in commands]
+
+
+class CommandStore:
+    """SQLite 指令库；连接只在创建它的线程（Tk 主线程）中使用，包括退出时的 close()（托盘菜单的退出需交回主线程调用）"""
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        self._drop_legacy()
+        self.stats = {"updates": 0, "update_ms": 0.0, "renumbers": 0}
+
+    def _drop_legacy(self):
+        """旧版本数据库：把 command_tags 中的标签并入 extra，再删除全文索引、触发器和标签表"""
+        if not self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'command_tags'").fetchone():
+            return
+        tags = {}
+        for tag, command_id in self.conn.execute("SELECT tag, command_id FROM command_tags"):
+            tags.setdefault(command_id, []).append(tag)
+        with self.conn:
+            for command_id, extra in self.conn.execute("SELECT id, extra FROM commands").fetchall():
+                if command_id in tags:
+                    extra = dict(json.loads(extra), tags=sorted(tags[command_id]))
+                    self.conn.execute("UPDATE commands SET extra = ? WHERE id = ?",
+                                      (json.dumps(extra, ensure_ascii=False), command_id))
+        self.conn.executescript(_LEGACY)
+        logger.info("已删除 SQLite 指令库中的全文索引与标签表，标签并入 extra")
+
+    def close(self):
+        self.conn.close()
+
+    # --- 读取 ---
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM commands").fetchone()[0]
+
+    def load(self):
+        """按 pos 顺序读出全部指令（沿 pos 索引扫描）"""
+        return [self._to_cmd(row) for row in self.conn.execute(_SELECT + " ORDER BY pos")]
+
+    def get(self, command_id):
+        row = self.conn.execute(_SELECT + " WHERE id = ?", (command_id,)).fetchone()
+        return self._to_cmd(row) if row else None
+
+    @staticmethod
+    def _to_cmd(row):
+        command_id, name, text, kind, send_mode, ide, ai, extra = row
+        cmd = {"id": command_id, "name": name, "text": text, "type": kind, "send_mode": send_mode}
+        if ide:
+            cmd["target"] = [ide, ai]
+        cmd.update(json.loads(extra))
+        return cmd
+
+    # --- 写入（每个操作一个事务） ---
+    def _row(self, cmd):
+        target = cmd.get("target") or [None, None]
+        extra = {k: v for k, v in cmd.items() if k not in _RESERVED}
+        values = [cmd.get(c, DEFAULTS.get(c)) for c in COLUMNS]
+        return values + [target[0], target[1], json.dumps(extra, ensure_ascii=False)]
+
+    @_timed
+    def add(self, cmd):
+        """追加到末尾，回填 cmd["id"] 并返回"""
+        last = self.conn.execute("SELECT MAX(pos) FROM commands").fetchone()[0]
+        cur = self.conn.execute(
+            "INSERT INTO commands(pos, name, text, type, send_mode, target_ide, target_ai, extra) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", [(last or 0) + 1] + self._row(cmd))
+        cmd["id"] = cur.lastrowid
+        return cmd["id"]
+
+    @_timed
+    def update(self, cmd):
+        self.conn.execute(
+            "UPDATE commands SET name = ?, text = ?, type = ?, send_mode = ?, target_ide = ?, target_ai = ?, extra = ? "
+            "WHERE id = ?", self._row(cmd) + [cmd["id"]])
+
+    @_timed
+    def delete(self, cmd):
+        self.conn.execute("DELETE FROM commands WHERE id = ?", (cmd["id"],))
+
+    @_timed
+    def move(self, cmd, prev_cmd=None, next_cmd=None):
+        """把 cmd 移到 prev_cmd 与 next_cmd 之间（None 表示列表开头/结尾）"""
+        low = self._pos(prev_cmd)
+        high = self._pos(next_cmd)
+        if low is not None and high is not None and high - low < MIN_GAP:
+            self._renumber()
+            low, high = self._pos(prev_cmd), self._pos(next_cmd)
+        if low is None and high is None:
+            pos = 0.0
+        elif low is None:
+            pos = high - 1
+        elif high is None:
+            pos = low + 1
+        else:
+            pos = (low + high) / 2
+        self.conn.execute("UPDATE commands SET pos = ? WHERE id = ?", (pos, cmd["id"]))
+
+    def _pos(self, cmd):
+        if cmd is None: return None
+        return self.conn.execute("SELECT pos FROM commands WHERE id = ?", (cmd["id"],)).fetchone()[0]
+
+    def _renumber(self):
+        ids = [r[0] for r in self.conn.execute("SELECT id FROM commands ORDER BY pos")]
+        self.conn.executemany("UPDATE commands SET pos = ? WHERE id = ?", [(i, cid) for i, cid in enumerate(ids)])
+        self.stats["renumbers"] += 1
+
+    @_timed
+    def replace_all(self, commands):
+        """整体替换指令（迁移、导入）；回填每个字典的 id"""
+        self.conn.execute("DELETE FROM commands")
+        for command_id, cmd in enumerate(commands, 1):
+            cmd["id"] = command_id
+        self.conn.executemany(
+            "INSERT INTO commands(id, pos, name, text, type, send_mode, target_ide, target_ai, extra) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", ([cmd["id"], cmd["id"]] + self._row(cmd) for cmd in commands))
+
+    def migrate(self, commands):
+        """首次打开时从 config.json 的指令列表一次性迁移，返回是否执行了迁移"""
+        if self.conn.execute("SELECT value FROM meta WHERE key = 'migrated'").fetchone():
+            return False
+        start = time.perf_counter()
+        self.replace_all(commands)
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('migrated', ?)",
+                              (time.strftime("%Y-%m-%d %H:%M:%S"),))
+        logger.info(f"已从 config.json 迁移 {len(commands)} 条指令到 SQLite，{(time.perf_counter() - start) * 1000:.0f} ms")
+        return True
+
+    def record(self, op, cmd, commands, **fields):
+        """
+        应用界面上的一次指令变更（与 config_journal 的记录类型一致）。
+        commands 为变更后的界面列表，move 据此找到新位置前后的指令。
+        """
+        if op == "add":
+            self.add(cmd)
+        elif op == "edit":
+            self.update(cmd)
+        elif op == "delete":
+            self.delete(cmd)
+        elif op == "move":
+            to = fields["to"]
+            self.move(cmd, commands[to - 1] if to > 0 else None, commands[to + 1] if to + 1 < len(commands) else None)
+        else:
+            raise ValueError(f"未知的变更类型: {op!r}")
+
+
+def retire(path):
+    """切换回 JSON / 日志存储：读出全部指令（不含 id）并把数据库改名为 .bak，数据库不存在时返回 None"""
+    if not os.path.exists(path): return None
+    store = CommandStore(path)
+    try:
+        commands = strip_ids(store.load())
+    finally:
+        store.close()
+    os.replace(path, path + ".bak")
+    logger.info(f"已从 SQLite 指令库取回 {len(commands)} 条指令，数据库备份为 {path}.bak")
+    return commands
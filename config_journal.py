@@ -0,0 +1,199 @@
+"""
+增量配置存储：指令的增删改和拖动排序只向 config.json 旁的日志文件（config.json.journal）追加一行变更记录，
+不再每次序列化整个 commands 列表。
+
+- 快照仍是原来的 config.json（格式不变，可直接导入导出），额外的 journal_seq 字段表示已并入快照的最后一条记录
+- 日志每行一条 JSON 记录: {"seq": 序号, "op": 类型, ...}
+    add     {"index": i, "cmd": {...}}       在 i 处插入指令
+    edit    {"index": i, "cmd": {...}}       替换第 i 条指令
+    move    {"from": i, "to": j}             移动指令（to 为移出后列表中的位置）
+    delete  {"index": i}                     删除第 i 条指令
+    state   {"state": {...}}                 替换界面状态
+    reset   {"data": {...}}                  整体替换配置（导入配置）
+- 加载时读取快照并重放序号大于 journal_seq 的记录；最后一行写到一半（进程被杀）时忽略
+- 后台线程负责追加日志并维护一份配置副本，日志超过 compact_bytes 后用副本原子写出新快照并清空日志，
+  界面线程只序列化单条记录
+"""
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+from config_writer import atomic_write
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_SUFFIX = ".journal"
+SEQ_KEY = "journal_seq"
+COMPACT_BYTES = 256 * 1024
+
+
+def journal_path(path):
+    return path + JOURNAL_SUFFIX
+
+
+def apply_record(data, record):
+    """把一条变更记录应用到配置字典上，记录与当前列表不符时抛出 ValueError"""
+    op = record.get("op")
+    commands = data.setdefault("commands", [])
+    try:
+        if op == "add":
+            commands.insert(record.get("index", len(commands)), record["cmd"])
+        elif op == "edit":
+            commands[record["index"]] = record["cmd"]
+        elif op == "move":
+            item = commands.pop(record["from"])
+            commands.insert(record["to"], item)
+        elif op == "delete":
+            commands.pop(record["index"])
+        elif op == "state":
+            data["state"] = record["state"]
+        elif op == "reset":
+            data.clear()
+            data.update(record["data"])
+        else:
+            raise ValueError(f"未知的变更类型: {op!r}")
+    except (IndexError, KeyError, TypeError) as e:
+        raise ValueError(f"变更记录无法应用 ({op}): {e}")
+
+
+def replay(path, data):
+    """
+    把 path 对应的日志重放到已加载的快照 data 上（原地修改），返回最后一条记录的序号。
+    data 中的 journal_seq 字段会被移除，因此导出的配置与原格式一致。
+    """
+    seq = data.pop(SEQ_KEY, 0) if isinstance(data, dict) else 0
+    path = journal_path(path)
+    if not os.path.exists(path):
+        return seq
+
+    start = time.perf_counter()
+    applied = skipped = 0
+    with open(path, "r", encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            if not line.strip(): continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                logger.warning(f"配置日志第 {lineno} 行不完整，已忽略其后的内容")
+                break
+            if record.get("seq", 0) <= seq:
+                skipped += 1  # 已并入快照（压缩写完快照后、清空日志前退出）
+                continue
+            try:
+                apply_record(data, record)
+                applied += 1
+            except ValueError as e:
+                logger.error(f"配置日志第 {lineno} 行: {e}")
+            seq = record["seq"]
+    logger.info(f"配置日志重放: {applied} 条，跳过 {skipped} 条，{(time.perf_counter() - start) * 1000:.1f} ms")
+    return seq
+
+
+def write_snapshot(path, data, seq=None):
+    """原子写出完整快照；seq 为 None 时不写 journal_seq（普通 JSON 存储）"""
+    if seq is not None:
+        data = dict(data, **{SEQ_KEY: seq})
+    return atomic_write(path, json.dumps(data, ensure_ascii=False, indent=4))
+
+
+def retire(path, data):
+    """切换回普通 JSON 存储：把已重放的配置写成快照并删除日志"""
+    if not os.path.exists(journal_path(path)): return
+    write_snapshot(path, data)
+    os.remove(journal_path(path))
+    logger.info("已合并并删除配置日志")
+
+
+class ChangeJournal:
+    """
+    追加式配置日志。data 为已重放的配置（只在构造时深拷贝一次作为后台副本），seq 为 replay 返回的序号。
+    append() 可在任意线程调用：记录在调用线程序列化并分配序号，写文件、更新副本和压缩都在后台线程完成。
+    """
+    def __init__(self, path, data, seq=0, compact_bytes=COMPACT_BYTES):
+        self.path = path
+        self.journal_path = journal_path(path)
+        self.compact_bytes = compact_bytes
+        self._replica = json.loads(json.dumps(data))
+        self._seq = self._applied_seq = seq
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._file = None
+        self._size = os.path.getsize(self.journal_path) if os.path.exists(self.journal_path) else 0
+        self._thread = None
+        self.stats = {"records": 0, "bytes": 0, "compactions": 0, "compact_ms": 0.0, "errors": 0}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="ConfigJournal", daemon=True)
+        self._thread.start()
+        return self
+
+    def append(self, op, **fields):
+        """追加一条变更记录，返回记录的字节数"""
+        with self._lock:
+            self._seq += 1
+            line = json.dumps(dict({"seq": self._seq, "op": op}, **fields), ensure_ascii=False) + "\n"
+            self._queue.put(line)
+        return len(line.encode("utf-8"))
+
+    def reset(self, data):
+        """整体替换配置（导入）：记一条 reset 并立即压缩，日志不保留旧内容"""
+        self.append("reset", data=data)
+        self._queue.put(None)
+
+    def _run(self):
+        while True:
+            line = self._queue.get()
+            try:
+                if line is None:
+                    self._compact()
+                else:
+                    self._write(line)
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.error(f"配置日志写入失败: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _write(self, line):
+        if self._file is None:
+            self._file = open(self.journal_path, "a", encoding="utf-8")
+        self._file.write(line)
+        self._file.flush()
+        size = len(line.encode("utf-8"))
+        self._size += size
+        self.stats["records"] += 1
+        self.stats["bytes"] += size
+
+        record = json.loads(line)
+        try:
+            apply_record(self._replica, record)
+        except ValueError as e:
+            logger.error(f"配置副本与日志不一致: {e}")
+        self._applied_seq = record["seq"]
+        if self._size >= self.compact_bytes:
+            self._compact()
+
+    def _compact(self):
+        """先原子写快照（带 journal_seq），再清空日志；两步之间退出时，重放会按序号跳过已并入的记录"""
+        start = time.perf_counter()
+        write_snapshot(self.path, self._replica, self._applied_seq)
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self.journal_path, "w", encoding="utf-8")
+        self._size = 0
+        elapsed = (time.perf_counter() - start) * 1000
+        self.stats["compactions"] += 1
+        self.stats["compact_ms"] += elapsed
+        logger.info(f"配置日志已压缩为快照: {len(self._replica.get('commands', []))} 条指令，{elapsed:.1f} ms")
+
+    def flush(self):
+        """等待后台写完所有已提交的记录并落盘（退出前调用）"""
+        self._queue.join()
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        s = self.stats
+        logger.info(f"配置日志统计: {s['records']} 条记录，{s['bytes']} 字节，压缩 {s['compactions']} 次")
@@ -0,0 +1,150 @@
+"""
+配置文件写入器：把频繁的保存请求合并为防抖窗口内的一次写入，并以“临时文件 + 原子替换”落盘。
+
+- request() 只标记脏数据；距第一次请求 delay 秒后才调用 serialize() 生成内容（拖动窗口等高频事件只写一次）
+- serialize 在 call_later 所在线程执行（界面程序传入 root.after，保证在 Tk 主线程读取界面状态），
+  文件写入在后台线程完成，不阻塞界面
+- 内容与上次写入相同时跳过；flush() 在退出前同步写入尚未落盘的修改
+"""
+import logging
+import os
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def atomic_write(path, text, encoding="utf-8", retries=5):
+    """写入同目录临时文件后 os.replace 覆盖目标，返回写入字节数；替换时文件被占用（杀毒软件等）会短暂重试"""
+    data = text.encode(encoding)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        for attempt in range(retries):
+            try:
+                os.replace(tmp_path, path)
+                break
+            except PermissionError:
+                if attempt == retries - 1: raise
+                time.sleep(0.02 * (attempt + 1))
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    return len(data)
+
+
+class ConfigWriter:
+    """
+    防抖 + 原子替换的配置写入器。
+    serialize() 返回要写入的完整文本；call_later(ms, fn) 用于安排防抖后的序列化，默认使用 threading.Timer。
+    write(text) 负责落盘并返回字节数，默认原子替换 path（增量存储时改为追加日志记录）。
+    """
+    def __init__(self, path, serialize, delay=0.5, call_later=None, write=None):
+        self.path = path
+        self.serialize = serialize
+        self.write = write or (lambda text: atomic_write(self.path, text))
+        self.delay = delay
+        self.call_later = call_later or self._timer
+        self._lock = threading.Lock()
+        self._scheduled = False
+        self._last_text = None
+        # 待写入的 (序号, 文本)，后台线程只保留最新一份；写入按序号判断，旧内容不会覆盖新内容
+        self._cond = threading.Condition()
+        self._pending = None
+        self._seq = 0
+        self._write_lock = threading.Lock()
+        self._written_seq = 0
+        threading.Thread(target=self._io_loop, name="ConfigWriter", daemon=True).start()
+        self._started = time.perf_counter()
+        self.stats = {"requests": 0, "writes": 0, "skipped": 0, "bytes": 0, "errors": 0}
+
+    @staticmethod
+    def _timer(ms, fn):
+        timer = threading.Timer(ms / 1000, fn)
+        timer.daemon = True
+        timer.start()
+
+    def request(self):
+        """标记配置已修改；防抖窗口内的多次请求只触发一次写入"""
+        with self._lock:
+            self.stats["requests"] += 1
+            if self._scheduled: return
+            self._scheduled = True
+        self.call_later(int(self.delay * 1000), self._on_due)
+
+    def _on_due(self):
+        with self._lock:
+            if not self._scheduled: return  # 已被 flush 提前写入
+            self._scheduled = False
+        item = self._serialize()
+        if item:
+            with self._cond:
+                self._pending = item
+                self._cond.notify()
+
+    def _serialize(self):
+        """序列化当前配置，返回 (序号, 文本)；内容未变化时返回 None"""
+        try:
+            text = self.serialize()
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"配置序列化失败: {e}")
+            return None
+        with self._lock:
+            if text == self._last_text:
+                self.stats["skipped"] += 1
+                return None
+            self._last_text = text
+            self._seq += 1
+            return self._seq, text
+
+    def _write(self, item):
+        seq, text = item
+        with self._write_lock:
+            if seq <= self._written_seq: return
+            try:
+                self.stats["bytes"] += self.write(text)
+                self.stats["writes"] += 1
+                self._written_seq = seq
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.error(f"配置写入失败: {e}")
+                # 未落盘的内容不能作为"未变化"的比较基准，否则之后相同内容的请求都会被跳过、永不重试
+                with self._lock:
+                    if self._last_text == text:
+                        self._last_text = None
+
+    def _io_loop(self):
+        while True:
+            with self._cond:
+                while self._pending is None:
+                    self._cond.wait()
+                item, self._pending = self._pending, None
+            self._write(item)
+
+    def flush(self):
+        """同步写入尚未落盘的修改（退出前在界面线程调用）"""
+        with self._lock:
+            due = self._scheduled
+            self._scheduled = False
+        with self._cond:
+            item, self._pending = self._pending, None
+        if due:
+            item = self._serialize() or item
+        if item:
+            self._write(item)
+        logger.info(self.summary())
+
+    def summary(self):
+        elapsed = max(time.perf_counter() - self._started, 1e-6)
+        s = self.stats
+        return (f"配置写入统计: 请求 {s['requests']} 次，实际写入 {s['writes']} 次 "
+                f"({s['writes'] / elapsed:.3f} 次/秒)，跳过相同内容 {s['skipped']} 次，共 {s['bytes']} 字节")
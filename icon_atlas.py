@@ -0,0 +1,125 @@
+"""
+图标图集：从 prepare_icons 载入的 RGBA 原图一次性预渲染界面用到的每个尺寸和主题变体，之后只发放缓存的对象，
+不再在每次构建界面时 resize / 新建 PhotoImage。
+
+- 两层缓存：images 保存缩放（和按主题重新着色）后的 PIL 图像，可在任意线程读取（托盘线程取 64x64 图标）；
+  photos 保存当前主题和缩放比例下的 PhotoImage，只在 Tk 主线程创建
+- 只有登记了重新着色规则的图标（如终端图标在浅色主题）按主题区分变体，其余图标各主题共用一份
+- set_theme：淘汰旧主题专属的 PhotoImage；set_scale（DPI 变化）：淘汰全部缓存，按新比例重新渲染
+- 持有 PhotoImage 引用的是图集本身，Label 不必再各自保存引用防止被回收
+"""
+import logging
+import threading
+
+from PIL import Image, ImageTk
+
+logger = logging.getLogger(__name__)
+
+
+def _lighter_than(limit):
+    return lambda r, g, b, a: r > limit and g > limit and b > limit and a > 100
+
+
+def _darker_than(limit):
+    return lambda r, g, b, a: r < limit and g < limit and b < limit and a > 100
+
+
+# 图标键 -> {主题: (像素条件, 替换颜色)}：深色图标在深色主题、浅色图标在浅色主题下重新着色，保证与背景有对比
+RECOLOR = {
+    "terminal": {"Light": (_lighter_than(200), (80, 80, 80))},
+    "codex": {"Dark": (_darker_than(100), (200, 200, 200))},
+}
+
+
+def recolor(img, test, color):
+    """把满足 test(r, g, b, a) 的像素替换为 color（保留透明度），原地修改并返回 img"""
+    pixels = img.load()
+    for y in range(img.height):
+        for x in range(img.width):
+            r, g, b, a = pixels[x, y]
+            if test(r, g, b, a):
+                pixels[x, y] = (*color, a)
+    return img
+
+
+class IconAtlas:
+    def __init__(self, sources, theme, scale=1.0):
+        self.sources = sources   # 图标键 -> RGBA 原图
+        self.theme = theme
+        self.scale = scale
+        self.images = {}         # (图标键, 像素尺寸, 主题变体) -> PIL 图像
+        self.photos = {}         # 同上 -> PhotoImage
+        self._lock = threading.Lock()
+        self.stats = {"renders": 0, "photos": 0, "hits": 0, "evicted": 0}
+
+    def _variant(self, key, theme):
+        """图标在该主题下的变体名；未登记重新着色规则时各主题共用 None"""
+        return theme if theme in RECOLOR.get(key, {}) else None
+
+    def _pixels(self, size, scaled):
+        return max(1, round(size * self.scale)) if scaled else size
+
+    def image(self, key, size, theme=None, scaled=True):
+        """size x size 的 PIL 图像（scaled 时按 DPI 比例放大）；无此图标时返回 None。返回的对象共享，调用方不可修改"""
+        if key not in self.sources:
+            return None
+        variant = self._variant(key, theme or self.theme)
+        cache_key = (key, self._pixels(size, scaled), variant)
+        with self._lock:
+            img = self.images.get(cache_key)
+            if img is None:
+                px = cache_key[1]
+                img = self.sources[key].resize((px, px), Image.LANCZOS)
+                if variant:
+                    recolor(img, *RECOLOR[key][variant])
+                self.images[cache_key] = img
+                self.stats["renders"] += 1
+        return img
+
+    def photo(self, key, size):
+        """当前主题下 size x size 的 PhotoImage（只能在 Tk 主线程调用）；无此图标时返回 None"""
+        if key not in self.sources:
+            return None
+        cache_key = (key, self._pixels(size, True), self._variant(key, self.theme))
+        photo = self.photos.get(cache_key)
+        if photo is None:
+            photo = self.photos[cache_key] = ImageTk.PhotoImage(self.image(key, size))
+            self.stats["photos"] += 1
+        else:
+            self.stats["hits"] += 1
+        return photo
+
+    def prerender(self, sizes, themes):
+        """为 sizes（图标键 -> 尺寸列表）中每个尺寸、themes 中每个主题预渲染 PIL 图像"""
+        for key, key_sizes in sizes.items():
+            for size in key_sizes:
+                for theme in themes:
+                    self.image(key, size, theme)
+        logger.info(f"图标图集预渲染 {len(self.images)} 张（缩放 {self.scale:.2f}）")
+
+    def themed(self, key):
+        """该图标是否随主题变化（主题切换后需要重新设置）"""
+        return key in RECOLOR
+
+    def set_theme(self, theme):
+        """切换主题：淘汰旧主题专属的 PhotoImage（各主题共用的保留），PIL 图像保留以便切回时直接使用"""
+        if theme == self.theme:
+            return False
+        self.theme = theme
+        stale = [k for k in self.photos if k[2] is not None and k[2] != theme]
+        for k in stale:
+            del self.photos[k]
+        self.stats["evicted"] += len(stale)
+        return True
+
+    def set_scale(self, scale):
+        """DPI 缩放比例变化：淘汰全部缓存，之后按新比例重新渲染；比例未变时返回 False"""
+        if abs(scale - self.scale) < 0.01:
+            return False
+        with self._lock:
+            self.stats["evicted"] += len(self.photos)
+            self.scale = scale
+            self.images.clear()
+            self.photos.clear()
+        logger.info(f"DPI 缩放变为 {scale:.2f}，图标缓存已清空")
+        return True
@@ -0,0 +1,219 @@
+"""
+宏指令：由多个步骤组成的指令，保存在 config.json 中（指令 type 为 "macro"，步骤列表为 steps）。
+
+步骤类型（JSON 形式）:
+    {"type": "text", "text": "...", "send_mode": "paste"}   发送文本（send_mode 为 paste 或 type）
+    {"type": "hotkey", "keys": "ctrl+s"}                     发送快捷键
+    {"type": "wait_window", "timeout": 5}                    等待当前目标窗口出现
+    {"type": "wait_anchor", "timeout": 5}                    等待当前目标窗口中出现锚点
+    {"type": "delay", "seconds": 0.5}                        固定延时
+    {"type": "switch_target", "ide": "VS Code", "ai": "Claude"}  切换后续步骤的目标
+
+编辑弹窗中使用逐行脚本，每行一步，# 开头为注释，文本中的 \\n 表示换行：
+    text: 请解释这段代码
+    type: 直接输入的文本
+    key: ctrl+s
+    wait_window: 5
+    wait_anchor: 3
+    delay: 0.5
+    target: VS Code / Claude
+
+执行时每切换到一个目标，第一个输入步骤激活窗口并清空输入框一次，之后的文本与快捷键步骤接着输入；
+步骤之间从不自动发送，宏以文本步骤结束且开启了自动发送时在最后发送一次（需要其他发送方式时用 key 步骤）。
+
+compile_macro 把步骤列表校验并编译为不可变的 Macro，执行时不再解析；run_macro 逐步调用执行器，
+记录每步耗时，步骤失败或 abort 事件被设置时提前终止。DryRunExecutor 只记录调用，可在无界面环境验证宏。
+"""
+import collections
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 5.0
+
+Step = collections.namedtuple("Step", "index kind args")
+Macro = collections.namedtuple("Macro", "steps source")
+StepResult = collections.namedtuple("StepResult", "index kind ok elapsed_ms")
+MacroResult = collections.namedtuple("MacroResult", "ok aborted steps elapsed_ms")
+
+# 脚本关键字 -> 步骤类型
+_SCRIPT_KINDS = {"text": "text", "type": "text", "key": "hotkey", "wait_window": "wait_window",
+                 "wait_anchor": "wait_anchor", "delay": "delay", "target": "switch_target"}
+
+
+def parse_script(script):
+    """把逐行脚本解析为 JSON 步骤列表，格式错误时抛出 ValueError（信息包含行号）"""
+    steps = []
+    for lineno, raw in enumerate(script.splitlines(), 1):
+        line = raw.strip()
+        if not line or line.startswith("#"): continue
+        keyword, sep, arg = line.partition(":")
+        keyword, arg = keyword.strip().lower(), arg.strip()
+        if not sep or keyword not in _SCRIPT_KINDS:
+            raise ValueError(f"第 {lineno} 行无法识别: {line}")
+
+        kind = _SCRIPT_KINDS[keyword]
+        if kind == "text":
+            steps.append({"type": "text", "text": arg.replace("\\n", "\n"),
+                          "send_mode": "type" if keyword == "type" else "paste"})
+        elif kind == "hotkey":
+            steps.append({"type": "hotkey", "keys": arg})
+        elif kind in ("wait_window", "wait_anchor"):
+            steps.append({"type": kind, "timeout": _number(arg or DEFAULT_TIMEOUT, f"第 {lineno} 行")})
+        elif kind == "delay":
+            steps.append({"type": "delay", "seconds": _number(arg, f"第 {lineno} 行")})
+        else:
+            ide, sep, ai = arg.partition("/")
+            if not sep:
+                raise ValueError(f"第 {lineno} 行目标格式应为 IDE / AI: {line}")
+            steps.append({"type": "switch_target", "ide": ide.strip(), "ai": ai.strip()})
+    return steps
+
+
+def format_script(steps):
+    """parse_script 的逆操作，用于在编辑弹窗中显示已保存的宏"""
+    lines = []
+    for step in steps:
+        kind = step.get("type")
+        if kind == "text":
+            keyword = "type" if step.get("send_mode") == "type" else "text"
+            lines.append(f"{keyword}: {step.get('text', '')}".replace("\n", "\\n"))
+        elif kind == "hotkey":
+            lines.append(f"key: {step.get('keys', '')}")
+        elif kind in ("wait_window", "wait_anchor"):
+            lines.append(f"{kind}: {step.get('timeout', DEFAULT_TIMEOUT):g}")
+        elif kind == "delay":
+            lines.append(f"delay: {step.get('seconds', 0):g}")
+        elif kind == "switch_target":
+            lines.append(f"target: {step.get('ide', '')} / {step.get('ai', '')}")
+    return "\n".join(lines)
+
+
+def _number(value, where):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{where}需要数字，实际为 {value!r}")
+    if number < 0:
+        raise ValueError(f"{where}不能为负数: {value!r}")
+    return number
+
+
+def compile_macro(steps, targets=None):
+    """
+    校验并编译步骤列表。targets 为 target_settings（可选），提供时校验 switch_target 的目标是否存在。
+    返回 Macro，其中每个 Step 的 kind 即执行器的方法名，args 为位置参数。
+    """
+    if not steps:
+        raise ValueError("宏至少需要一个步骤")
+    compiled = []
+    for index, step in enumerate(steps, 1):
+        kind = step.get("type")
+        if kind == "text":
+            if not step.get("text"):
+                raise ValueError(f"第 {index} 步文本为空")
+            args = (step["text"], step.get("send_mode", "paste"))
+        elif kind == "hotkey":
+            keys = [k.strip().lower() for k in step.get("keys", "").split("+") if k.strip()]
+            if not keys:
+                raise ValueError(f"第 {index} 步快捷键为空")
+            args = (tuple(keys),)
+        elif kind in ("wait_window", "wait_anchor"):
+            args = (_number(step.get("timeout", DEFAULT_TIMEOUT), f"第 {index} 步"),)
+        elif kind == "delay":
+            args = (_number(step.get("seconds"), f"第 {index} 步"),)
+        elif kind == "switch_target":
+            ide, ai = step.get("ide"), step.get("ai")
+            if targets is not None and ai not in targets.get(ide, {}):
+                raise ValueError(f"第 {index} 步目标不存在: {ide} / {ai}")
+            args = (ide, ai)
+        else:
+            raise ValueError(f"第 {index} 步类型未知: {kind!r}")
+        compiled.append(Step(index, kind, args))
+    return Macro(tuple(compiled), steps)
+
+
+class MacroCache:
+    """按步骤内容缓存编译结果：同一个宏只编译一次，编辑后内容变化自然重新编译"""
+    def __init__(self, targets=None):
+        self.targets = targets
+        self._compiled = {}
+        self._lock = threading.Lock()
+
+    def get(self, steps):
+        key = json.dumps(steps, sort_keys=True, ensure_ascii=False)
+        with self._lock:
+            macro = self._compiled.get(key)
+        if macro is None:
+            macro = compile_macro(steps, self.targets)
+            with self._lock:
+                self._compiled[key] = macro
+        return macro
+
+
+def run_macro(macro, executor, abort=None):
+    """
+    依次执行编译后的步骤。执行器方法返回假值视为失败并终止后续步骤；
+    abort（threading.Event）被设置时在下一步开始前终止。返回 MacroResult。
+    """
+    start = time.perf_counter()
+    results = []
+    aborted = False
+    for step in macro.steps:
+        if abort is not None and abort.is_set():
+            aborted = True
+            logger.info(f"宏已中止（第 {step.index} 步之前）")
+            break
+        step_start = time.perf_counter()
+        try:
+            ok = bool(getattr(executor, step.kind)(*step.args))
+        except Exception as e:
+            logger.error(f"宏第 {step.index} 步 [{step.kind}] 异常: {e}")
+            ok = False
+        elapsed = (time.perf_counter() - step_start) * 1000
+        results.append(StepResult(step.index, step.kind, ok, elapsed))
+        logger.info(f"宏第 {step.index} 步 [{step.kind}] {'完成' if ok else '失败'}: {elapsed:.1f} ms")
+        if not ok:
+            break
+
+    ok = not aborted and len(results) == len(macro.steps) and all(r.ok for r in results)
+    return MacroResult(ok, aborted, results, (time.perf_counter() - start) * 1000)
+
+
+class DryRunExecutor:
+    """
+    空跑执行器：只记录每一步的调用，不操作窗口、键盘和剪贴板，延时与等待也不真正等待。
+    fail_on 为需要模拟失败的步骤类型集合（如 {"wait_anchor"}），用于验证提前终止。
+    """
+    def __init__(self, ide=None, ai=None, fail_on=()):
+        self.ide, self.ai = ide, ai
+        self.fail_on = set(fail_on)
+        self.calls = []
+
+    def _record(self, kind, *args):
+        self.calls.append((kind, (self.ide, self.ai)) + args)
+        return kind not in self.fail_on
+
+    def text(self, text, send_mode):
+        return self._record("text", text, send_mode)
+
+    def hotkey(self, keys):
+        return self._record("hotkey", keys)
+
+    def wait_window(self, timeout):
+        return self._record("wait_window", timeout)
+
+    def wait_anchor(self, timeout):
+        return self._record("wait_anchor", timeout)
+
+    def delay(self, seconds):
+        return self._record("delay", seconds)
+
+    def switch_target(self, ide, ai):
+        ok = self._record("switch_target", ide, ai)
+        if ok:
+            self.ide, self.ai = ide, ai
+        return ok
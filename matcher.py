@@ -0,0 +1,400 @@
+"""
+锚点模板匹配引擎：基于 NumPy 的归一化互相关 (NCC)，大图自动切换为 FFT 相关计算。
+对外接口与 pyscreeze 的返回值保持一致（Box: left/top/width/height），可直接替换 locateOnScreen。
+"""
+import collections
+import logging
+import math
+import os
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+Box = collections.namedtuple("Box", "left top width height")
+
+# 直接滑窗与 FFT 的运算量估算系数：FFT 每个点约需 FFT_COST_FACTOR * log2(N) 次乘加
+FFT_COST_FACTOR = 4.0
+# 窗口方差低于该值（每像素）视为纯色区域，得分记为 0，避免除零放大噪声
+FLAT_VARIANCE = 1e-4
+# 原位校验的容差：平均绝对差不超过锚点自身平均离差的该比例即视为同一画面
+VERIFY_TOLERANCE = 0.25
+# 显示器 DPI 未知时依次尝试的锚点缩放比例（覆盖 100%~200% 缩放之间的常见换算）
+DEFAULT_SCALES = (1.0, 1.25, 0.8, 1.5, 0.667, 2.0, 0.5)
+# 缩放后锚点短边低于该像素数则放弃该比例
+MIN_SCALED_SIDE = 4
+
+
+def to_gray(image):
+    """将 PIL 图像或 ndarray 统一转换为二维 float32 灰度数组"""
+    if isinstance(image, np.ndarray):
+        arr = image
+    else:
+        if image.mode not in ("L", "RGB"):
+            image = image.convert("RGB")
+        arr = np.asarray(image)
+    arr = arr.astype(np.float32, copy=False)
+    if arr.ndim == 3:
+        # ITU-R 601 亮度公式，与 PIL 的 convert("L") 一致
+        arr = arr[..., 0] * 0.299 + arr[..., 1] * 0.587 + arr[..., 2] * 0.114
+    return arr
+
+
+def _fast_len(n):
+    """返回不小于 n 的最小 2/3/5-smooth 长度，FFT 在这些尺寸上最快"""
+    best = 1 << (n - 1).bit_length()
+    p5 = 1
+    while p5 < best:
+        p35 = p5
+        while p35 < best:
+            quotient = -(-n // p35)
+            candidate = (1 << (quotient - 1).bit_length()) * p35
+            if candidate < best:
+                best = candidate
+            p35 *= 3
+        p5 *= 5
+    return best
+
+
+def _integral(arr):
+    """积分图（float64，避免大图累加精度丢失），首行首列补零"""
+    s = np.zeros((arr.shape[0] + 1, arr.shape[1] + 1), dtype=np.float64)
+    np.cumsum(arr, axis=0, out=s[1:, 1:])
+    np.cumsum(s[1:, 1:], axis=1, out=s[1:, 1:])
+    return s
+
+
+def _box_sums(s, h, w):
+    """由积分图取所有 h×w 窗口的元素和"""
+    return s[h:, w:] - s[:-h, w:] - s[h:, :-w] + s[:-h, :-w]
+
+
+def _window_sums(arr, h, w):
+    """利用积分图计算所有 h×w 窗口的元素和"""
+    return _box_sums(_integral(arr), h, w)
+
+
+def _use_fft(hay_shape, tmpl_shape):
+    """按两种算法的估算运算量决定是否走 FFT"""
+    (hh, hw), (th, tw) = hay_shape, tmpl_shape
+    direct = (hh - th + 1) * (hw - tw + 1) * th * tw
+    n = _fast_len(hh) * _fast_len(hw)
+    return FFT_COST_FACTOR * n * math.log2(max(n, 2)) < direct
+
+
+def _correlate_direct(hay, tmpl):
+    windows = np.lib.stride_tricks.sliding_window_view(hay, tmpl.shape)
+    return np.einsum("ijkl,kl->ij", windows, tmpl)
+
+
+def _correlate_fft(hay, tmpl):
+    # 只需要 valid 区域，因此 FFT 尺寸不小于 haystack 即可，循环卷积的回绕只影响被丢弃的边缘
+    (hh, hw), (th, tw) = hay.shape, tmpl.shape
+    shape = (_fast_len(hh), _fast_len(hw))
+    spectrum = np.fft.rfft2(hay, shape) * np.fft.rfft2(tmpl[::-1, ::-1], shape)
+    full = np.fft.irfft2(spectrum, shape)
+    return full[th - 1:hh, tw - 1:hw]
+
+
+def correlate(haystack, template, method="auto"):
+    """计算 valid 模式的互相关 sum(H[y+i, x+j] * T[i, j])；method 可选 auto/direct/fft"""
+    if method == "auto":
+        method = "fft" if _use_fft(haystack.shape, template.shape) else "direct"
+    if method == "fft":
+        return _correlate_fft(haystack, template)
+    return _correlate_direct(haystack, template)
+
+
+def _window_norms(s1, s2, n):
+    """由窗口和 / 平方和求各窗口去均值后的范数及纯色标记 (flat, norm)"""
+    var = s2 - s1 * s1 / n
+    flat = var <= FLAT_VARIANCE * n
+    return flat, np.sqrt(np.where(flat, 1.0, var))
+
+
+def _ncc(num, norms, t_norm):
+    """由互相关分子与 _window_norms 的结果计算 NCC 得分图"""
+    flat, norm = norms
+    scores = np.where(flat, 0.0, num / (norm * t_norm))
+    return scores.astype(np.float32, copy=False)
+
+
+def match_template(haystack, needle, method="auto"):
+    """返回零均值 NCC 得分图（等价于 OpenCV TM_CCOEFF_NORMED），形状为 (H-h+1, W-w+1)"""
+    hay, tmpl = to_gray(haystack), to_gray(needle)
+    th, tw = tmpl.shape
+    if th > hay.shape[0] or tw > hay.shape[1]:
+        return np.empty((0, 0), dtype=np.float32)
+
+    n = th * tw
+    t = tmpl - tmpl.mean()
+    t_norm = math.sqrt(float((t * t).sum()))
+    if t_norm == 0:
+        # 纯色锚点没有可区分的特征
+        return np.zeros((hay.shape[0] - th + 1, hay.shape[1] - tw + 1), dtype=np.float32)
+
+    # 模板已去均值，故 sum(H*T') == sum((H-mean(H))*T')，分子无需再减窗口均值
+    num = correlate(hay, t, method)
+    return _ncc(num, _window_norms(_window_sums(hay, th, tw), _window_sums(hay * hay, th, tw), n), t_norm)
+
+
+def best_match(haystack, needle, method="auto"):
+    """返回 (Box, score)；needle 比 haystack 大时返回 (None, -1.0)"""
+    tmpl = to_gray(needle)
+    scores = match_template(haystack, tmpl, method)
+    if scores.size == 0:
+        return None, -1.0
+    y, x = np.unravel_index(int(np.argmax(scores)), scores.shape)
+    th, tw = tmpl.shape
+    return Box(int(x), int(y), tw, th), float(scores[y, x])
+
+
+def locate(haystack, needle, threshold=0.7):
+    """在 haystack 中查找 needle，得分不低于 threshold 时返回 Box，否则返回 None"""
+    box, score = best_match(haystack, needle)
+    if box is None or score < threshold:
+        return None
+    return box
+
+
+def patch_difference(patch, needle):
+    """归一化差异：平均绝对差 / 锚点自身的平均绝对离差，0 表示完全一致；尺寸不同返回 inf"""
+    p, n = to_gray(patch), to_gray(needle)
+    if p.shape != n.shape:
+        return math.inf
+    # 以锚点自身的对比度归一化，避免低对比度锚点在任意纯色区域都“差异很小”
+    spread = float(np.abs(n - n.mean()).mean())
+    return float(np.abs(p - n).mean()) / max(spread, 1.0)
+
+
+def verify(patch, needle, tolerance=VERIFY_TOLERANCE):
+    """校验截取的小块是否仍是该锚点（用于上次命中位置的快速路径）"""
+    return patch_difference(patch, needle) <= tolerance
+
+
+def _dedupe_scales(order):
+    scales = []
+    for scale in order:
+        if scale and scale > 0:
+            scale = round(float(scale), 3)
+            if scale not in scales:
+                scales.append(scale)
+    return scales
+
+
+def preferred_scales(recorded=None, dpi_ratio=None):
+    """优先尝试的缩放比例：上次命中比例 -> DPI 换算比例 -> 1.0（去重）"""
+    return _dedupe_scales([recorded, dpi_ratio, 1.0])
+
+
+def candidate_scales(recorded=None, dpi_ratio=None):
+    """
+    全部缩放候选：先是 preferred_scales，再是默认序列中其余的比例。
+    DPI 比例即使已知也可能不可信（系统 DPI 感知的进程对每台显示器读到的都是系统 DPI，比例恒为 1.0），
+    因此默认序列始终作为最后的回退
+    """
+    return _dedupe_scales(preferred_scales(recorded, dpi_ratio) + list(DEFAULT_SCALES))
+
+
+def rescale(arr, scale):
+    """按比例缩放灰度数组（双线性，缩小时带抗锯齿）；过小时返回 None"""
+    if scale == 1.0:
+        return arr
+    h, w = arr.shape
+    size = (max(1, round(w * scale)), max(1, round(h * scale)))
+    if min(size) < MIN_SCALED_SIDE:
+        return None
+    from PIL import Image
+    img = Image.fromarray(np.ascontiguousarray(arr, dtype=np.float32))
+    return np.asarray(img.resize(size, Image.BILINEAR), dtype=np.float32)
+
+
+def _downsample(arr):
+    """2×2 均值降采样（奇数边直接截断）"""
+    h, w = arr.shape[0] // 2 * 2, arr.shape[1] // 2 * 2
+    a = arr[:h, :w]
+    return (a[0::2, 0::2] + a[1::2, 0::2] + a[0::2, 1::2] + a[1::2, 1::2]) * 0.25
+
+
+def _top_peaks(scores, k, radius_y, radius_x):
+    """按得分取前 k 个峰值，每取一个就抑制其邻域，避免候选挤在同一处"""
+    scores = scores.copy()
+    peaks = []
+    for _ in range(k):
+        y, x = np.unravel_index(int(np.argmax(scores)), scores.shape)
+        if not np.isfinite(scores[y, x]):
+            break
+        peaks.append((int(x), int(y)))
+        scores[max(0, y - radius_y):y + radius_y + 1, max(0, x - radius_x):x + radius_x + 1] = -np.inf
+    return peaks
+
+
+class Pyramid:
+    """
+    单次截图的图像金字塔：先在 1/2^L 尺度上粗定位 top-k 候选，再回到原分辨率的小窗口内精修。
+    同一张截图的多次查找共享金字塔。降采样与锚点在原图中的奇偶相位有关，粗层可能漏掉真实位置，
+    因此精修后的得分低于阈值时回退到原分辨率全图匹配，结果与全图匹配一致。
+    """
+    # 最粗层级（3 即 1/8 尺度）
+    MAX_LEVEL = 3
+    # 降采样后锚点短边不得小于该像素数，否则特征会被抹平
+    MIN_NEEDLE_SIDE = 8
+    TOP_K = 5
+
+    def __init__(self, image, max_level=MAX_LEVEL):
+        self.fallbacks = 0   # 回退到原分辨率全图匹配的次数
+        self._stats = {}     # 层级 -> (FFT 尺寸, 频谱, 积分图, 平方积分图)，同一层的多次粗匹配共享
+        self._norms = {}     # (层级, 高, 宽) -> 该尺寸窗口的范数，各相位的同尺寸锚点共享
+        self.levels = [to_gray(image)]
+        for _ in range(max_level):
+            prev = self.levels[-1]
+            if min(prev.shape) < 2 * self.MIN_NEEDLE_SIDE:
+                break
+            self.levels.append(_downsample(prev))
+
+    @property
+    def shape(self):
+        return self.levels[0].shape
+
+    def _pick_level(self, needle_shape):
+        level = 0
+        side = min(needle_shape)
+        while level + 1 < len(self.levels) and (side >> (level + 1)) >= self.MIN_NEEDLE_SIDE:
+            level += 1
+        return level
+
+    def _coarse_scores(self, level, tmpl):
+        """粗层 NCC 得分图，等价于 match_template(self.levels[level], tmpl)，但复用该层的频谱和积分图"""
+        hay = self.levels[level]
+        th, tw = tmpl.shape
+        if th > hay.shape[0] or tw > hay.shape[1]:
+            return np.empty((0, 0), dtype=np.float32)
+        n = th * tw
+        t = tmpl - tmpl.mean()
+        t_norm = math.sqrt(float((t * t).sum()))
+        if t_norm == 0:
+            return np.zeros((hay.shape[0] - th + 1, hay.shape[1] - tw + 1), dtype=np.float32)
+        if level not in self._stats:
+            shape = (_fast_len(hay.shape[0]), _fast_len(hay.shape[1]))
+            self._stats[level] = (shape, np.fft.rfft2(hay, shape), _integral(hay), _integral(hay * hay))
+        shape, spectrum, s1, s2 = self._stats[level]
+        full = np.fft.irfft2(spectrum * np.fft.rfft2(t[::-1, ::-1], shape), shape)
+        num = full[th - 1:hay.shape[0], tw - 1:hay.shape[1]]
+        norms = self._norms.get((level, th, tw))
+        if norms is None:
+            norms = self._norms[level, th, tw] = _window_norms(_box_sums(s1, th, tw), _box_sums(s2, th, tw), n)
+        return _ncc(num, norms, t_norm)
+
+    def best_match(self, needle, top_k=TOP_K, threshold=None):
+        """
+        返回原分辨率坐标下的 (Box, score)，规则同模块级 best_match；
+        给定 threshold 时，候选精修后的最高分低于它则改用原分辨率全图匹配
+        """
+        tmpl = to_gray(needle)
+        th, tw = tmpl.shape
+        full = self.levels[0]
+        if th > full.shape[0] or tw > full.shape[1]:
+            return None, -1.0
+
+        level = self._pick_level(tmpl.shape)
+        if level == 0:
+            return best_match(full, tmpl)
+
+        scale = 1 << level
+        # 降采样结果随锚点在原图中的相位变化：另以偏移半个粗层像素的锚点各做一次粗匹配，
+        # 使真实位置与某个相位的误差不超过 1/4 个粗层像素
+        half = scale // 2
+        candidates = []
+        for dy, dx in ((0, 0), (0, half), (half, 0), (half, half)):
+            coarse_tmpl = tmpl[dy:, dx:]
+            for _ in range(level):
+                coarse_tmpl = _downsample(coarse_tmpl)
+            coarse = self._coarse_scores(level, coarse_tmpl)
+            if coarse.size == 0:
+                continue
+            ch, cw = coarse_tmpl.shape
+            candidates.extend((cx * scale - dx, cy * scale - dy)
+                              for cx, cy in _top_peaks(coarse, top_k, ch // 2, cw // 2))
+        if not candidates:
+            return best_match(full, tmpl)
+
+        # 粗层一个像素对应原图 scale 个像素，再留出降采样截断带来的误差
+        pad = 2 * scale
+        best_box, best_score = None, -1.0
+        for x, y in dict.fromkeys(candidates):
+            x0, y0 = max(0, x - pad), max(0, y - pad)
+            x1 = min(full.shape[1], x + tw + pad)
+            y1 = min(full.shape[0], y + th + pad)
+            box, score = best_match(full[y0:y1, x0:x1], tmpl)
+            if box is not None and score > best_score:
+                best_box, best_score = Box(box.left + x0, box.top + y0, tw, th), score
+        if threshold is not None and best_score < threshold:
+            self.fallbacks += 1
+            logger.debug(f"金字塔候选最高分 {best_score:.3f} 低于阈值，回退原分辨率匹配")
+            return best_match(full, tmpl)
+        return best_box, best_score
+
+    def locate(self, needle, threshold=0.7, top_k=TOP_K):
+        """金字塔版 locate：得分不低于 threshold 时返回原分辨率 Box"""
+        box, score = self.best_match(needle, top_k, threshold)
+        if box is None or score < threshold:
+            return None
+        return box
+
+
+class AnchorCache:
+    """
+    已解码锚点图的内存缓存：以 (路径, mtime) 为键保存灰度 float32 数组，文件被改写后自动失效。
+    同一锚点的各缩放版本随原图一起缓存。多个线程（后台预热 / 自动化任务 / 校准弹窗）可并发访问。
+    """
+    def __init__(self):
+        self._entries = {}  # path -> ((mtime_ns, size), {scale: ndarray})
+        self._lock = threading.Lock()
+
+    def get(self, path, scale=1.0):
+        """返回锚点按 scale 缩放后的灰度数组（只读）；缩放后过小返回 None，文件无法读取时抛出异常"""
+        st = os.stat(path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        scale = round(float(scale), 3)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry and entry[0] == stamp and scale in entry[1]:
+                return entry[1][scale]
+        if entry and entry[0] == stamp:
+            variants = entry[1]
+        else:
+            from PIL import Image
+            with Image.open(path) as img:
+                base = to_gray(img)
+            base.flags.writeable = False
+            variants = {1.0: base}
+
+        if scale not in variants:
+            arr = rescale(variants[1.0], scale)
+            if arr is not None:
+                arr.flags.writeable = False
+            # 复制后再写入，避免与持锁读取的其他线程共享同一个 dict
+            variants = dict(variants)
+            variants[scale] = arr
+        with self._lock:
+            self._entries[path] = (stamp, variants)
+        return variants[scale]
+
+    def invalidate(self, path):
+        """锚点图被重新截取后调用，丢弃旧的解码结果"""
+        with self._lock:
+            self._entries.pop(path, None)
+
+    def warm(self, paths):
+        """预先解码一组锚点，缺失或损坏的文件直接跳过"""
+        for path in paths:
+            try:
+                if os.path.exists(path):
+                    self.get(path)
+            except Exception as e:
+                logger.warning(f"锚点预热失败 {path}: {e}")
+
+    def __contains__(self, path):
+        with self._lock:
+            return path in self._entries
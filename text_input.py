@@ -0,0 +1,150 @@
+"""
+直接文本输入：把文本编码为 KEYEVENTF_UNICODE 键盘事件，按批次整块交给 SendInput，
+不经过剪贴板（不覆盖用户剪贴板，也不受剪贴板占用延迟影响）。
+
+编码与分块与实际注入分离：encode_text / chunk_events 是纯函数，
+RecordingInjector 记录每批事件而不调用系统 API，可在任意平台上验证。
+"""
+import ctypes
+import logging
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+INPUT_KEYBOARD = 1
+KEYEVENTF_KEYUP = 0x0002
+KEYEVENTF_UNICODE = 0x0004
+VK_RETURN, VK_SHIFT = 0x0D, 0x10
+
+# 单次 SendInput 的事件数上限（每个字符按下 + 抬起两个事件）
+CHUNK_EVENTS = 2000
+
+
+# --- 内存对齐的 INPUT 结构（键盘钩子与文本注入共用） ---
+class KEYBDINPUT(ctypes.Structure):
+    _fields_ = [("wVk", ctypes.c_ushort), ("wScan", ctypes.c_ushort), ("dwFlags", ctypes.c_ulong),
+                ("time", ctypes.c_ulong), ("dwExtraInfo", ctypes.c_void_p)]
+
+
+class MOUSEINPUT(ctypes.Structure):
+    _fields_ = [("dx", ctypes.c_long), ("dy", ctypes.c_long), ("mouseData", ctypes.c_ulong),
+                ("dwFlags", ctypes.c_ulong), ("time", ctypes.c_ulong), ("dwExtraInfo", ctypes.c_void_p)]
+
+
+class HARDWAREINPUT(ctypes.Structure):
+    _fields_ = [("uMsg", ctypes.c_ulong), ("wParamL", ctypes.c_ushort), ("wParamH", ctypes.c_ushort)]
+
+
+class INPUT_UNION(ctypes.Union):
+    # 联合体必须包含最大的 MOUSEINPUT，sizeof(INPUT) 才与系统一致；批量 SendInput 会校验 cbSize
+    _fields_ = [("ki", KEYBDINPUT), ("mi", MOUSEINPUT), ("hi", HARDWAREINPUT)]
+
+
+class INPUT(ctypes.Structure):
+    _fields_ = [("type", ctypes.c_ulong), ("u", INPUT_UNION)]
+
+
+def encode_text(text):
+    """
+    把文本编码为 (vk, scan, flags) 事件组列表，每个字符一组，保证分块时不会被拆开：
+    - 普通字符按 UTF-16 编码单元发送 KEYEVENTF_UNICODE 按下/抬起，辅助平面字符（如 emoji）为一组代理对
+    - 换行发送 Shift+Enter，在聊天输入框中换行而不是提前发送
+    """
+    groups = []
+    for ch in text.replace("\r\n", "\n").replace("\r", "\n"):
+        if ch == "\n":
+            groups.append([(VK_SHIFT, 0, 0), (VK_RETURN, 0, 0),
+                           (VK_RETURN, 0, KEYEVENTF_KEYUP), (VK_SHIFT, 0, KEYEVENTF_KEYUP)])
+            continue
+        data = ch.encode("utf-16-le")
+        units = [int.from_bytes(data[i:i + 2], "little") for i in range(0, len(data), 2)]
+        group = []
+        for unit in units:
+            group.append((0, unit, KEYEVENTF_UNICODE))
+            group.append((0, unit, KEYEVENTF_UNICODE | KEYEVENTF_KEYUP))
+        groups.append(group)
+    return groups
+
+
+def chunk_events(groups, size=CHUNK_EVENTS):
+    """按事件数把事件组装箱为若干批，每批不超过 size 个事件（单组超过 size 时独占一批）"""
+    batch = []
+    for group in groups:
+        if batch and len(batch) + len(group) > size:
+            yield batch
+            batch = []
+        batch.extend(group)
+    if batch:
+        yield batch
+
+
+class SendInputInjector:
+    """通过 user32.SendInput 整批注入事件"""
+    def __init__(self):
+        self._user32 = ctypes.windll.user32
+        self._user32.SendInput.argtypes = [ctypes.c_uint, ctypes.c_void_p, ctypes.c_int]
+        self._user32.SendInput.restype = ctypes.c_uint
+
+    def send(self, events):
+        """注入一批事件，返回系统实际接收的事件数"""
+        inputs = (INPUT * len(events))()
+        for item, (vk, scan, flags) in zip(inputs, events):
+            item.type = INPUT_KEYBOARD
+            item.u.ki = KEYBDINPUT(vk, scan, flags, 0, None)
+        return self._user32.SendInput(len(events), inputs, ctypes.sizeof(INPUT))
+
+
+class RecordingInjector:
+    """记录每批事件的假注入器，用于在无 Windows 环境下校验编码与分块"""
+    def __init__(self):
+        self.batches = []
+
+    def send(self, events):
+        self.batches.append(list(events))
+        return len(events)
+
+    def text(self):
+        """把记录的事件还原为文本（Shift+Enter 还原为换行）"""
+        units, out = [], []
+        for batch in self.batches:
+            for vk, scan, flags in batch:
+                if flags & KEYEVENTF_KEYUP: continue
+                if flags & KEYEVENTF_UNICODE:
+                    units.append(scan)
+                elif vk == VK_RETURN:
+                    out.append(b"".join(u.to_bytes(2, "little") for u in units).decode("utf-16-le"))
+                    out.append("\n")
+                    units = []
+        out.append(b"".join(u.to_bytes(2, "little") for u in units).decode("utf-16-le"))
+        return "".join(out)
+
+
+def default_injector():
+    """当前平台可用的注入器，非 Windows 返回 None"""
+    if sys.platform != "win32":
+        return None
+    try:
+        return SendInputInjector()
+    except Exception as e:
+        logger.warning(f"SendInput 注入器初始化失败: {e}")
+        return None
+
+
+def type_text(text, injector, chunk_size=CHUNK_EVENTS):
+    """
+    直接输入文本，返回是否全部注入成功。
+    SendInput 返回值小于批次事件数说明被 UIPI 等拦截（如目标窗口以管理员权限运行），此时停止后续批次。
+    """
+    start = time.perf_counter()
+    batches = sent = 0
+    for batch in chunk_events(encode_text(text), chunk_size):
+        accepted = injector.send(batch)
+        batches += 1
+        sent += accepted
+        if accepted != len(batch):
+            logger.error(f"文本注入被拦截: 第 {batches} 批仅接收 {accepted}/{len(batch)} 个事件")
+            return False
+    logger.info(f"直接输入 {len(text)} 个字符: {sent} 个事件 / {batches} 批，"
+                f"{(time.perf_counter() - start) * 1000:.1f} ms")
+    return True
@@ -0,0 +1,78 @@
+"""
+主题：组件登记自己使用的配色键（bg / btn / text / active ...），切换主题时一次遍历把新颜色推送给存活的组件和 Canvas 图元，
+不再销毁重建界面。
+
+- Theme.colors 是同一个 dict 对象，切换时原地更新：事件闭包（悬停变色等）里引用的 colors 自动取到新颜色
+- style(widget, bg="header", fg="subtext") 立即按当前主题设置并登记，之后每次切换重新设置
+- style_item(canvas, item, fill="btn") 同上，用于 Canvas 图元
+- on_change(fn) 登记依赖状态的配色（选中高亮、置顶图标等），切换后调用 fn()
+- 已销毁的组件在下次切换时自动清除；界面整体重建前可调用 clear()
+"""
+import logging
+import tkinter as tk
+
+logger = logging.getLogger(__name__)
+
+
+class Theme:
+    def __init__(self, themes, name):
+        self.themes = themes
+        self.name = name
+        self.colors = dict(themes[name])
+        self._widgets = {}   # widget -> {选项: 配色键}
+        self._items = {}     # (canvas, item) -> {选项: 配色键}
+        self._hooks = []
+        self.stats = {"switches": 0, "widgets": 0, "items": 0, "hooks": 0}
+
+    def _resolve(self, options):
+        return {option: self.colors[key] for option, key in options.items()}
+
+    def style(self, widget, **options):
+        """按配色键设置组件颜色并登记，返回组件本身"""
+        widget.configure(**self._resolve(options))
+        self._widgets.setdefault(widget, {}).update(options)
+        return widget
+
+    def style_item(self, canvas, item, **options):
+        canvas.itemconfigure(item, **self._resolve(options))
+        self._items.setdefault((canvas, item), {}).update(options)
+        return item
+
+    def on_change(self, fn):
+        self._hooks.append(fn)
+        return fn
+
+    def clear(self):
+        self._widgets.clear()
+        self._items.clear()
+        self._hooks.clear()
+
+    def switch(self, name):
+        """切换到主题 name：原地更新 colors，并一次遍历重设所有登记的组件、图元和回调"""
+        self.name = name
+        self.colors.clear()
+        self.colors.update(self.themes[name])
+        dead = []
+        for widget, options in self._widgets.items():
+            try:
+                widget.configure(**self._resolve(options))
+            except tk.TclError:
+                dead.append(widget)
+        for widget in dead:
+            del self._widgets[widget]
+        dead = []
+        for (canvas, item), options in self._items.items():
+            try:
+                canvas.itemconfigure(item, **self._resolve(options))
+            except tk.TclError:
+                dead.append((canvas, item))
+        for key in dead:
+            del self._items[key]
+        for fn in self._hooks:
+            try:
+                fn()
+            except tk.TclError as e:
+                logger.debug(f"主题回调失败: {e}")
+        s = self.stats
+        s["switches"] += 1
+        s["widgets"], s["items"], s["hooks"] = len(self._widgets), len(self._items), len(self._hooks)
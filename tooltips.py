@@ -0,0 +1,122 @@
+"""
+悬停提示：整个应用共用一个提示窗口、一个延迟定时器和一组全局 <Enter>/<Leave> 绑定。
+
+- attach(widget, text) 只在字典里登记组件路径 -> 文本来源，不为组件创建对象、绑定或定时器；
+  组件销毁时自动移除
+- 文本来源可以是字符串或函数，函数在提示真正显示时才调用（如虚拟化列表按悬停的行取指令内容）
+- 没有独立组件的区域（Canvas 上的某一行）由调用方在悬停变化时调用 schedule / hide
+- 过长的文本（指令内容预览）按行数和字数截断
+"""
+import logging
+import tkinter as tk
+
+logger = logging.getLogger(__name__)
+
+MAX_LINES = 12
+MAX_CHARS = 400
+
+
+def shorten(text, max_lines=MAX_LINES, max_chars=MAX_CHARS):
+    """只保留前 max_lines 行、max_chars 个字符，截断时末尾加省略号"""
+    lines = text.splitlines()
+    short = "\n".join(lines[:max_lines])
+    truncated = len(lines) > max_lines or len(short) > max_chars
+    if not truncated:
+        return text
+    return short[:max_chars].rstrip() + " …"
+
+
+class TooltipManager:
+    def __init__(self, root, delay=500):
+        self.root = root
+        self.delay = delay
+        self.sources = {}       # 组件路径 -> (组件, 文本或返回文本的函数)
+        self.win = None
+        self.label = None
+        self.after_id = None
+        self.pending = None     # (组件, 文本来源, 区域)
+        self.stats = {"shown": 0, "windows": 0}
+        root.bind_all("<Enter>", self._on_enter, add="+")
+        root.bind_all("<Leave>", self._on_leave, add="+")
+        root.bind_all("<Destroy>", lambda e: self.sources.pop(str(e.widget), None), add="+")
+
+    def attach(self, widget, text):
+        self.sources[str(widget)] = (widget, text)
+
+    def detach(self, widget):
+        self.sources.pop(str(widget), None)
+
+    def _on_enter(self, event):
+        source = self.sources.get(str(event.widget))
+        if source:
+            self.schedule(*source)
+
+    def _on_leave(self, event):
+        if str(event.widget) in self.sources:
+            self.hide()
+
+    def schedule(self, widget, text, area=None):
+        """
+        delay 毫秒后在 widget 下方显示提示；area 为 widget 内的 (x, y, 宽, 高)，提示对齐该区域而不是整个 widget。
+        text 为字符串或返回字符串的函数（显示时才调用）
+        """
+        self.hide()
+        if not text:
+            return
+        self.pending = (widget, text, area)
+        self.after_id = self.root.after(self.delay, self._show)
+
+    def hide(self):
+        if self.after_id:
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+        self.pending = None
+        if self.win is not None and self.win.winfo_exists():
+            self.win.withdraw()
+
+    def _window(self):
+        """唯一的提示窗口：首次显示时创建，之后隐藏 / 复用（界面整体重建销毁它后再重新创建）"""
+        if self.win is None or not self.win.winfo_exists():
+            self.win = tk.Toplevel(self.root)
+            self.win.withdraw()
+            self.win.overrideredirect(True)
+            self.win.attributes("-topmost", True)
+            self.label = tk.Label(self.win, justify="left", background="#ffffca",
+                                  relief="solid", borderwidth=1, font=("Microsoft YaHei", 8))
+            self.label.pack()
+            self.stats["windows"] += 1
+        return self.win
+
+    def _show(self):
+        """实际显示：在目标下方弹出并水平居中，宽度不超过主窗口，支持自动换行"""
+        self.after_id = None
+        widget, text, area = self.pending
+        self.pending = None
+        try:
+            if not widget.winfo_exists():
+                return
+            if callable(text):
+                text = text()
+        except (tk.TclError, LookupError) as e:
+            logger.debug(f"提示文本获取失败: {e}")
+            return
+        if not text:
+            return
+
+        w_width, w_height = widget.winfo_width(), widget.winfo_height()
+        x_root, y_root = widget.winfo_rootx(), widget.winfo_rooty()
+        if area:
+            x, y, w_width, w_height = area
+            x_root, y_root = x_root + x, y_root + y
+        # 获取主窗口的宽度，用于限制提示宽度
+        max_width = max(widget.winfo_toplevel().winfo_width() - 20, 100)
+
+        win = self._window()
+        self.label.config(text=shorten(text), wraplength=max_width)
+        win.update_idletasks()
+        tip_w = win.winfo_reqwidth()
+        # 偏移 15 像素，避免被手型光标遮挡
+        win.geometry(f"+{x_root + (w_width - tip_w) // 2}+{y_root + w_height + 15}")
+        win.deiconify()
+        win.lift()
+        self.stats["shown"] += 1
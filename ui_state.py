@@ -0,0 +1,89 @@
+"""
+主界面的差量刷新：比较"界面显示的状态"前后两次快照，只原地更新发生变化的区域，不再销毁全部组件后重建。
+
+- Reconciler：按键注册区域的更新函数（patcher）。update(state) 找出与上次快照不同的键，
+  依注册顺序调用对应 patcher；未提供 patcher 的键（只能整体重建的部分）变化时改为整体重建
+- WidgetCounter：记录一次界面操作前后的组件路径集合，统计新建 / 销毁的组件数和耗时，
+  用于比较整体重建与差量刷新的开销
+"""
+import contextlib
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Reconciler:
+    def __init__(self, rebuild):
+        self.rebuild = rebuild
+        self.patchers = {}   # 键 -> patcher(旧值, 新值)，None 表示该键变化时需要整体重建
+        self.snapshot = None
+
+    def register(self, key, patch=None):
+        self.patchers[key] = patch
+
+    def reset(self, state):
+        """整体重建后记录当前快照"""
+        self.snapshot = dict(state)
+
+    def update(self, state):
+        """返回变化的键列表；需要整体重建时返回 None"""
+        old = self.snapshot
+        if old is None:
+            self.rebuild()
+            self.reset(state)
+            return None
+        changed = [key for key in self.patchers if old.get(key) != state.get(key)]
+        if any(self.patchers[key] is None for key in changed):
+            self.rebuild()
+            self.reset(state)
+            return None
+        self.snapshot = dict(state)
+        for key in changed:
+            self.patchers[key](old.get(key), state.get(key))
+        return changed
+
+
+def _widget_paths(root):
+    paths, stack = set(), [root]
+    while stack:
+        widget = stack.pop()
+        paths.add(str(widget))
+        stack.extend(widget.winfo_children())
+    return paths
+
+
+class WidgetCounter:
+    """
+    统计界面操作新建 / 销毁的 Tk 组件数（按组件路径比较，tkinter 为同一父组件下的新组件分配新名称）；
+    items 为可选的计数函数（如虚拟化列表已创建的按钮数），一并统计其增量
+    """
+    def __init__(self, root, items=None):
+        self.root = root
+        self.items = items
+        self.ops = {}
+
+    @contextlib.contextmanager
+    def measure(self, op):
+        before = _widget_paths(self.root)
+        items_before = self.items() if self.items else 0
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            after = _widget_paths(self.root)
+            created, destroyed = len(after - before), len(before - after)
+            items = (self.items() if self.items else 0) - items_before
+            s = self.ops.setdefault(op, {"calls": 0, "created": 0, "destroyed": 0, "items": 0, "ms": 0.0})
+            s["calls"] += 1
+            s["created"] += created
+            s["destroyed"] += destroyed
+            s["items"] += max(0, items)
+            s["ms"] += elapsed
+            logger.info(f"界面更新 [{op}]: 新建 {created} 个组件，销毁 {destroyed} 个，"
+                        f"列表按钮 {max(0, items)} 个，{elapsed:.1f} ms")
+
+    def summary(self):
+        return "；".join(f"{op} x{s['calls']}: 平均新建 {s['created'] / s['calls']:.0f} 个组件，"
+                        f"{s['ms'] / s['calls']:.1f} ms" for op, s in self.ops.items())
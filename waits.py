@@ -0,0 +1,170 @@
+"""
+自适应等待：以带退避的轮询等待真实条件成立（前台窗口、剪贴板内容、输入区域画面变化），
+取代自动化流程中写死的 time.sleep。fixed 模式保留原有的固定延时，作为兼容回退。
+"""
+import ctypes
+import logging
+import time
+from ctypes import wintypes
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ADAPTIVE, FIXED = "adaptive", "fixed"
+# adaptive 模式下没有可观测条件的间隔仍保留的最短等待（秒）：Chromium / Electron 在点击后异步应用焦点，
+# 立即按下的 Ctrl+A 可能落在焦点切换之前
+MIN_SETTLE = 0.02
+# 光标闪烁最多改变的像素列数；区域画面变化须超过该宽度才算文字已渲染
+CARET_MAX_COLUMNS = 3
+# GetAncestor 取根窗口
+GA_ROOT = 2
+
+
+class GUITHREADINFO(ctypes.Structure):
+    _fields_ = [("cbSize", wintypes.DWORD), ("flags", wintypes.DWORD),
+                ("hwndActive", wintypes.HWND), ("hwndFocus", wintypes.HWND),
+                ("hwndCapture", wintypes.HWND), ("hwndMenuOwner", wintypes.HWND),
+                ("hwndMoveSize", wintypes.HWND), ("hwndCaret", wintypes.HWND),
+                ("rcCaret", wintypes.RECT)]
+
+
+def focus_window():
+    """前台线程中拥有键盘焦点的窗口句柄；非 Windows 或获取失败时返回 None"""
+    try:
+        info = GUITHREADINFO(cbSize=ctypes.sizeof(GUITHREADINFO))
+        if not ctypes.windll.user32.GetGUIThreadInfo(0, ctypes.byref(info)):
+            return None
+        return info.hwndFocus or None
+    except Exception:
+        return None
+
+
+def changed_columns(a, b):
+    """两张同尺寸截图中存在差异的像素列数；尺寸不同时视为整幅变化"""
+    a, b = np.asarray(a), np.asarray(b)
+    if a.shape != b.shape:
+        return a.shape[1] if a.ndim > 1 else 1
+    diff = a != b
+    if diff.ndim == 3:
+        diff = diff.any(axis=2)
+    return int(diff.any(axis=0).sum())
+
+
+def wait_until(predicate, timeout=0.5, interval=0.002, max_interval=0.032, backoff=2.0, abort=None):
+    """
+    轮询 predicate 直到返回真值或超时，轮询间隔从 interval 按 backoff 倍增至 max_interval。
+    predicate 抛出异常视为条件未满足；abort（threading.Event）被设置时立即放弃。返回 (是否满足, 耗时秒数)。
+    """
+    start = time.perf_counter()
+    deadline = start + timeout
+    while True:
+        if abort is not None and abort.is_set():
+            return False, time.perf_counter() - start
+        try:
+            if predicate():
+                return True, time.perf_counter() - start
+        except Exception:
+            pass
+        now = time.perf_counter()
+        if now >= deadline:
+            return False, now - start
+        if abort is not None:
+            abort.wait(min(interval, deadline - now))
+        else:
+            time.sleep(min(interval, deadline - now))
+        interval = min(interval * backoff, max_interval)
+
+
+class Waiter:
+    """
+    自动化流程使用的等待条件集合。每个方法都带有 fixed 参数，即原流程中对应位置的固定延时：
+    fixed 模式下只按该延时 sleep；adaptive 模式下轮询真实条件，超时后继续执行（与原流程一样不中断任务）。
+    api 为 win32gui 或兼容对象，clipboard 需提供 paste()，capture 为 capture.CaptureBackend。
+    """
+    def __init__(self, mode=ADAPTIVE, api=None, clipboard=None, capture=None, focus=focus_window):
+        self.mode = mode if mode in (ADAPTIVE, FIXED) else ADAPTIVE
+        self.api = api
+        self.clipboard = clipboard
+        self.capture = capture
+        # 返回当前键盘焦点窗口句柄的函数
+        self.focus = focus
+        self.stats = {"waits": 0, "timeouts": 0, "wait_ms": 0.0}
+
+    @property
+    def adaptive(self):
+        return self.mode == ADAPTIVE
+
+    def _record(self, name, ok, elapsed):
+        self.stats["waits"] += 1
+        self.stats["wait_ms"] += elapsed * 1000
+        if not ok:
+            self.stats["timeouts"] += 1
+            logger.warning(f"等待条件超时: {name} ({elapsed * 1000:.0f} ms)")
+        return ok
+
+    def _fixed(self, seconds):
+        if seconds:
+            time.sleep(seconds)
+            self.stats["wait_ms"] += seconds * 1000
+        return True
+
+    def pause(self, fixed):
+        """
+        没有可观测条件的间隔（如 Ctrl+A 后按退格）。键盘事件在系统输入队列中按序投递，
+        但目标程序处理前一个按键可能是异步的，adaptive 模式下仍等待 MIN_SETTLE（不超过 fixed）
+        """
+        return self._fixed(fixed if not self.adaptive else min(fixed, MIN_SETTLE))
+
+    def input_focus(self, hwnd, fixed=0.05, timeout=0.5):
+        """
+        点击输入框后等待 hwnd 是前台窗口且键盘焦点落在它的窗口树内，再等待 MIN_SETTLE：
+        Chromium / Electron 页面内部的焦点切换在 Win32 层不可见，这段最短等待留给它完成
+        """
+        if not self.adaptive or self.api is None:
+            return self._fixed(fixed)
+
+        def focused():
+            if self.api.GetForegroundWindow() != hwnd:
+                return False
+            focus = self.focus() if self.focus else None
+            return focus is None or self.api.GetAncestor(focus, GA_ROOT) == hwnd
+
+        ok, elapsed = wait_until(focused, timeout)
+        self._fixed(min(fixed, MIN_SETTLE))
+        return self._record("输入焦点", ok, elapsed)
+
+    def foreground(self, hwnd, fixed=0.1, timeout=1.0):
+        """等待 hwnd 成为前台窗口"""
+        if not self.adaptive or self.api is None:
+            return self._fixed(fixed)
+        ok, elapsed = wait_until(lambda: self.api.GetForegroundWindow() == hwnd, timeout)
+        return self._record("前台窗口", ok, elapsed)
+
+    def clipboard_set(self, text, fixed=0.05, timeout=0.5):
+        """等待剪贴板内容变为 text"""
+        if not self.adaptive or self.clipboard is None:
+            return self._fixed(fixed)
+        ok, elapsed = wait_until(lambda: self.clipboard.paste() == text, timeout)
+        return self._record("剪贴板", ok, elapsed)
+
+    def snapshot(self, region):
+        """记录区域 (left, top, width, height) 当前画面，作为 region_changed 的基准；fixed 模式返回 None"""
+        if not self.adaptive or self.capture is None:
+            return None
+        try:
+            return np.array(self.capture.grab(region))
+        except Exception as e:
+            logger.warning(f"输入区域截图失败: {e}")
+            return None
+
+    def region_changed(self, region, baseline, fixed=0.05, timeout=0.3):
+        """
+        等待区域画面与 baseline 不同（如粘贴的文字已渲染到输入框），没有基准时按固定延时处理。
+        区域内可能有闪烁的光标，变化须超过 CARET_MAX_COLUMNS 列才算数
+        """
+        if baseline is None:
+            return self._fixed(fixed)
+        ok, elapsed = wait_until(
+            lambda: changed_columns(self.capture.grab(region), baseline) > CARET_MAX_COLUMNS, timeout)
+        return self._record("输入区域变化", ok, elapsed)
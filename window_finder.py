@@ -0,0 +1,202 @@
+"""
+目标窗口解析：按 target_settings 中的 win_title 规则筛选顶层窗口，并缓存已解析的窗口句柄。
+api 参数为 win32gui 或与之接口相同的对象（IsWindow / IsWindowVisible / IsIconic /
+GetWindowText / GetClassName / EnumWindows），便于在无 Windows 环境下替换。
+"""
+import functools
+import logging
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+EDITOR_CLASS = "Chrome_WidgetWin_1"   # VS Code / Antigravity 等 Electron 编辑器
+CONSOLE_CLASS = "ConsoleWindowClass"  # 传统控制台窗口
+
+
+_META = set(".^$*+?{}[]\\|()")
+# 识别常见规则形态：可选 ^、可选的排除前瞻 (?!.*(A|B))、可选 .*、单个分组或字面量、可选 .*、可选 $
+_RULE_SHAPE = re.compile(r"^(?P<start>\^)?(?:\(\?!\.\*\((?P<exclude>[^()]*)\)\))?(?P<lead>\.\*)?"
+                         r"(?:\((?P<group>[^()]*)\)|(?P<single>[^()|]*?))(?P<trail>\.\*)?(?P<end>\$)?$", re.S)
+
+
+def _literal_prefix(pattern):
+    """取正则开头连续的普通字符（支持 \\. 这类转义），返回 (小写前缀, 是否整个规则都是字面量)"""
+    out = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "\\" and i + 1 < len(pattern) and not pattern[i + 1].isalnum():
+            out.append(pattern[i + 1])
+            i += 2
+            continue
+        if c in _META:
+            # 紧跟量词时前一个字符是可选的，不能算进前缀
+            if c in "?*{" and out: out.pop()
+            return "".join(out).lower(), False
+        out.append(c)
+        i += 1
+    return "".join(out).lower(), True
+
+
+def _literals(alternatives):
+    """把 A|B|C 拆成各分支的字面量前缀；非 ASCII 分支无法可靠地做大小写折叠，返回 None"""
+    parts = [_literal_prefix(alt) for alt in alternatives.split("|")]
+    if not all(prefix.isascii() for prefix, _ in parts): return None
+    return [prefix for prefix, _ in parts], all(exact for _, exact in parts)
+
+
+class TargetMatcher:
+    """
+    预编译的目标窗口规则：先比较类名，再用 win_title 中提取出的字面量做子串预筛，
+    只有预筛无法给出结论时才执行正则。形如 .*Visual Studio Code.* 或
+    ^(?!.*(A|B)).*(X|Y).* 且各分支都是纯字面量的规则完全由子串判断完成，不再运行正则。
+    """
+    def __init__(self, ide_mode, pattern):
+        self.ide_mode = ide_mode
+        self.pattern = pattern
+        try:
+            self.regex = re.compile(pattern, re.I)
+        except re.error as e:
+            logger.error(f"目标窗口规则无效 [{ide_mode}] {pattern!r}: {e}")
+            self.regex = None
+        self.include = None   # 至少包含其中之一（各分支的字面量前缀）
+        self.exclude = None   # 包含其中任意一个即排除
+        self.exact = False    # 预筛结果即最终结果，无需再跑正则
+        self._analyze()
+
+    def _analyze(self):
+        shape = _RULE_SHAPE.match(self.pattern) if self.regex else None
+        if not shape: return
+        body = shape["group"] if shape["group"] is not None else shape["single"]
+        include = _literals(body)
+        if not include: return
+        self.include, exact = include
+        # 锚定开头/结尾（且没有 .* 放宽）时字面量只能作必要条件
+        if shape["start"] and not shape["lead"]: exact = False
+        if shape["end"] and not shape["trail"]: exact = False
+        if shape["exclude"] is not None:
+            exclude = _literals(shape["exclude"])
+            # 排除前瞻只有在 ^ 锚定时才对整个标题生效
+            if exclude and exclude[1] and shape["start"]:
+                self.exclude = exclude[0]
+            else:
+                exact = False
+        self.exact = exact
+
+    def title_matches(self, title):
+        if self.regex is None: return False
+        if "\n" in title or not title.isascii():
+            # 预筛基于单行 ASCII 小写比较，其它情况直接交给正则
+            return bool(self.regex.search(title))
+        lowered = title.lower()
+        if self.exclude and any(word in lowered for word in self.exclude):
+            return False
+        if self.include is not None and not any(word in lowered for word in self.include):
+            return False
+        return self.exact or bool(self.regex.search(title))
+
+    def matches(self, title, cls):
+        """判断单个窗口是否为当前 IDE 模式的目标窗口（原 _automation_task 中 filter_window 的规则）"""
+        # 排除 QuickBar 自身
+        if title and "QuickBar" in title and cls == "TkTopLevel": return False
+
+        if self.ide_mode in ["VS Code", "Antigravity"]:
+            # 在 IDE 模式下，必须是编辑器类窗口
+            return cls == EDITOR_CLASS and self.title_matches(title)
+        if self.ide_mode == "Native CLI":
+            # CLI 模式优先根据类名匹配真正终端，或正则匹配标题
+            if cls == EDITOR_CLASS: return False
+            return cls == CONSOLE_CLASS or self.title_matches(title)
+        return False
+
+
+@functools.lru_cache(maxsize=64)
+def compile_target(ide_mode, target_regex):
+    """同一 (IDE 模式, win_title) 只编译一次；target_settings.json 中的规则变化后自然生成新的匹配器"""
+    return TargetMatcher(ide_mode, target_regex)
+
+
+def compile_targets(target_settings):
+    """加载 target_settings 时一次性编译全部规则，返回 {(IDE, AI): TargetMatcher}"""
+    return {(ide, ai): compile_target(ide, cfg["win_title"])
+            for ide, ais in target_settings.items() for ai, cfg in ais.items() if cfg.get("win_title")}
+
+
+def window_matches(ide_mode, title, cls, target_regex):
+    """判断单个窗口是否为当前 IDE 模式的目标窗口"""
+    return compile_target(ide_mode, target_regex).matches(title, cls)
+
+
+def enum_target_windows(api, ide_mode, target_regex):
+    """全量枚举顶层窗口，返回所有可见、未最小化且符合规则的窗口句柄"""
+    results = []
+    matcher = compile_target(ide_mode, target_regex)
+
+    def _filter(hwnd, _):
+        if not api.IsWindowVisible(hwnd) or api.IsIconic(hwnd):
+            return
+        title = api.GetWindowText(hwnd)
+        cls = api.GetClassName(hwnd)
+        if matcher.matches(title, cls):
+            results.append(hwnd)
+            logger.info(f"匹配到目标窗口: {title}")
+
+    api.EnumWindows(_filter, None)
+    return results
+
+
+class WindowCache:
+    """
+    (IDE, AI, win_title) -> 窗口句柄 的缓存。命中时只做 IsWindow + 标题/类名复核，
+    只有缓存缺失或句柄失效时才全量枚举窗口。
+    """
+    def __init__(self, api):
+        self.api = api
+        self._entries = {}
+        self.stats = {"hit": 0, "miss": 0, "enum_ms": 0.0}
+        # 广播的准备阶段在线程池中并发解析，条目与统计的更新需加锁（窗口枚举本身在锁外进行）
+        self._lock = threading.Lock()
+
+    def _still_valid(self, hwnd, ide_mode, target_regex):
+        api = self.api
+        try:
+            if not api.IsWindow(hwnd) or not api.IsWindowVisible(hwnd) or api.IsIconic(hwnd):
+                return False
+            return window_matches(ide_mode, api.GetWindowText(hwnd), api.GetClassName(hwnd), target_regex)
+        except Exception:
+            return False
+
+    def resolve(self, ide, ai, target_regex):
+        """返回目标窗口句柄，找不到时返回 None"""
+        key = (ide, ai, target_regex)
+        start = time.perf_counter()
+        hwnd = self._entries.get(key)
+        hit = bool(hwnd) and self._still_valid(hwnd, ide, target_regex)
+        if not hit:
+            found = enum_target_windows(self.api, ide, target_regex)
+            hwnd = found[0] if found else None
+        elapsed = (time.perf_counter() - start) * 1000
+        with self._lock:
+            if hit:
+                self.stats["hit"] += 1
+            else:
+                self.stats["miss"] += 1
+                self.stats["enum_ms"] += elapsed
+                if hwnd:
+                    self._entries[key] = hwnd
+                else:
+                    self._entries.pop(key, None)
+            hits, total = self.stats["hit"], self.stats["hit"] + self.stats["miss"]
+        source = "缓存命中" if hit else "全量枚举"
+        logger.info(f"窗口解析[{source}] {ide}/{ai}: {elapsed:.2f} ms，命中率 {hits}/{total}")
+        return hwnd
+
+    def invalidate(self, hwnd=None):
+        """丢弃指定句柄（或全部）的缓存条目，例如激活失败时"""
+        with self._lock:
+            if hwnd is None:
+                self._entries.clear()
+            else:
+                self._entries = {k: v for k, v in self._entries.items() if v != hwnd}
@@ -0,0 +1,271 @@
+"""
+事件驱动的窗口注册表：订阅窗口创建 / 销毁 / 标题变化 / 前台切换等事件，持续维护每个目标的候选窗口表，
+使自动化任务以 O(1) 查表代替每次点击的全量枚举。
+
+事件源可替换：
+- WinEventSource: Windows 下通过 SetWinEventHook 订阅系统事件
+- SimulatedDesktop: 模拟桌面，同时充当窗口 API 与事件源，用于在 Linux 上驱动和基准测试索引逻辑
+"""
+import ctypes
+import logging
+import threading
+from ctypes import wintypes
+
+logger = logging.getLogger(__name__)
+
+# 事件类型
+CREATE, DESTROY, SHOW, HIDE, NAME, FOREGROUND, MINIMIZE, RESTORE = (
+    "create", "destroy", "show", "hide", "name", "foreground", "minimize", "restore")
+# GetAncestor 取根窗口（顶层窗口的根是其自身）
+GA_ROOT = 2
+
+
+class WindowRegistry:
+    """
+    按目标索引的窗口表；每个目标内按最近前台顺序排列，最后一个即最近使用的窗口。
+    targets 为 {(IDE, AI): TargetMatcher}，见 window_finder.compile_targets。
+    """
+    def __init__(self, api, targets, source=None):
+        self.api = api
+        self.source = source
+        self._targets = dict(targets)
+        self._windows = {}  # hwnd -> 所属目标 key 集合
+        self._index = {}    # key -> {hwnd: None}（有序，末尾为最近前台）
+        self._lock = threading.RLock()
+        self.stats = {"events": 0, "lookups": 0, "hits": 0}
+
+    # --- 生命周期 ---
+    def start(self):
+        """全量枚举一次作为初始索引，然后开始接收事件"""
+        self.rebuild()
+        if self.source:
+            self.source.start(self.on_event)
+        return self
+
+    def stop(self):
+        if self.source:
+            self.source.stop()
+
+    def rebuild(self):
+        hwnds = []
+        self.api.EnumWindows(lambda hwnd, _: hwnds.append(hwnd), None)
+        with self._lock:
+            self._windows.clear()
+            self._index = {key: {} for key in self._targets}
+            # EnumWindows 按 Z 序自顶向下返回，倒序插入使最上层窗口位于末尾（视为最近使用）
+            for hwnd in reversed(hwnds):
+                self._refresh(hwnd)
+        logger.info(f"窗口注册表已建立: {len(self._windows)} 个候选窗口")
+
+    def set_targets(self, targets):
+        """target_settings 变化后更新目标规则并重建索引"""
+        with self._lock:
+            self._targets = dict(targets)
+        self.rebuild()
+
+    # --- 索引维护 ---
+    def _drop(self, hwnd):
+        for key in self._windows.pop(hwnd, ()):
+            self._index.get(key, {}).pop(hwnd, None)
+
+    def _refresh(self, hwnd):
+        api = self.api
+        try:
+            # 事件源也会上报子窗口（控件）的 OBJID_WINDOW 事件，只索引与 EnumWindows 相同的顶层窗口
+            if (not api.IsWindow(hwnd) or api.GetAncestor(hwnd, GA_ROOT) != hwnd
+                    or not api.IsWindowVisible(hwnd) or api.IsIconic(hwnd)):
+                self._drop(hwnd)
+                return
+            title, cls = api.GetWindowText(hwnd), api.GetClassName(hwnd)
+        except Exception:
+            self._drop(hwnd)
+            return
+
+        keys = {key for key, matcher in self._targets.items() if matcher.matches(title, cls)}
+        old = self._windows.get(hwnd, set())
+        for key in old - keys:
+            self._index[key].pop(hwnd, None)
+        for key in keys - old:
+            self._index.setdefault(key, {})[hwnd] = None
+        if keys:
+            self._windows[hwnd] = keys
+        else:
+            self._windows.pop(hwnd, None)
+
+    def _promote(self, hwnd):
+        for key in self._windows.get(hwnd, ()):
+            bucket = self._index[key]
+            bucket.pop(hwnd, None)
+            bucket[hwnd] = None
+
+    def on_event(self, kind, hwnd):
+        """事件回调（可能在事件源线程中调用）"""
+        with self._lock:
+            self.stats["events"] += 1
+            if kind in (DESTROY, HIDE, MINIMIZE):
+                self._drop(hwnd)
+            elif kind == FOREGROUND:
+                self._refresh(hwnd)
+                self._promote(hwnd)
+            else:
+                self._refresh(hwnd)
+
+    # --- 查询 ---
+    def lookup(self, ide, ai):
+        """返回目标最近使用的候选窗口句柄，没有候选时返回 None"""
+        with self._lock:
+            self.stats["lookups"] += 1
+            bucket = self._index.get((ide, ai))
+            while bucket:
+                hwnd = next(reversed(bucket))
+                if self.api.IsWindow(hwnd):
+                    self.stats["hits"] += 1
+                    return hwnd
+                self._drop(hwnd)
+        return None
+
+    def candidates(self, ide, ai):
+        """目标的全部候选窗口（最近使用在前）"""
+        with self._lock:
+            return list(reversed(self._index.get((ide, ai), {})))
+
+
+class WinEventSource:
+    """SetWinEventHook 事件源：在独立线程的消息循环中接收系统窗口事件"""
+    EVENTS = {
+        0x0003: FOREGROUND,  # EVENT_SYSTEM_FOREGROUND
+        0x0016: MINIMIZE,    # EVENT_SYSTEM_MINIMIZESTART
+        0x0017: RESTORE,     # EVENT_SYSTEM_MINIMIZEEND
+        0x8000: CREATE,      # EVENT_OBJECT_CREATE
+        0x8001: DESTROY,     # EVENT_OBJECT_DESTROY
+        0x8002: SHOW,        # EVENT_OBJECT_SHOW
+        0x8003: HIDE,        # EVENT_OBJECT_HIDE
+        0x800C: NAME,        # EVENT_OBJECT_NAMECHANGE
+    }
+    RANGES = ((0x0003, 0x0003), (0x0016, 0x0017), (0x8000, 0x8003), (0x800C, 0x800C))
+    OBJID_WINDOW = 0
+    WINEVENT_OUTOFCONTEXT, WINEVENT_SKIPOWNPROCESS = 0x0000, 0x0002
+    WM_QUIT = 0x0012
+
+    def __init__(self):
+        self._thread = None
+        self._thread_id = None
+
+    def start(self, callback):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._loop, args=(callback,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread_id:
+            ctypes.windll.user32.PostThreadMessageW(self._thread_id, self.WM_QUIT, 0, 0)
+
+    def _loop(self, callback):
+        user32 = ctypes.windll.user32
+        self._thread_id = ctypes.windll.kernel32.GetCurrentThreadId()
+        WINEVENTPROC = ctypes.WINFUNCTYPE(None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND,
+                                          wintypes.LONG, wintypes.LONG, wintypes.DWORD, wintypes.DWORD)
+        user32.SetWinEventHook.restype = wintypes.HANDLE
+        user32.SetWinEventHook.argtypes = [wintypes.UINT, wintypes.UINT, wintypes.HMODULE, WINEVENTPROC,
+                                           wintypes.DWORD, wintypes.DWORD, wintypes.UINT]
+
+        def handler(hook, event, hwnd, id_object, id_child, thread, timestamp):
+            # 只关心窗口对象本身，忽略光标、滚动条等子对象事件（子窗口由注册表按 GetAncestor 过滤）
+            if not hwnd or id_object != self.OBJID_WINDOW or id_child != 0:
+                return
+            kind = self.EVENTS.get(event)
+            if kind:
+                try:
+                    callback(kind, hwnd)
+                except Exception as e:
+                    logger.error(f"窗口事件处理失败: {e}")
+
+        # 回调对象必须保持引用，否则会被回收导致崩溃
+        self._proc = WINEVENTPROC(handler)
+        flags = self.WINEVENT_OUTOFCONTEXT | self.WINEVENT_SKIPOWNPROCESS
+        hooks = [user32.SetWinEventHook(lo, hi, None, self._proc, 0, 0, flags) for lo, hi in self.RANGES]
+        if not all(hooks):
+            logger.error("窗口事件钩子挂载失败，将回退到按需枚举")
+
+        msg = wintypes.MSG()
+        while user32.GetMessageW(ctypes.byref(msg), None, 0, 0) > 0:
+            user32.TranslateMessage(ctypes.byref(msg)); user32.DispatchMessageW(ctypes.byref(msg))
+        for hook in hooks:
+            if hook: user32.UnhookWinEvent(hook)
+
+
+class SimulatedDesktop:
+    """
+    模拟桌面：提供与 win32gui 相同的窗口查询接口，并作为事件源把窗口变化推送给注册表。
+    用于在无 Windows 环境下驱动注册表的索引逻辑以及与全量枚举做性能对比。
+    """
+    def __init__(self):
+        self.windows = {}  # hwnd -> {"title", "cls", "visible", "iconic", "parent"}，插入顺序即 Z 序（自底向上）
+        self._next = 0x10000
+        self._callback = None
+
+    # --- 事件源接口 ---
+    def start(self, callback):
+        self._callback = callback
+
+    def stop(self):
+        self._callback = None
+
+    def _emit(self, kind, hwnd):
+        if self._callback:
+            self._callback(kind, hwnd)
+
+    # --- 模拟操作 ---
+    def create(self, title, cls="Chrome_WidgetWin_1", visible=True, parent=None):
+        """创建窗口；parent 不为空时为该窗口的子窗口（不出现在 EnumWindows 中，但同样产生事件）"""
+        self._next += 4
+        hwnd = self._next
+        self.windows[hwnd] = {"title": title, "cls": cls, "visible": visible, "iconic": False, "parent": parent}
+        self._emit(CREATE, hwnd)
+        if visible:
+            self._emit(SHOW, hwnd)
+        return hwnd
+
+    def destroy(self, hwnd):
+        self.windows.pop(hwnd, None)
+        self._emit(DESTROY, hwnd)
+
+    def rename(self, hwnd, title):
+        self.windows[hwnd]["title"] = title
+        self._emit(NAME, hwnd)
+
+    def focus(self, hwnd):
+        # 移到 Z 序顶层
+        self.windows[hwnd] = self.windows.pop(hwnd)
+        self._emit(FOREGROUND, hwnd)
+
+    def minimize(self, hwnd, iconic=True):
+        self.windows[hwnd]["iconic"] = iconic
+        self._emit(MINIMIZE if iconic else RESTORE, hwnd)
+
+    # --- win32gui 兼容接口 ---
+    def IsWindow(self, hwnd):
+        return hwnd in self.windows
+
+    def IsWindowVisible(self, hwnd):
+        return hwnd in self.windows and self.windows[hwnd]["visible"]
+
+    def IsIconic(self, hwnd):
+        return hwnd in self.windows and self.windows[hwnd]["iconic"]
+
+    def GetWindowText(self, hwnd):
+        return self.windows[hwnd]["title"] if hwnd in self.windows else ""
+
+    def GetClassName(self, hwnd):
+        return self.windows[hwnd]["cls"] if hwnd in self.windows else ""
+
+    def GetAncestor(self, hwnd, flags):
+        """只支持 GA_ROOT：沿父窗口上溯到顶层窗口"""
+        while hwnd in self.windows and self.windows[hwnd]["parent"]:
+            hwnd = self.windows[hwnd]["parent"]
+        return hwnd
+
+    def EnumWindows(self, callback, extra):
+        for hwnd in reversed([h for h, w in self.windows.items() if not w["parent"]]):
+            callback(hwnd, extra)